@@ -1,7 +1,14 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class CommonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.common'
-    verbose_name = 'Общие компоненты' 
\ No newline at end of file
+    verbose_name = 'Общие компоненты' 
+
+    def ready(self):
+        """Регистрация системной проверки профилей middleware"""
+        from .route_profiles import check_route_profiles
+
+        checks.register(check_route_profiles, checks.Tags.admin)
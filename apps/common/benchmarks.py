@@ -0,0 +1,139 @@
+"""
+Утилиты для замеров производительности (management-команды bench_*)
+
+История микробенчмарков (microbench) хранится в JSONL: одна строка на
+замер одного запуска, с исходными замерами, чтобы bench_compare мог
+проверить значимость разницы между запусками.
+"""
+import json
+import math
+import statistics
+import time
+from pathlib import Path
+
+
+def percentile(ordered, percent):
+    """Перцентиль по уже отсортированному списку замеров"""
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    """
+    Сводная статистика по замерам в миллисекундах
+
+    Args:
+        samples: Список длительностей в миллисекундах
+
+    Returns:
+        Dict с количеством, средним, медианой и p99
+    """
+    ordered = sorted(samples)
+    return {
+        'iterations': len(ordered),
+        'mean_ms': statistics.fmean(ordered) if ordered else 0.0,
+        'p50_ms': percentile(ordered, 50),
+        'p99_ms': percentile(ordered, 99),
+    }
+
+
+def measure(func, iterations=1000, warmup=10, keep_samples=False):
+    """
+    Замеряет время выполнения функции
+
+    Args:
+        func: Функция без аргументов
+        iterations: Количество замеров
+        warmup: Количество прогревочных вызовов (не учитываются)
+        keep_samples: Добавить исходные замеры в результат ('samples')
+
+    Returns:
+        Dict со статистикой (см. summarize)
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    result = summarize(samples)
+    if keep_samples:
+        result['samples'] = samples
+    return result
+
+
+def format_result(name, result):
+    """Строка отчета для вывода в консоль"""
+    return (
+        f"{name:<40} mean={result['mean_ms']:.3f}ms "
+        f"p50={result['p50_ms']:.3f}ms p99={result['p99_ms']:.3f}ms "
+        f"(n={result['iterations']})"
+    )
+
+
+def mann_whitney_u(first, second):
+    """
+    Двусторонний U-тест Манна — Уитни
+
+    Время выполнения распределено несимметрично (хвосты от GC и планировщика),
+    поэтому сравниваются ранги, а не средние. p-value считается по
+    нормальному приближению с поправкой на связи и на непрерывность;
+    для сотен замеров на выборку этого достаточно.
+
+    Returns:
+        (U для первой выборки, p-value)
+    """
+    n1, n2 = len(first), len(second)
+    if not n1 or not n2:
+        return 0.0, 1.0
+    values = sorted([(value, 0) for value in first] + [(value, 1) for value in second])
+    n = n1 + n2
+    rank_sum = 0.0
+    ties = 0.0
+    start = 0
+    while start < n:
+        end = start
+        while end + 1 < n and values[end + 1][0] == values[start][0]:
+            end += 1
+        average_rank = (start + end) / 2 + 1
+        rank_sum += average_rank * sum(1 for index in range(start, end + 1) if values[index][1] == 0)
+        tied = end - start + 1
+        ties += tied ** 3 - tied
+        start = end + 1
+
+    u = rank_sum - n1 * (n1 + 1) / 2
+    mean = n1 * n2 / 2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+    if sigma == 0:
+        return u, 1.0
+    z = (abs(u - mean) - 0.5) / sigma
+    return u, min(1.0, 2 * (1 - statistics.NormalDist().cdf(z)))
+
+
+def append_history(path, records):
+    """Дописывает записи запуска в JSONL-файл истории"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def read_history(path):
+    """
+    Запуски из файла истории в порядке записи
+
+    Returns:
+        Dict {id запуска: {имя замера: запись}}
+    """
+    runs = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                runs.setdefault(record['run'], {})[record['name']] = record
+    return runs
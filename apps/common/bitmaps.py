@@ -0,0 +1,91 @@
+"""
+Компактный разреженный битовый массив для числовых ID студентов
+"""
+import struct
+import zlib
+
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS  # ID в одном блоке
+CHUNK_BYTES = CHUNK_SIZE // 8  # 8 КБ на блок
+CHUNK_MASK = CHUNK_SIZE - 1
+
+_HEADER = struct.Struct('<Q')
+
+
+class StudentBitmap:
+    """
+    Разреженный битовый массив: ID делится на номер блока (старшие биты)
+    и смещение в блоке (младшие 16 бит). Память выделяется только под
+    блоки, в которые попал хотя бы один ID, поэтому 12-значные логины
+    NII EDU (462221101004) хранятся компактно, а проверка принадлежности
+    выполняется за O(1).
+    """
+
+    __slots__ = ('chunks',)
+
+    def __init__(self, ids=()):
+        self.chunks = {}
+        for student_id in ids:
+            self.add(student_id)
+
+    def add(self, student_id):
+        student_id = int(student_id)
+        chunk = self.chunks.get(student_id >> CHUNK_BITS)
+        if chunk is None:
+            chunk = self.chunks[student_id >> CHUNK_BITS] = bytearray(CHUNK_BYTES)
+        offset = student_id & CHUNK_MASK
+        chunk[offset >> 3] |= 1 << (offset & 7)
+
+    def __contains__(self, student_id):
+        try:
+            student_id = int(student_id)
+        except (TypeError, ValueError):
+            return False
+        chunk = self.chunks.get(student_id >> CHUNK_BITS)
+        if chunk is None:
+            return False
+        offset = student_id & CHUNK_MASK
+        return bool(chunk[offset >> 3] & (1 << (offset & 7)))
+
+    def __len__(self):
+        return sum(
+            int.from_bytes(chunk, 'little').bit_count() for chunk in self.chunks.values()
+        )
+
+    def __bool__(self):
+        return bool(self.chunks)
+
+    def update(self, other):
+        """Объединение (OR) с другим битовым массивом"""
+        for key, other_chunk in other.chunks.items():
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                self.chunks[key] = bytearray(other_chunk)
+            else:
+                merged = int.from_bytes(chunk, 'little') | int.from_bytes(other_chunk, 'little')
+                self.chunks[key] = bytearray(merged.to_bytes(CHUNK_BYTES, 'little'))
+        return self
+
+    @property
+    def nbytes(self):
+        """Объем данных блоков в памяти"""
+        return len(self.chunks) * CHUNK_BYTES
+
+    def to_bytes(self):
+        """Сжатое представление для хранения в БД или кэше"""
+        payload = b''.join(
+            _HEADER.pack(key) + bytes(self.chunks[key]) for key in sorted(self.chunks)
+        )
+        return zlib.compress(payload)
+
+    @classmethod
+    def from_bytes(cls, data):
+        bitmap = cls()
+        if not data:
+            return bitmap
+        payload = zlib.decompress(bytes(data))
+        step = _HEADER.size + CHUNK_BYTES
+        for start in range(0, len(payload), step):
+            (key,) = _HEADER.unpack_from(payload, start)
+            bitmap.chunks[key] = bytearray(payload[start + _HEADER.size:start + step])
+        return bitmap
@@ -0,0 +1,120 @@
+"""
+Адаптивное ограничение параллельных запросов (load shedding)
+
+Маршруты делятся на классы (CONCURRENCY_ROUTE_CLASSES: имя URL -> класс).
+Для каждого класса из CONCURRENCY_LIMITS воркер держит свой лимит
+одновременных запросов, который подстраивается по AIMD:
+
+    ответ быстрее target_ms  — лимит растет на 1 / limit (примерно +1 за «окно»)
+    медленнее или ошибка 5xx — лимит умножается на backoff
+
+Когда классу не хватает лимита, запрос сразу получает 503 с Retry-After и
+не занимает поток. Так медленный внешний API (вход через NII EDU) забирает
+не больше своего лимита потоков, а публичные страницы продолжают работать.
+
+Лимит хранится в памяти процесса, поэтому имеет смысл только для воркеров,
+которые обслуживают несколько запросов одновременно (gunicorn --threads,
+gthread, ASGI). Синхронный воркер обрабатывает один запрос за раз, лимит в
+нем никогда не срабатывает, поэтому middleware включается явно
+(CONCURRENCY_LIMITS_ENABLED) и без этой настройки отключается при загрузке.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+from .route_profiles import route_name
+
+SHED_MESSAGE = "Xizmat band. Birozdan so'ng qayta urinib ko'ring."
+
+
+class AIMDLimiter:
+    """Лимит одновременных запросов одного класса маршрутов"""
+
+    def __init__(self, initial=16, minimum=1, maximum=256, target_ms=500, backoff=0.9):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_ms = target_ms
+        self.backoff = backoff
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Занимает место; False — лимит исчерпан"""
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, elapsed_ms, failed=False):
+        """Освобождает место и подстраивает лимит по задержке ответа"""
+        with self._lock:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            if failed or elapsed_ms > self.target_ms:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+            elif saturated or self.in_flight * 2 >= self.limit:
+                # Лимит растет, только когда он действительно используется
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    @property
+    def retry_after(self):
+        return max(1, math.ceil(self.target_ms / 1000))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'rejected': self.rejected,
+                'target_ms': self.target_ms,
+            }
+
+
+class ConcurrencyLimitMiddleware:
+    """Отклоняет запросы класса маршрутов сверх его адаптивного лимита"""
+
+    def __init__(self, get_response):
+        if not settings.CONCURRENCY_LIMITS_ENABLED:
+            # Синхронные воркеры: один запрос на процесс, ограничивать нечего
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.route_classes = settings.CONCURRENCY_ROUTE_CLASSES
+        self.limiters = {
+            name: AIMDLimiter(**options)
+            for name, options in settings.CONCURRENCY_LIMITS.items()
+        }
+
+    def route_class(self, request):
+        return self.route_classes.get(route_name(request))
+
+    def __call__(self, request):
+        limiter = self.limiters.get(self.route_class(request))
+        if limiter is None:
+            return self.get_response(request)
+
+        if not limiter.acquire():
+            response = HttpResponse(SHED_MESSAGE, status=503, content_type='text/plain; charset=utf-8')
+            response['Retry-After'] = str(limiter.retry_after)
+            # Отказ при перегрузке — штатная ситуация, не ошибка в логе django.request
+            response._has_been_logged = True
+            return response
+
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = self.get_response(request)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            limiter.release((time.perf_counter() - started) * 1000, failed)
+
+    def stats(self):
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
@@ -1,9 +1,14 @@
 """
 Функции для дашборда Django Unfold
 """
-from django.db.models import Count
+from datetime import timedelta
+
+from django.db.models import Count, Sum
 from django.contrib.auth.models import User
-from apps.surveys.models import Survey
+from django.utils import timezone
+from apps.surveys.models import Survey, SurveyDailyStat
+
+from .db import pool_stats
 
 
 def dashboard_callback(request, context):
@@ -19,14 +24,31 @@ def dashboard_callback(request, context):
     # Последние опросы
     recent_surveys = Survey.objects.select_related('created_by').order_by('-created_at')[:5]
     
+    # Просмотры за сегодня и за последние 7 дней
+    today = timezone.localdate()
+    week_stats = SurveyDailyStat.objects.filter(date__gt=today - timedelta(days=7))
+    views_today = week_stats.filter(date=today).aggregate(
+        views=Sum('views'), opens=Sum('opens')
+    )
+    views_week = week_stats.aggregate(views=Sum('views'), opens=Sum('opens'))
+    popular_surveys = Survey.objects.filter(
+        daily_stats__date__gt=today - timedelta(days=7)
+    ).annotate(week_views=Sum('daily_stats__views')).order_by('-week_views')[:5]
+    
     context.update({
         'dashboard_stats': {
             'total_surveys': total_surveys,
             'active_surveys': active_surveys,
             'inactive_surveys': inactive_surveys,
             'total_users': total_users,
+            'views_today': views_today['views'] or 0,
+            'opens_today': views_today['opens'] or 0,
+            'views_week': views_week['views'] or 0,
+            'opens_week': views_week['opens'] or 0,
         },
         'recent_surveys': recent_surveys,
+        'popular_surveys': popular_surveys,
+        'db_pool_stats': pool_stats(),
     })
     
     return context 
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""
+Управление соединениями с БД
+
+Режимы (DATABASE_CONN_MODE):
+    request    — соединение открывается и закрывается на каждый запрос
+    persistent — соединение живет CONN_MAX_AGE секунд и проверяется перед
+                 повторным использованием (CONN_HEALTH_CHECKS)
+    pool       — пул соединений внутри процесса (Django 5.1+, PostgreSQL и
+                 psycopg 3 с psycopg_pool); иначе — как persistent
+
+Модуль импортируется из settings, поэтому не обращается к django.conf.
+"""
+import django
+from django.core.exceptions import ImproperlyConfigured
+
+CONNECTION_MODES = ('request', 'persistent', 'pool')
+
+
+def supports_pool(config):
+    """Поддерживает ли бэкенд встроенный пул Django (5.1+, PostgreSQL, psycopg 3)"""
+    # До Django 5.1 OPTIONS['pool'] передается в psycopg.connect как есть
+    if django.VERSION < (5, 1) or not config.get('ENGINE', '').endswith('postgresql'):
+        return False
+    try:
+        import psycopg  # noqa: F401
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def configure_connection(config, mode, max_age=60, pool_size=5, max_overflow=5, pool_timeout=10):
+    """
+    Применяет режим управления соединениями к настройкам одной БД
+
+    Args:
+        config: Словарь из DATABASES
+        mode: Один из CONNECTION_MODES
+        max_age: CONN_MAX_AGE для режима persistent
+        pool_size: Минимальное количество соединений в пуле
+        max_overflow: Сколько соединений сверх pool_size можно открыть под нагрузкой
+        pool_timeout: Сколько секунд ждать свободного соединения
+
+    Returns:
+        Новый словарь настроек
+    """
+    if mode not in CONNECTION_MODES:
+        raise ImproperlyConfigured(
+            f"DATABASE_CONN_MODE должен быть одним из {', '.join(CONNECTION_MODES)}"
+        )
+
+    config = {**config, 'OPTIONS': dict(config.get('OPTIONS', {}))}
+    if mode == 'request':
+        config['CONN_MAX_AGE'] = 0
+        return config
+
+    if mode == 'pool' and supports_pool(config):
+        from psycopg_pool import ConnectionPool
+
+        # С пулом соединение возвращается в пул в конце запроса
+        config['CONN_MAX_AGE'] = 0
+        config['CONN_HEALTH_CHECKS'] = False
+        config['OPTIONS']['pool'] = {
+            'min_size': pool_size,
+            'max_size': pool_size + max_overflow,
+            'timeout': pool_timeout,
+            # Проверка соединения при выдаче из пула
+            'check': ConnectionPool.check_connection,
+        }
+        return config
+
+    config['CONN_MAX_AGE'] = max_age
+    config['CONN_HEALTH_CHECKS'] = True
+    return config
+
+
+def connection_mode(config):
+    """Фактический режим соединений по настройкам БД"""
+    if config.get('OPTIONS', {}).get('pool'):
+        return 'pool'
+    if config.get('CONN_MAX_AGE'):
+        return 'persistent'
+    return 'request'
+
+
+def pool_stats():
+    """
+    Метрики соединений текущего процесса по всем БД
+
+    Returns:
+        Dict alias -> {mode, ...}; для пула добавляются метрики psycopg_pool
+        (pool_size, pool_available, requests_waiting, requests_wait_ms, ...)
+    """
+    from django.db import connections
+
+    stats = {}
+    for alias in connections:
+        connection = connections[alias]
+        item = {'mode': connection_mode(connection.settings_dict)}
+        if item['mode'] == 'pool':
+            pool = getattr(connection, 'pool', None)
+            if pool is not None:
+                item.update(pool.get_stats())
+        else:
+            item['connected'] = connection.connection is not None
+        stats[alias] = item
+    return stats
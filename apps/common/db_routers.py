@@ -0,0 +1,91 @@
+"""
+Маршрутизация запросов к БД: публичные страницы читают с реплик
+
+Представления, помеченные декоратором read_from_replica, читают данные с
+одной из реплик DATABASE_REPLICAS. Запись и все остальные запросы (админка,
+вход NII EDU) идут в default. После любого изменяющего запроса (POST и т.п.)
+браузер на DATABASE_REPLICA_STICKY_SECONDS закрепляется за основной БД,
+чтобы администратор сразу видел свои изменения, даже если реплика отстает.
+"""
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+PIN_COOKIE = 'db_pin'
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def is_pinned_to_primary(request):
+    """Недавно был изменяющий запрос из этого браузера"""
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def read_from_replica(view_func):
+    """Декоратор представления: чтение с реплики, если она настроена"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas or is_pinned_to_primary(request):
+            return view_func(request, *args, **kwargs)
+
+        token = _read_alias.set(random.choice(replicas))
+        try:
+            response = view_func(request, *args, **kwargs)
+            # Шаблоны TemplateResponse рендерятся здесь же, тоже с реплики
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            return response
+        finally:
+            _read_alias.reset(token)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    """Чтение с реплики только внутри read_from_replica, запись — в default"""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {'default', *getattr(settings, 'DATABASE_REPLICAS', [])}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+class ReplicaStickinessMiddleware:
+    """Закрепляет браузер за основной БД после изменяющего запроса"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        sticky_seconds = getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 0)
+        if (
+            getattr(settings, 'DATABASE_REPLICAS', [])
+            and sticky_seconds
+            and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+            and response.status_code < 400
+        ):
+            response.set_cookie(
+                PIN_COOKIE,
+                str(time.time() + sticky_seconds),
+                max_age=sticky_seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,90 @@
+"""
+Сравнение двух запусков microbench из файла истории
+
+Для каждого замера, который есть в обоих запусках, сравниваются исходные
+замеры U-тестом Манна — Уитни. Регрессия — значимая разница (p < --alpha)
+и рост медианы больше --threshold; улучшение — то же в обратную сторону.
+Остальные различия считаются шумом.
+
+Порог нужен потому, что при сотнях замеров тест находит значимыми и
+сдвиги в несколько процентов между запусками одного и того же кода
+(частота процессора, соседние процессы). Запуски стоит сравнивать на
+одной машине.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.common.benchmarks import mann_whitney_u, read_history
+
+
+def find_run(runs, prefix):
+    matches = [run for run in runs if run.startswith(prefix)]
+    if len(matches) != 1:
+        raise CommandError(
+            f"Запуск '{prefix}' не найден" if not matches
+            else f"'{prefix}' подходит к нескольким запускам: {', '.join(matches)}"
+        )
+    return matches[0]
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает два запуска microbench и отмечает значимые регрессии'
+
+    def add_arguments(self, parser):
+        parser.add_argument('base', nargs='?', help='Id (или начало id) базового запуска, по умолчанию предпоследний')
+        parser.add_argument('head', nargs='?', help='Id нового запуска, по умолчанию последний')
+        parser.add_argument('--history', default=None, help='Файл истории (по умолчанию BENCHMARK_HISTORY_PATH)')
+        parser.add_argument('--alpha', type=float, default=0.01, help='Уровень значимости')
+        parser.add_argument('--threshold', type=float, default=0.10, help='Минимальное изменение медианы (доля)')
+        parser.add_argument('--fail-on-regression', action='store_true', help='Код выхода 1 при регрессиях (для CI)')
+        parser.add_argument('--list', action='store_true', help='Показать запуски в истории')
+
+    def handle(self, *args, **options):
+        path = options['history'] or settings.BENCHMARK_HISTORY_PATH
+        try:
+            runs = read_history(path)
+        except FileNotFoundError:
+            raise CommandError(f'Файл истории {path} не найден: сначала запустите microbench')
+
+        if options['list']:
+            for run, records in runs.items():
+                label = next(iter(records.values())).get('label')
+                self.stdout.write(f"{run}  замеров: {len(records)}" + (f'  {label}' if label else ''))
+            return
+
+        ids = list(runs)
+        if options['base'] is None and len(ids) < 2:
+            raise CommandError('В истории меньше двух запусков')
+        base = find_run(ids, options['base']) if options['base'] else ids[-2]
+        head = find_run(ids, options['head']) if options['head'] else ids[-1]
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{base} -> {head}'))
+
+        regressions = []
+        for name, head_record in runs[head].items():
+            base_record = runs[base].get(name)
+            if base_record is None:
+                self.stdout.write(f'  {name:<44} новый замер')
+                continue
+            before, after = base_record['p50_ms'], head_record['p50_ms']
+            change = after / before - 1 if before else 0.0
+            _, p_value = mann_whitney_u(base_record['samples'], head_record['samples'])
+
+            line = (
+                f'  {name:<44} {before:.3f} -> {after:.3f} мс '
+                f"({change:+.1%}, p{'<1e-16' if p_value < 1e-16 else f'={p_value:.2g}'})"
+            )
+            if p_value < options['alpha'] and change > options['threshold']:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f'{line}  регрессия'))
+            elif p_value < options['alpha'] and change < -options['threshold']:
+                self.stdout.write(self.style.SUCCESS(f'{line}  улучшение'))
+            else:
+                self.stdout.write(line)
+
+        if regressions:
+            message = f'Значимые регрессии: {len(regressions)}'
+            if options['fail_on_regression']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('Значимых регрессий нет'))
@@ -0,0 +1,75 @@
+"""
+Сравнение режимов соединений с БД: на каждый запрос / постоянные / пул
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+from apps.common.benchmarks import format_result, summarize
+from apps.common.db import CONNECTION_MODES, configure_connection, connection_mode, pool_stats
+from apps.surveys.models import Survey
+
+
+class Command(BaseCommand):
+    help = 'Замер задержки запроса к БД в режимах request / persistent / pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--modes', default=','.join(CONNECTION_MODES))
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--pool-size', type=int, default=4)
+
+    def handle(self, *args, **options):
+        base = connections.settings[options['database']]
+        for mode in options['modes'].split(','):
+            mode = mode.strip()
+            if mode not in CONNECTION_MODES:
+                raise CommandError(f'Неизвестный режим: {mode}')
+
+            # Отдельный alias на каждый режим: пул создается при первом обращении
+            alias = f'bench_{mode}'
+            config = configure_connection(base, mode, pool_size=options['pool_size'])
+            connections.settings[alias] = config
+            effective = connection_mode(config)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                mode if effective == mode else f'{mode} (бэкенд не поддерживает, {effective})'
+            ))
+            try:
+                result = self._bench(alias, options['requests'], options['concurrency'])
+                self.stdout.write('  ' + format_result('request', result))
+                self.stdout.write(f"  {pool_stats().get(alias, {})}")
+            finally:
+                self._close(alias)
+
+    def _bench(self, alias, total, concurrency):
+        slug = Survey.objects.using(alias).values_list('slug', flat=True).first() or ''
+
+        def handle_request(_):
+            # Повторяет жизненный цикл запроса: сигналы закрывают или
+            # возвращают соединение так же, как в HTTP-обработчике
+            start = time.perf_counter()
+            request_started.send(sender=self.__class__)
+            try:
+                Survey.objects.using(alias).filter(slug=slug, is_active=True).first()
+            finally:
+                request_finished.send(sender=self.__class__)
+            return (time.perf_counter() - start) * 1000
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(handle_request, range(concurrency * 2)))  # прогрев
+            samples = list(executor.map(handle_request, range(total)))
+            # Соединения рабочих потоков закрываются в самих потоках
+            list(executor.map(lambda _: connections[alias].close(), range(concurrency)))
+        return summarize(samples)
+
+    def _close(self, alias):
+        connection = connections[alias]
+        connection.close()
+        if connection_mode(connection.settings_dict) == 'pool':
+            connection.close_pool()
+        del connections[alias]
+        del connections.settings[alias]
@@ -0,0 +1,210 @@
+"""
+Нагрузочный тест: задержка списка опросов при медленном NII EDU API
+
+Поднимает приложение на WSGI-сервере с фиксированным числом потоков (как
+воркер gunicorn с --threads) и заглушку NII EDU API с задержкой. Часть
+клиентов постоянно входит через NII EDU, остальные открывают список
+опросов. Сценарии: здоровый и медленный API, каждый без ограничителя и с
+ConcurrencyLimitMiddleware.
+"""
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+from urllib import error, parse, request as urllib_request
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from apps.common.benchmarks import summarize
+from config.celery import app as celery_app
+from apps.surveys.models import Survey
+from apps.surveys.services import NIIEDUAuthService
+
+MIDDLEWARE_PATH = 'apps.common.concurrency.ConcurrencyLimitMiddleware'
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI-сервер с фиксированным пулом потоков; остальные запросы ждут в очереди"""
+
+    def __init__(self, address, threads):
+        super().__init__(address, QuietHandler)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def upstream_handler(delay):
+    """Заглушка NII EDU API: отвечает 401 через delay секунд"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(delay)
+            self.send_response(401)
+            self.send_header('Content-Length', '12')
+            self.end_headers()
+            self.wfile.write(b'Unauthorized')
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест: p99 списка опросов при деградации NII EDU API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Потоков воркера')
+        parser.add_argument('--login-clients', type=int, default=16)
+        parser.add_argument('--list-clients', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=10.0)
+        parser.add_argument('--healthy-delay', type=float, default=0.05)
+        parser.add_argument('--degraded-delay', type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        local_cache = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'auth': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'auth'},
+        }
+        eager = celery_app.conf['CELERY_TASK_ALWAYS_EAGER']
+        # Фоновые задачи (телеметрия входа) выполняются на месте, без брокера
+        celery_app.conf['CELERY_TASK_ALWAYS_EAGER'] = True
+        try:
+            with tempfile.TemporaryDirectory() as tmp, override_settings(
+                CACHES=local_cache, SURVEY_CATALOG_PATH=Path(tmp) / 'catalog.bin'
+            ):
+                self._bench(options)
+        finally:
+            celery_app.conf['CELERY_TASK_ALWAYS_EAGER'] = eager
+
+    def _bench(self, options):
+        survey, _ = Survey.objects.get_or_create(
+            slug='bench-load-shedding',
+            defaults={
+                'title': 'Нагрузочный тест',
+                'google_form_url': 'https://docs.google.com/forms/d/e/bench/viewform',
+                'is_login_req': True,
+            },
+        )
+        without_limiter = [path for path in settings.MIDDLEWARE if path != MIDDLEWARE_PATH]
+        with_limiter = [without_limiter[0], MIDDLEWARE_PATH, *without_limiter[1:]]
+        try:
+            for name, delay, middleware in [
+                ('API в норме, без ограничителя', options['healthy_delay'], without_limiter),
+                ('API в норме, с ограничителем', options['healthy_delay'], with_limiter),
+                ('API медленный, без ограничителя', options['degraded_delay'], without_limiter),
+                ('API медленный, с ограничителем', options['degraded_delay'], with_limiter),
+            ]:
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self._run(survey.slug, delay, middleware, options)
+        finally:
+            survey.delete()
+
+    def _run(self, slug, delay, middleware, options):
+        upstream = ThreadingHTTPServer(('127.0.0.1', 0), upstream_handler(delay))
+        threading.Thread(target=upstream.serve_forever, daemon=True).start()
+
+        local_settings = override_settings(
+            MIDDLEWARE=middleware,
+            CONCURRENCY_LIMITS_ENABLED=True,
+            # Без записи сессий и сообщений в БД: тест нагружает только потоки
+            SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+            MESSAGE_STORAGE='django.contrib.messages.storage.cookie.CookieStorage',
+            ALLOWED_HOSTS=['*'],
+        )
+        login_url = f'http://127.0.0.1:{upstream.server_port}/auth/login'
+        with local_settings, mock.patch.object(NIIEDUAuthService, 'LOGIN_URL', login_url):
+            server = PooledWSGIServer(('127.0.0.1', 0), options['threads'])
+            server.set_app(WSGIHandler())
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base = f'http://127.0.0.1:{server.server_port}'
+            try:
+                results = self._load(base, slug, options)
+            finally:
+                server.shutdown()
+                server.server_close()
+                server.pool.shutdown(wait=True)
+                upstream.shutdown()
+                upstream.server_close()
+
+        list_stats = summarize(results['list_ms'])
+        self.stdout.write(
+            f"  список: p50={list_stats['p50_ms']:.0f} мс p99={list_stats['p99_ms']:.0f} мс "
+            f"(n={list_stats['iterations']}, ошибок {results['list_errors']})"
+        )
+        self.stdout.write(
+            f"  вход: обработано {results['login_ok']}, 503 {results['login_shed']}, "
+            f"ошибок {results['login_errors']}"
+        )
+
+    def _load(self, base, slug, options):
+        deadline = time.monotonic() + options['duration']
+        results = {
+            'list_ms': [], 'list_errors': 0,
+            'login_ok': 0, 'login_shed': 0, 'login_errors': 0,
+        }
+        lock = threading.Lock()
+        login_body = parse.urlencode({'login': '462221101004', 'password': 'wrongpass'}).encode()
+
+        def fetch(url, data=None):
+            try:
+                with urllib_request.urlopen(url, data=data, timeout=30) as response:
+                    response.read()
+                    return response.status
+            except error.HTTPError as e:
+                return e.code
+            except OSError:
+                return None
+
+        def login_client():
+            while time.monotonic() < deadline:
+                status = fetch(f'{base}/survey/{slug}/login/', login_body)
+                with lock:
+                    if status == 503:
+                        results['login_shed'] += 1
+                    elif status == 200:
+                        results['login_ok'] += 1
+                    else:
+                        results['login_errors'] += 1
+                if status == 503:
+                    time.sleep(0.05)  # короткая пауза вместо полного Retry-After
+
+        def list_client():
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                status = fetch(f'{base}/')
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    if status == 200:
+                        results['list_ms'].append(elapsed)
+                    else:
+                        results['list_errors'] += 1
+                time.sleep(0.02)
+
+        clients = [login_client] * options['login_clients'] + [list_client] * options['list_clients']
+        with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+            for future in [executor.submit(client) for client in clients]:
+                future.result()
+        return results
@@ -0,0 +1,103 @@
+"""
+Накладные расходы middleware на публичных страницах до и после профилей маршрутов
+
+    до      все маршруты проходят полный стек (ROUTE_PROFILES пуст)
+    после   список опросов и embed с профилем 'lean' (ROUTE_PROFILES из настроек)
+
+Запросы идут от «вернувшегося» браузера с cookie сессии, CSRF и сообщений,
+как после входа через NII EDU или в админку. Сначала замеряется только
+RouteProfileMiddleware с пустым view (накладные расходы стека), затем
+запрос целиком через тестовый клиент (список отдается из кэша страниц).
+"""
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from apps.common.benchmarks import format_result, measure
+from apps.common.route_profiles import RouteProfileMiddleware
+from apps.surveys.models import Survey
+
+COOKIES = {'sessionid': 'x' * 32, 'csrftoken': 'y' * 32, 'messages': 'z' * 32}
+
+SCENARIOS = {
+    'до': {},
+    'после': settings.ROUTE_PROFILES,
+}
+
+
+class Command(BaseCommand):
+    help = 'Время запроса публичных страниц с полным стеком middleware и с профилем lean'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        local_cache = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sessions'},
+        }
+        with tempfile.TemporaryDirectory() as tmp, transaction.atomic():
+            survey = Survey.objects.create(
+                title='Замер middleware',
+                slug='bench-middleware',
+                google_form_url='https://docs.google.com/forms/d/e/bench/viewform',
+            )
+            try:
+                with override_settings(
+                    CACHES=local_cache,
+                    ALLOWED_HOSTS=['*'],
+                    DEBUG=False,
+                    SURVEY_COUNTER_BACKEND='memory',
+                    SURVEY_CATALOG_PATH=Path(tmp) / 'catalog.bin',
+                ):
+                    self._bench(survey, options)
+            finally:
+                transaction.set_rollback(True)
+
+    def _bench(self, survey, options):
+        urls = {
+            'survey_list.html': reverse('surveys:survey_list'),
+            'survey_embed.html': reverse('surveys:survey_embed', args=[survey.slug]),
+        }
+        cookie = '; '.join(f'{name}={value}' for name, value in COOKIES.items())
+        factory = RequestFactory()
+        results = {}
+        for scenario, route_profiles in SCENARIOS.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(scenario))
+            with override_settings(ROUTE_PROFILES=route_profiles):
+                middleware = RouteProfileMiddleware(
+                    # Как обработчик Django: process_view, затем view
+                    lambda request: middleware.process_view(request, None, (), {}) or HttpResponse()
+                )
+                client = Client()
+                for name, value in COOKIES.items():
+                    client.cookies[name] = value
+
+                for title, url in urls.items():
+                    result = measure(
+                        lambda: middleware(factory.get(url, HTTP_COOKIE=cookie)),
+                        iterations=options['iterations'],
+                    )
+                    results.setdefault(f'{title}: middleware', {})[scenario] = result
+                    self.stdout.write(f"  {format_result(f'{title}: middleware', result)}")
+
+                    response = client.get(url)
+                    result = measure(lambda: client.get(url), iterations=options['iterations'])
+                    results.setdefault(f'{title}: запрос', {})[scenario] = result
+                    self.stdout.write(
+                        f"  {format_result(f'{title}: запрос', result)}  Vary: {response.get('Vary', '—')}"
+                    )
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Экономия на запрос (по медиане)'))
+        for title, by_scenario in results.items():
+            before, after = by_scenario['до']['p50_ms'], by_scenario['после']['p50_ms']
+            self.stdout.write(
+                f'  {title:<36} {(before - after) * 1000:.0f} мкс ({(before - after) / before:.0%})'
+            )
@@ -0,0 +1,75 @@
+"""
+Сравнение ввода-вывода сессий для разных SESSION_BACKEND
+"""
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.common.benchmarks import format_result, measure
+
+
+class Command(BaseCommand):
+    help = 'Замер операций с сессиями для бэкендов db / redis / redis_migrate'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backends',
+            default='db,redis',
+            help='Список бэкендов через запятую (ключи SESSION_ENGINES)',
+        )
+        parser.add_argument('--iterations', type=int, default=500)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        for backend in options['backends'].split(','):
+            backend = backend.strip()
+            if backend not in settings.SESSION_ENGINES:
+                raise CommandError(f'Неизвестный бэкенд сессий: {backend}')
+
+            store_class = import_module(settings.SESSION_ENGINES[backend]).SessionStore
+            self.stdout.write(self.style.MIGRATE_HEADING(backend))
+            try:
+                self._bench_backend(store_class, iterations)
+            except Exception as e:
+                self.stderr.write(f'  пропущен: {e}')
+
+    def _bench_backend(self, store_class, iterations):
+        created_keys = []
+
+        def create():
+            session = store_class()
+            session['niiedu_login'] = '462221101004'
+            session.create()
+            created_keys.append(session.session_key)
+
+        def load():
+            session = store_class(created_keys[-1])
+            session.get('niiedu_login')
+
+        def repeat_login():
+            # Повторный вход с тем же логином: запись пропускается
+            session = store_class(created_keys[-1])
+            if session.get('niiedu_login') != '462221101004':
+                session['niiedu_login'] = '462221101004'
+            if session.modified:
+                session.save()
+
+        def forced_write():
+            session = store_class(created_keys[-1])
+            session['niiedu_login'] = '462221101004'
+            session.save()
+
+        try:
+            for name, func in [
+                ('create', create),
+                ('load', load),
+                ('repeat login (lazy write)', repeat_login),
+                ('repeat login (forced write)', forced_write),
+            ]:
+                result = measure(func, iterations=iterations)
+                self.stdout.write('  ' + format_result(name, result))
+        finally:
+            for session_key in created_keys:
+                store_class().delete(session_key)
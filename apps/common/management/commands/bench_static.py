@@ -0,0 +1,165 @@
+"""
+Байты на страницу и оценка времени до первой отрисовки до и после сборки статики
+
+Сравниваются два варианта раздачи статики:
+
+    до      StaticFilesStorage: имена без хэша, без сжатия, повторный визит
+            перепроверяет каждый файл (304)
+    после   CompressedManifestStaticFilesStorage + PrecompressedStaticMiddleware:
+            br / gzip копии, immutable, повторный визит без запросов статики
+
+Время до первой отрисовки оценивается моделью: рендер на сервере + RTT и
+передача HTML + (если есть блокирующие ресурсы) еще один RTT и передача
+блокирующих CSS / JS по каналу --bandwidth-kbps. Внешние ресурсы (CDN,
+шрифты) офлайн не измеряются и в модель не входят.
+"""
+import gzip
+import re
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from apps.surveys.models import Survey
+
+ASSET_PATTERN = re.compile(r'<(link|script)\b([^>]*)>', re.IGNORECASE)
+URL_PATTERN = re.compile(r'\b(?:href|src)="([^"]+)"')
+
+SCENARIOS = {
+    'до': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    'после': 'apps.common.staticfiles.CompressedManifestStaticFilesStorage',
+}
+
+
+def page_assets(html):
+    """
+    Ресурсы страницы: (url, блокирует ли отрисовку)
+
+    Блокирующие — таблицы стилей и синхронные скрипты до </head>.
+    """
+    head_end = html.find('</head>')
+    assets = []
+    for match in ASSET_PATTERN.finditer(html):
+        tag, attributes = match.group(1).lower(), match.group(2)
+        url = URL_PATTERN.search(attributes)
+        if url is None:
+            continue
+        if tag == 'link' and 'stylesheet' not in attributes:
+            continue
+        in_head = head_end == -1 or match.start() < head_end
+        blocking = in_head and (
+            tag == 'link' or not re.search(r'\b(async|defer)\b|type="module"', attributes)
+        )
+        assets.append((url.group(1), blocking))
+    return assets
+
+
+class Command(BaseCommand):
+    help = 'Байты на страницу и оценка первой отрисовки до и после сборки статики'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rtt-ms', type=float, default=150)
+        parser.add_argument('--bandwidth-kbps', type=float, default=1600, help='Канал клиента (1600 — «медленный 4G»)')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp, transaction.atomic():
+            admin = User.objects.create_superuser('bench-static', 'bench@example.com', 'bench-static')
+            Survey.objects.bulk_create([
+                Survey(
+                    title=f'Опрос {number}',
+                    slug=f'bench-static-{number}',
+                    google_form_url=f'https://docs.google.com/forms/d/e/{number}/viewform',
+                    description='Описание опроса ' * 5,
+                )
+                for number in range(24)
+            ])
+            try:
+                for scenario, backend in SCENARIOS.items():
+                    root = Path(tmp) / scenario
+                    self._scenario(scenario, backend, root, admin, options)
+            finally:
+                transaction.set_rollback(True)
+
+    def _scenario(self, scenario, backend, root, admin, options):
+        storages = {**settings.STORAGES, 'staticfiles': {'BACKEND': backend}}
+        # Свой кэш страниц на сценарий: ссылки на статику в HTML различаются
+        local_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'bench-static-{scenario}',
+        }}
+        with override_settings(
+            STORAGES=storages, STATIC_ROOT=root, DEBUG=False, SERVE_STATIC=True,
+            ALLOWED_HOSTS=['*'], CACHES=local_cache,
+            SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+            SURVEY_CATALOG_PATH=root / 'catalog.bin',
+        ):
+            started = time.perf_counter()
+            call_command('collectstatic', interactive=False, verbosity=0)
+            build_s = time.perf_counter() - started
+            files = [path for path in root.rglob('*') if path.is_file()]
+            compressed = sum(1 for path in files if path.suffix in ('.gz', '.br'))
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{scenario}: collectstatic {build_s:.1f} с, файлов {len(files)}, сжатых копий {compressed}'
+            ))
+
+            client = Client()
+            for title, url, login in [
+                ('survey_list.html', reverse('surveys:survey_list'), False),
+                ('админка: список опросов', reverse('admin:surveys_survey_changelist'), True),
+            ]:
+                if login:
+                    client.force_login(admin)
+                self._page(client, title, url, scenario == 'после', options)
+
+    def _page(self, client, title, url, optimized, options):
+        started = time.perf_counter()
+        response = client.get(url)
+        server_ms = (time.perf_counter() - started) * 1000
+        html = response.content.decode()
+        html_bytes = len(response.content)
+
+        local_bytes = blocking_bytes = blocking_count = 0
+        external = []
+        revalidations = 0
+        for asset, blocking in page_assets(html):
+            if not asset.startswith(settings.STATIC_URL):
+                external.append(asset)
+                continue
+            headers = {'HTTP_ACCEPT_ENCODING': 'br, gzip'} if optimized else {}
+            asset_response = client.get(asset, **headers)
+            # streaming_content тестового клиента сам закрывает ответ после чтения
+            if asset_response.streaming:
+                size = len(b''.join(asset_response.streaming_content))
+            else:
+                size = len(asset_response.content)
+            local_bytes += size
+            if blocking:
+                blocking_bytes += size
+                blocking_count += 1
+            if 'immutable' not in asset_response.get('Cache-Control', ''):
+                revalidations += 1
+
+        bandwidth = options['bandwidth_kbps'] * 1000 / 8 / 1000  # байт в мс
+        rtt = options['rtt_ms']
+        html_ms = server_ms + rtt + html_bytes / bandwidth
+        first_visit = html_ms + (rtt + blocking_bytes / bandwidth if blocking_count else 0)
+        # Повторный визит: HTML заново, статика из кэша браузера или 304
+        repeat_visit = html_ms + (rtt if blocking_count and revalidations else 0)
+
+        self.stdout.write(
+            f'  {title}: HTML {html_bytes / 1024:.1f} КБ (gzip {len(gzip.compress(response.content)) / 1024:.1f} КБ), '
+            f'статика {local_bytes / 1024:.1f} КБ, блокирующая {blocking_bytes / 1024:.1f} КБ '
+            f'({blocking_count} файлов), перепроверок при повторном визите {revalidations}'
+        )
+        self.stdout.write(
+            f'    первая отрисовка (модель): первый визит {first_visit:.0f} мс, '
+            f'повторный {repeat_visit:.0f} мс; внешних ресурсов без учета: {len(external)}'
+        )
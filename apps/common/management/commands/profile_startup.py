@@ -0,0 +1,109 @@
+"""
+Профиль холодного запуска воркера: время импорта модулей и память
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.common.benchmarks import percentile
+
+# Повторяет загрузку gunicorn-воркера: WSGI-приложение и URLconf
+BOOT_SCRIPT = """
+import json, os, resource, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+boot_ms = (time.perf_counter() - started) * 1000
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    with open('/proc/self/status') as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+except OSError:
+    pass
+print(json.dumps({'boot_ms': boot_ms, 'rss_kb': rss_kb}))
+"""
+
+
+def boot_worker(importtime=False):
+    """
+    Запускает чистый интерпретатор и загружает проект
+
+    Returns:
+        (Dict boot_ms / rss_kb, вывод -X importtime или '')
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get(
+        'DJANGO_SETTINGS_MODULE', 'config.settings'
+    )}
+    completed = subprocess.run(
+        command + ['-c', BOOT_SCRIPT],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def parse_importtime(output):
+    """
+    Разбор вывода -X importtime
+
+    Returns:
+        Список (модуль, собственное время мкс, накопленное время мкс)
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Время импорта модулей и память свежезапущенного воркера'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help='Сколько модулей показать')
+        parser.add_argument(
+            '--sort', choices=['self', 'cumulative'], default='cumulative',
+            help='Сортировка модулей',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько запусков без importtime для замера времени загрузки',
+        )
+
+    def handle(self, *args, **options):
+        _, output = boot_worker(importtime=True)
+        modules = parse_importtime(output)
+        column = 1 if options['sort'] == 'self' else 2
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Модули'))
+        self.stdout.write(f'{"собств., мс":>12} {"накопл., мс":>12}  модуль')
+        for name, self_us, cumulative_us in sorted(modules, key=lambda m: -m[column])[:options['top']]:
+            self.stdout.write(f'{self_us / 1000:>12.1f} {cumulative_us / 1000:>12.1f}  {name}')
+
+        packages = defaultdict(int)
+        for name, self_us, _ in modules:
+            packages[name.split('.')[0]] += self_us
+        self.stdout.write(self.style.MIGRATE_HEADING('Пакеты (собственное время)'))
+        for package, total in sorted(packages.items(), key=lambda p: -p[1])[:options['top']]:
+            self.stdout.write(f'{total / 1000:>12.1f}  {package}')
+
+        runs = [boot_worker()[0] for _ in range(options['repeat'])]
+        boot_ms = sorted(run['boot_ms'] for run in runs)
+        self.stdout.write(self.style.MIGRATE_HEADING('Запуск воркера'))
+        self.stdout.write(
+            f'Модулей: {len(modules)}, загрузка: медиана {statistics.median(boot_ms):.0f} мс, '
+            f'p90 {percentile(boot_ms, 90):.0f} мс (n={len(runs)})'
+        )
+        self.stdout.write(f'RSS: {statistics.median(run["rss_kb"] for run in runs) / 1024:.1f} МБ')
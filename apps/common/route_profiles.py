@@ -0,0 +1,148 @@
+"""
+Профили middleware по маршрутам
+
+Middleware с состоянием (сессии, CSRF, пользователь, сообщения, история
+изменений) не входит в MIDDLEWARE напрямую, а подключается через
+RouteProfileMiddleware. Для каждого профиля из ROUTE_MIDDLEWARE_PROFILES
+(профиль -> список middleware) собирается своя цепочка, а маршрут выбирает
+профиль по имени URL (ROUTE_PROFILES: имя URL -> профиль):
+
+    ROUTE_MIDDLEWARE_PROFILES = {'full': STATEFUL_MIDDLEWARE, 'lean': []}
+    ROUTE_PROFILES = {'surveys:survey_list': 'lean'}
+
+Маршруты без профиля (админка, вход NII EDU) проходят полный стек
+(профиль 'full'). Публичные страницы с профилем 'lean' не читают сессию
+и cookie сообщений и не получают Vary: Cookie. Изменяющие запросы
+(POST и т.п.) всегда идут через полный стек, поэтому защита CSRF не
+зависит от настройки маршрутов.
+
+Django сам вызывает process_view, process_exception и
+process_template_response только у middleware из MIDDLEWARE, поэтому
+RouteProfileMiddleware передает их middleware выбранного профиля в том же
+порядке, что и BaseHandler: process_view — от внешнего к внутреннему,
+остальные — от внутреннего к внешнему.
+
+Проверки админки admin.E408–E410 (сессии, пользователь и сообщения в
+MIDDLEWARE) отключены в настройках; вместо них check_route_profiles требует,
+чтобы RouteProfileMiddleware был в MIDDLEWARE, а профиль 'full' содержал
+эти middleware.
+
+Имя маршрута по пути запроса (route_name) кэшируется в памяти процесса:
+resolve() с i18n_patterns стоит ~0.1 мс, а без кэша он выполнялся бы здесь
+и в ConcurrencyLimitMiddleware в дополнение к разбору URL в обработчике.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, get_urlconf, resolve
+from django.utils.module_loading import import_string
+from django.utils.translation import get_language
+
+DEFAULT_PROFILE = 'full'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+ROUTE_CACHE_SIZE = 4096
+
+# Middleware, без которых не работает админка (admin.E408–E410)
+REQUIRED_FULL_MIDDLEWARE = {
+    'django.contrib.sessions.middleware.SessionMiddleware': 'сессии',
+    'django.contrib.auth.middleware.AuthenticationMiddleware': 'пользователь',
+    'django.contrib.messages.middleware.MessageMiddleware': 'сообщения',
+}
+
+
+@lru_cache(maxsize=ROUTE_CACHE_SIZE)
+def _route_name(path, urlconf, language):
+    try:
+        return resolve(path, urlconf).view_name
+    except Resolver404:
+        return None
+
+
+def route_name(request):
+    """Имя URL (например, 'surveys:survey_list') или None для неизвестного пути"""
+    urlconf = getattr(request, 'urlconf', None) or get_urlconf() or settings.ROOT_URLCONF
+    return _route_name(request.path_info, urlconf, get_language())
+
+
+class RouteProfileMiddleware:
+    """Пропускает запрос через цепочку middleware профиля его маршрута"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.route_profiles = settings.ROUTE_PROFILES
+        self.chains = {}
+        self.view_middleware = {}
+        self.template_response_middleware = {}
+        self.exception_middleware = {}
+        for profile, paths in settings.ROUTE_MIDDLEWARE_PROFILES.items():
+            handler = get_response
+            view_middleware = []
+            template_response_middleware = []
+            exception_middleware = []
+            # Как BaseHandler.load_middleware: первый в списке — внешний
+            for path in reversed(paths):
+                try:
+                    middleware = import_string(path)(handler)
+                except MiddlewareNotUsed:
+                    continue
+                if hasattr(middleware, 'process_view'):
+                    view_middleware.insert(0, middleware.process_view)
+                if hasattr(middleware, 'process_template_response'):
+                    template_response_middleware.append(middleware.process_template_response)
+                if hasattr(middleware, 'process_exception'):
+                    exception_middleware.append(middleware.process_exception)
+                handler = middleware
+            self.chains[profile] = handler
+            self.view_middleware[profile] = view_middleware
+            self.template_response_middleware[profile] = template_response_middleware
+            self.exception_middleware[profile] = exception_middleware
+
+    def route_profile(self, request):
+        if request.method not in SAFE_METHODS:
+            return DEFAULT_PROFILE
+        return self.route_profiles.get(route_name(request), DEFAULT_PROFILE)
+
+    def __call__(self, request):
+        request.route_profile = self.route_profile(request)
+        return self.chains[request.route_profile](request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for process_view in self.view_middleware[request.route_profile]:
+            response = process_view(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        for process_template_response in self.template_response_middleware[request.route_profile]:
+            response = process_template_response(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        for process_exception in self.exception_middleware[request.route_profile]:
+            response = process_exception(request, exception)
+            if response is not None:
+                return response
+        return None
+
+
+def check_route_profiles(app_configs, **kwargs):
+    """Заменяет отключенные admin.E408–E410 для middleware в профилях"""
+    errors = []
+    if f'{__name__}.RouteProfileMiddleware' not in settings.MIDDLEWARE:
+        errors.append(checks.Error(
+            'RouteProfileMiddleware отсутствует в MIDDLEWARE: middleware с состоянием не подключены',
+            hint='Верните RouteProfileMiddleware в MIDDLEWARE или снимите SILENCED_SYSTEM_CHECKS admin.E408–E410.',
+            id='common.E001',
+        ))
+    full = settings.ROUTE_MIDDLEWARE_PROFILES.get(DEFAULT_PROFILE, [])
+    for path, purpose in REQUIRED_FULL_MIDDLEWARE.items():
+        if path not in full:
+            errors.append(checks.Error(
+                f"Профиль '{DEFAULT_PROFILE}' не содержит {path} ({purpose}), он нужен админке",
+                hint='Добавьте его в STATEFUL_MIDDLEWARE.',
+                id='common.E002',
+            ))
+    return errors
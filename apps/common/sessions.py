@@ -0,0 +1,58 @@
+"""
+Хранилище сессий в Redis с переносом существующих сессий из БД
+"""
+from django.conf import settings
+from django.contrib.sessions.backends.cache import SessionStore as CacheSessionStore
+from django.contrib.sessions.backends.db import SessionStore as DBSessionStore
+
+# Значение в кэше вместо сессии: ключа нет и в БД, повторно ее не читать
+MISSING = '__missing__'
+
+
+class SessionStore(CacheSessionStore):
+    """
+    Сессии в кэше SESSION_CACHE_ALIAS с чтением старых сессий из django_session.
+
+    Сессия, которой нет в кэше, один раз читается из БД и копируется в кэш,
+    поэтому уже выданные cookie остаются валидными. Если сессии нет и в БД,
+    в кэш на SESSION_COOKIE_AGE пишется отметка MISSING: новые сессии в БД
+    не появляются, и повторные запросы с тем же неизвестным или поддельным
+    ключом больше не обращаются к БД. Новые сессии пишутся только в кэш.
+    После SESSION_COOKIE_AGE можно переключиться на SESSION_BACKEND=redis и
+    очистить таблицу django_session.
+    """
+
+    def load(self):
+        try:
+            session_data = self._cache.get(self.cache_key)
+        except Exception:
+            session_data = None
+        if session_data == MISSING:
+            self._session_key = None
+            return {}
+        if session_data is not None:
+            return session_data
+
+        legacy = DBSessionStore(self.session_key)
+        session_data = legacy.load()
+        if legacy.session_key is None:
+            # Сессии нет ни в кэше, ни в БД
+            if self.session_key is not None:
+                self._cache.set(self.cache_key, MISSING, settings.SESSION_COOKIE_AGE)
+            self._session_key = None
+            return {}
+
+        self._cache.set(
+            self.cache_key,
+            session_data,
+            self.get_expiry_age(expiry=session_data.get('_session_expiry')),
+        )
+        return session_data
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        super().delete(session_key)
+        DBSessionStore().delete(session_key)
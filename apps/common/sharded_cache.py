@@ -0,0 +1,294 @@
+"""
+Кэш, распределенный по нескольким узлам Redis согласованным хэшированием
+
+Каждый ключ хранится на одном узле. Узел выбирается по кольцу хэшей с
+виртуальными узлами (REPLICAS точек на узел), поэтому при добавлении или
+удалении узла переезжает только ~1/N ключей, а не почти все, как при
+hash(key) % N.
+
+Узел, на котором FAILURE_THRESHOLD операций подряд (чтений или записей)
+завершились ошибкой соединения, исключается из кольца на RETRY_AFTER
+секунд, и операции с ним не ждут таймаутов. Ошибки соединения не
+пробрасываются: чтение возвращает промах, запись пропускается — как при
+пустом кэше.
+
+Пока узел исключен, его ключи обслуживают соседние узлы
+(REMAP_ON_FAILURE=True) или они просто недоступны (False — для сессий и
+входа, где копия у соседа означала бы потерю выхода или изменений).
+
+Каждый ключ хранится с эпохой своего «домашнего» узла (ключ EPOCH_KEY на
+самом узле, свой для каждого псевдонима кэша). При возвращении узла в
+кольцо эпоха увеличивается, поэтому значения, записанные до исключения (на
+нем) и во время исключения (у соседей), больше не читаются — вместо
+устаревших данных будет промах. Эпоха увеличивается один раз за сбой, сколько
+бы процессов ни исключили узел: первый вернувший узел процесс занимает
+метку EPOCH_KEY:bumped:<прежняя эпоха>, остальные только читают новую эпоху.
+Остальные процессы перечитывают эпоху узла раз в EPOCH_REFRESH секунд.
+
+Каждый псевдоним в CACHES создает свои клиенты узлов, поэтому у кэшей
+входа, страниц и сессий раздельные пулы соединений.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'apps.common.sharded_cache.ShardedCache',
+            'LOCATION': ['redis://redis-1:6379/0', 'redis://redis-2:6379/0'],
+            'OPTIONS': {
+                'NODE_BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'NODE_OPTIONS': {'socket_timeout': 0.5},
+                'EPOCH_KEY': '_shard_epoch:default',
+            },
+        },
+    }
+"""
+import bisect
+import hashlib
+import logging
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+try:
+    from redis.exceptions import ConnectionError as RedisConnectionError
+    from redis.exceptions import TimeoutError as RedisTimeoutError
+except ImportError:  # redis нужен только узлам RedisCache
+    NODE_ERRORS = (OSError,)
+else:
+    NODE_ERRORS = (OSError, RedisConnectionError, RedisTimeoutError)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPLICAS = 160
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RETRY_AFTER = 30  # секунды
+DEFAULT_EPOCH_REFRESH = 5  # секунды
+EPOCH_KEY = '_shard_epoch'
+_MISSING = object()
+
+
+class HashRing:
+    """Кольцо согласованного хэширования с виртуальными узлами"""
+
+    def __init__(self, nodes, replicas=DEFAULT_REPLICAS):
+        points = sorted(
+            (self.hash(f'{node}#{replica}'), node)
+            for node in nodes
+            for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    @staticmethod
+    def hash(value):
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+    def get_node(self, key):
+        """Узел для ключа или None, если в кольце нет узлов"""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, self.hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+class ShardedCache(BaseCache):
+    """Кэш поверх нескольких узлов (по умолчанию RedisCache) с исключением сбойных"""
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        locations = server.split(',') if isinstance(server, str) else list(server)
+        self._locations = [location.strip() for location in locations if location.strip()]
+        options = params.get('OPTIONS', {})
+        backend = import_string(options.get('NODE_BACKEND', 'django.core.cache.backends.redis.RedisCache'))
+        # Узлы строят ключи с теми же KEY_PREFIX / VERSION / KEY_FUNCTION
+        node_params = {**params, 'OPTIONS': options.get('NODE_OPTIONS', {})}
+        self._nodes = {location: backend(location, node_params) for location in self._locations}
+        self._replicas = options.get('REPLICAS', DEFAULT_REPLICAS)
+        self._failure_threshold = options.get('FAILURE_THRESHOLD', DEFAULT_FAILURE_THRESHOLD)
+        self._retry_after = options.get('RETRY_AFTER', DEFAULT_RETRY_AFTER)
+        self._remap = options.get('REMAP_ON_FAILURE', True)
+        self._epoch_refresh = options.get('EPOCH_REFRESH', DEFAULT_EPOCH_REFRESH)
+        # Без KEY_PREFIX псевдонимы на одних узлах иначе делили бы эпоху
+        self._epoch_key = options.get('EPOCH_KEY', EPOCH_KEY)
+
+        self._lock = threading.Lock()
+        self._failures = dict.fromkeys(self._locations, 0)
+        self._ejected = {}  # узел -> time.monotonic(), когда вернуть его в кольцо
+        self._epochs = {}  # узел -> (эпоха, time.monotonic() последней проверки)
+        self._home_ring = HashRing(self._locations, self._replicas)
+        self._ring = self._home_ring
+
+    # ----- кольцо и здоровье узлов -----
+
+    def _rebuild_ring(self):
+        live = [location for location in self._locations if location not in self._ejected]
+        self._ring = HashRing(live, self._replicas)
+
+    def _current_ring(self):
+        if self._ejected:
+            now = time.monotonic()
+            for location, until in list(self._ejected.items()):
+                if until <= now:
+                    self._rejoin(location)
+        return self._ring
+
+    def _rejoin(self, location):
+        """Возвращает узел в кольцо с новой эпохой (одной на сбой для всех процессов)"""
+        node = self._nodes[location]
+        known, _ = self._epochs.get(location, (0, None))
+        try:
+            # Узел мог перезапуститься без данных: эпоха не уходит назад
+            node.add(self._epoch_key, known, timeout=None)
+            if node.add(f'{self._epoch_key}:bumped:{known}', 1, timeout=None):
+                epoch = node.incr(self._epoch_key)
+            else:
+                epoch = node.get(self._epoch_key, known)
+        except NODE_ERRORS as error:
+            with self._lock:
+                self._ejected[location] = time.monotonic() + self._retry_after
+            logger.warning('Узел кэша %s по-прежнему недоступен: %s', location, error)
+            return
+        with self._lock:
+            previous, _ = self._epochs.get(location, (0, None))
+            self._epochs[location] = (max(epoch, previous), time.monotonic())
+            if self._ejected.pop(location, None) is None:
+                return  # узел уже вернул другой поток
+            # Одна ошибка после возвращения снова исключает узел
+            self._failures[location] = self._failure_threshold - 1
+            self._rebuild_ring()
+        logger.info('Узел кэша %s возвращен в кольцо, эпоха %s', location, epoch)
+
+    def _record_failure(self, location, error):
+        with self._lock:
+            self._failures[location] += 1
+            if location in self._ejected or self._failures[location] < self._failure_threshold:
+                return
+            self._ejected[location] = time.monotonic() + self._retry_after
+            self._rebuild_ring()
+        logger.warning(
+            'Узел кэша %s исключен на %s с после %s ошибок подряд: %s',
+            location, self._retry_after, self._failures[location], error,
+        )
+
+    def _record_success(self, location):
+        if self._failures[location]:
+            self._failures[location] = 0
+
+    def _epoch(self, location):
+        """Эпоха узла; перечитывается с узла раз в EPOCH_REFRESH секунд"""
+        epoch, checked = self._epochs.get(location, (0, None))
+        now = time.monotonic()
+        if location in self._ejected or (checked is not None and now - checked < self._epoch_refresh):
+            return epoch
+        value = self._call(location, 'get', self._epoch_key, _MISSING, failed=_MISSING)
+        if value is not _MISSING:
+            epoch = value
+        elif checked is None:
+            epoch = 0  # ключа эпохи еще нет или узел недоступен
+        self._epochs[location] = (epoch, now)
+        return epoch
+
+    @property
+    def live_nodes(self):
+        """Узлы в кольце (без исключенных)"""
+        self._current_ring()
+        return [location for location in self._locations if location not in self._ejected]
+
+    def _route(self, key, version):
+        """(узел, ключ на узле); узел None — ключ сейчас недоступен"""
+        hashed = self.make_and_validate_key(key, version=version)
+        ring = self._current_ring()
+        home = self._home_ring.get_node(hashed)
+        if home is None or (home in self._ejected and not self._remap):
+            return None, key
+        location = home if home not in self._ejected else ring.get_node(hashed)
+        epoch = self._epoch(home)
+        return location, f'{key}:e{epoch}' if epoch else key
+
+    def node_for(self, key, version=None):
+        """Адрес узла, на котором хранится ключ (None — ключ сейчас недоступен)"""
+        return self._route(key, version)[0]
+
+    def _call(self, location, method, *args, failed=None, **kwargs):
+        if location is None:
+            return failed
+        try:
+            result = getattr(self._nodes[location], method)(*args, **kwargs)
+        except NODE_ERRORS as error:
+            self._record_failure(location, error)
+            return failed
+        self._record_success(location)
+        return result
+
+    def _by_node(self, keys, version):
+        """{узел: {ключ на узле: ключ}}"""
+        groups = {}
+        for key in keys:
+            location, node_key = self._route(key, version)
+            if location is not None:
+                groups.setdefault(location, {})[node_key] = key
+        return groups
+
+    # ----- API кэша -----
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        location, key = self._route(key, version)
+        return self._call(location, 'add', key, value, timeout, version, failed=False)
+
+    def get(self, key, default=None, version=None):
+        location, key = self._route(key, version)
+        return self._call(location, 'get', key, default, version, failed=default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        location, key = self._route(key, version)
+        self._call(location, 'set', key, value, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        location, key = self._route(key, version)
+        return self._call(location, 'touch', key, timeout, version, failed=False)
+
+    def delete(self, key, version=None):
+        location, key = self._route(key, version)
+        return self._call(location, 'delete', key, version, failed=False)
+
+    def has_key(self, key, version=None):
+        location, key = self._route(key, version)
+        return self._call(location, 'has_key', key, version, failed=False)
+
+    def incr(self, key, delta=1, version=None):
+        location, node_key = self._route(key, version)
+        result = self._call(location, 'incr', node_key, delta, version)
+        if result is None:
+            raise ValueError(f"Key '{key}' not found")
+        return result
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for location, node_keys in self._by_node(keys, version).items():
+            values = self._call(location, 'get_many', list(node_keys), version, failed={})
+            found.update({node_keys[node_key]: value for node_key, value in values.items()})
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed_keys = []
+        groups = self._by_node(data, version)
+        for location, node_keys in groups.items():
+            failed = self._call(
+                location, 'set_many', {node_key: data[key] for node_key, key in node_keys.items()},
+                timeout, version, failed=list(node_keys),
+            )
+            failed_keys.extend(node_keys[node_key] for node_key in failed)
+        grouped = {key for node_keys in groups.values() for key in node_keys.values()}
+        return failed_keys + [key for key in data if key not in grouped]
+
+    def delete_many(self, keys, version=None):
+        for location, node_keys in self._by_node(keys, version).items():
+            self._call(location, 'delete_many', list(node_keys), version)
+
+    def clear(self):
+        for location in self.live_nodes:
+            self._call(location, 'clear')
+
+    def close(self, **kwargs):
+        for node in self._nodes.values():
+            node.close(**kwargs)
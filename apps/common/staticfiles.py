@@ -0,0 +1,148 @@
+"""
+Статика для продакшена: хэшированные имена, сжатие при сборке и раздача
+
+collectstatic с CompressedManifestStaticFilesStorage записывает файлы с хэшем
+содержимого в имени (манифест staticfiles.json) и рядом с каждым из них
+сжатые копии .gz и .br (brotli — если установлен пакет brotli). Сжатие
+выполняется один раз при сборке, а не на каждый запрос.
+
+PrecompressedStaticMiddleware отдает STATIC_ROOT: выбирает сжатую копию по
+Accept-Encoding, а файлам из манифеста ставит Cache-Control immutable на год —
+при изменении содержимого меняется имя, и браузер их не перепроверяет.
+"""
+import gzip
+import mimetypes
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # сжатие brotli — опциональная зависимость (extra "static")
+    brotli = None
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+COMPRESS_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.xml', '.html',
+    '.ico', '.ttf', '.otf', '.eot',
+}
+MIN_COMPRESS_SIZE = 256
+
+# Content-Encoding -> расширение сжатой копии, в порядке предпочтения
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def compress_file(path):
+    """
+    Пишет .gz и .br рядом с файлом, если они меньше оригинала
+
+    Returns:
+        Список созданных файлов
+    """
+    path = Path(path)
+    if path.suffix not in COMPRESS_EXTENSIONS or path.stat().st_size < MIN_COMPRESS_SIZE:
+        return []
+    data = path.read_bytes()
+    variants = [('.gz', lambda: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', lambda: brotli.compress(data, quality=11)))
+
+    written = []
+    for suffix, compress in variants:
+        target = path.with_name(path.name + suffix)
+        if target.exists():
+            continue  # имя с хэшем: сжатая копия уже соответствует содержимому
+        compressed = compress()
+        if len(compressed) < len(data):
+            target.write_bytes(compressed)
+            written.append(target)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хэшированные имена через манифест и сжатые при сборке копии .gz / .br"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = {name for name in self.hashed_files.values() if self.exists(name)}
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+            list(executor.map(compress_file, [self.path(name) for name in names]))
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding (q=0 — запрещенные)"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q=') and quality[2:].strip() in ('0', '0.0', '0.00', '0.000'):
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticMiddleware:
+    """Раздает STATIC_ROOT со сжатыми копиями и immutable-кэшированием"""
+
+    def __init__(self, get_response):
+        if settings.DEBUG or not settings.SERVE_STATIC:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.root = Path(settings.STATIC_ROOT).resolve()
+        # Имена из манифеста содержат хэш: их содержимое не меняется
+        self.immutable = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            response = self.serve(request, unquote(request.path_info[len(self.prefix):]))
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        path = (self.root / name).resolve()
+        if not path.is_relative_to(self.root) or not path.is_file():
+            return None
+
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding, served = None, path
+        for coding, suffix in ENCODINGS:
+            candidate = path.with_name(path.name + suffix)
+            if coding in accepted and candidate.is_file():
+                encoding, served = coding, candidate
+                break
+        has_variants = any(path.with_name(path.name + suffix).is_file() for _, suffix in ENCODINGS)
+
+        mtime = path.stat().st_mtime
+        if name in self.immutable:
+            cache_control = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            cache_control = 'public, no-cache'
+
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type, _ = mimetypes.guess_type(path.name)
+            content_type = content_type or 'application/octet-stream'
+            if content_type.startswith('text/') or content_type.endswith('javascript'):
+                content_type += '; charset=utf-8'
+            response = FileResponse(open(served, 'rb'), content_type=content_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['Last-Modified'] = http_date(mtime)
+        response['Cache-Control'] = cache_control
+        if has_variants:
+            response['Vary'] = 'Accept-Encoding'
+        return response
@@ -0,0 +1,28 @@
+"""
+Общие функции для фоновых задач Celery
+"""
+import logging
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(task, *args, **kwargs):
+    """
+    Ставит задачу Celery в очередь после коммита текущей транзакции
+
+    Недоступный брокер не должен ломать запрос пользователя, поэтому
+    ошибки отправки только логируются.
+
+    Args:
+        task: Задача Celery
+        *args, **kwargs: Аргументы задачи (должны сериализоваться в JSON)
+    """
+    def send():
+        try:
+            task.delay(*args, **kwargs)
+        except Exception:
+            logger.exception('Не удалось поставить задачу %s в очередь', task.name)
+
+    transaction.on_commit(send)
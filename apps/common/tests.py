@@ -0,0 +1,623 @@
+import gzip
+import io
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBSessionStore
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import CommandError, call_command
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.template import engines
+from django.template.response import TemplateResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import path, reverse
+
+from apps.surveys.models import Survey
+
+from .benchmarks import mann_whitney_u, read_history
+from .bitmaps import StudentBitmap
+from .concurrency import AIMDLimiter, ConcurrencyLimitMiddleware
+from .db import configure_connection, connection_mode, supports_pool
+from .db_routers import PIN_COOKIE
+from .route_profiles import RouteProfileMiddleware, check_route_profiles
+from .sessions import SessionStore
+from .sharded_cache import ShardedCache
+from .staticfiles import PrecompressedStaticMiddleware
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    },
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth',
+    },
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SESSION_ENGINE='apps.common.sessions')
+class MigratingSessionStoreTests(TestCase):
+    """Тесты переноса сессий из БД в Redis"""
+
+    def setUp(self):
+        caches['sessions'].clear()
+
+    def test_legacy_session_is_still_valid(self):
+        """Тест чтения сессии, созданной бэкендом db"""
+        legacy = DBSessionStore()
+        legacy['niiedu_login'] = '462221101004'
+        legacy.create()
+
+        session = SessionStore(legacy.session_key)
+
+        self.assertEqual(session['niiedu_login'], '462221101004')
+        self.assertEqual(session.session_key, legacy.session_key)
+        self.assertIsNotNone(caches['sessions'].get(session.cache_key))
+
+    def test_new_session_is_not_written_to_db(self):
+        """Тест, что новые сессии пишутся только в кэш"""
+        session = SessionStore()
+        session['niiedu_login'] = '462221101004'
+        session.create()
+
+        self.assertFalse(DBSessionStore().exists(session.session_key))
+        self.assertEqual(
+            SessionStore(session.session_key)['niiedu_login'], '462221101004'
+        )
+
+    def test_unknown_session_key(self):
+        """Тест неизвестного ключа сессии"""
+        session = SessionStore('x' * 32)
+
+        self.assertEqual(session.load(), {})
+        self.assertIsNone(session.session_key)
+
+        # Повторный запрос с тем же ключом не читает БД
+        with self.assertNumQueries(0):
+            session = SessionStore('x' * 32)
+            self.assertEqual(session.load(), {})
+        self.assertIsNone(session.session_key)
+
+        # Новая сессия не получает ключ с отметкой
+        session = SessionStore()
+        with patch.object(session, '_get_new_session_key', side_effect=['x' * 32, 'y' * 32]):
+            session.create()
+        self.assertEqual(session.session_key, 'y' * 32)
+
+
+class StudentBitmapTests(SimpleTestCase):
+    """Тесты разреженного битового массива"""
+
+    def test_membership_and_count(self):
+        """Тест добавления, проверки и подсчета ID"""
+        bitmap = StudentBitmap([462221101004, 462221101005, 462525140999])
+        bitmap.add(462221101004)
+
+        self.assertIn(462221101004, bitmap)
+        self.assertIn('462525140999', bitmap)
+        self.assertNotIn(462221101006, bitmap)
+        self.assertNotIn('abc', bitmap)
+        self.assertEqual(len(bitmap), 3)
+
+    def test_serialization_and_union(self):
+        """Тест сериализации и объединения"""
+        first = StudentBitmap([1, 70000])
+        second = StudentBitmap.from_bytes(StudentBitmap([1, 2, 462221101004]).to_bytes())
+
+        first.update(second)
+
+        self.assertEqual(len(first), 4)
+        self.assertEqual(len(StudentBitmap.from_bytes(first.to_bytes())), 4)
+        self.assertEqual(len(StudentBitmap.from_bytes(None)), 0)
+
+
+# Без снимка каталога: опросы ищутся через ORM
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    DATABASE_REPLICAS=['replica'],
+    SURVEY_CATALOG_PATH=Path(tempfile.gettempdir()) / 'survey_catalog_absent.bin',
+)
+class ReplicaRoutingTests(TestCase):
+    """Тесты чтения публичных страниц с реплики"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Вторая SQLite-БД в памяти играет роль реплики только в этих тестах;
+        # раннер о ней не знает и не создает ее для остальных приложений
+        cls.databases = {'default', 'replica'}
+        connections.settings['replica'] = {
+            **connections.settings['default'],
+            'TEST': {**connections.settings['default']['TEST'], 'NAME': None, 'MIRROR': None},
+        }
+        connections['replica'].creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].creation.destroy_test_db(':memory:', verbosity=0)
+        del connections['replica']
+        del connections.settings['replica']
+        cls.databases = {'default'}
+
+    def setUp(self):
+        caches['default'].clear()
+        Survey.objects.using('replica').create(
+            title='Только на реплике', slug='replica-only',
+            google_form_url='https://docs.google.com/forms/d/e/replica/viewform',
+        )
+
+    def test_list_reads_from_replica(self):
+        """Тест, что список опросов читается с реплики"""
+        response = self.client.get(reverse('surveys:survey_list'))
+
+        self.assertContains(response, 'Только на реплике')
+
+    def test_write_pins_browser_to_primary(self):
+        """Тест закрепления за основной БД после изменяющего запроса"""
+        Survey.objects.create(
+            title='Только на основной', slug='primary-only', is_login_req=True,
+            google_form_url='https://docs.google.com/forms/d/e/primary/viewform',
+        )
+
+        self.assertEqual(self.client.get(reverse('surveys:survey_embed', args=['primary-only'])).status_code, 404)
+
+        response = self.client.post(reverse('surveys:niiedu_login', args=['primary-only']), {})
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        response = self.client.get(reverse('surveys:survey_list'))
+        self.assertContains(response, 'Только на основной')
+        self.assertNotContains(response, 'Только на реплике')
+
+    def test_writes_go_to_primary(self):
+        """Тест, что запись всегда идет в default"""
+        survey = Survey.objects.create(
+            title='Новый', slug='new-survey',
+            google_form_url='https://docs.google.com/forms/d/e/new/viewform',
+        )
+
+        self.assertEqual(survey._state.db, 'default')
+        self.assertFalse(Survey.objects.using('replica').filter(slug='new-survey').exists())
+
+
+class ConnectionModeTests(SimpleTestCase):
+    """Тесты режимов соединений с БД"""
+
+    sqlite = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db.sqlite3'}
+    postgres = {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'survey_db'}
+
+    def test_request_and_persistent_modes(self):
+        """Тест CONN_MAX_AGE и проверок соединения"""
+        request = configure_connection(self.sqlite, 'request')
+        persistent = configure_connection(self.sqlite, 'persistent', max_age=120)
+
+        self.assertEqual(request['CONN_MAX_AGE'], 0)
+        self.assertEqual(persistent['CONN_MAX_AGE'], 120)
+        self.assertTrue(persistent['CONN_HEALTH_CHECKS'])
+        self.assertEqual(connection_mode(persistent), 'persistent')
+
+    def test_pool_mode(self):
+        """Тест пула: для SQLite — постоянные соединения, для PostgreSQL — пул"""
+        self.assertEqual(connection_mode(configure_connection(self.sqlite, 'pool')), 'persistent')
+
+        with patch('apps.common.db.supports_pool', return_value=True), \
+                patch.dict('sys.modules', {'psycopg_pool': Mock()}):
+            config = configure_connection(
+                self.postgres, 'pool', pool_size=4, max_overflow=6, pool_timeout=3
+            )
+
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool']['min_size'], 4)
+        self.assertEqual(config['OPTIONS']['pool']['max_size'], 10)
+        self.assertEqual(config['OPTIONS']['pool']['timeout'], 3)
+        self.assertNotIn('OPTIONS', self.postgres)
+
+    def test_pool_needs_django_51(self):
+        """Тест: до Django 5.1 пул не поддерживается, режим pool — как persistent"""
+        with patch('apps.common.db.django.VERSION', (4, 2, 23, 'final', 0)), \
+                patch.dict('sys.modules', {'psycopg': Mock(), 'psycopg_pool': Mock()}):
+            self.assertFalse(supports_pool(self.postgres))
+            config = configure_connection(self.postgres, 'pool')
+        self.assertNotIn('pool', config['OPTIONS'])
+        self.assertEqual(connection_mode(config), 'persistent')
+
+
+class ConcurrencyLimitTests(SimpleTestCase):
+    """Тесты адаптивного ограничения параллельных запросов"""
+
+    def test_aimd_limit(self):
+        """Тест роста лимита при быстрых ответах и снижения при медленных"""
+        limiter = AIMDLimiter(initial=2, minimum=1, maximum=4, target_ms=100)
+
+        self.assertTrue(limiter.acquire())
+        self.assertTrue(limiter.acquire())
+        self.assertFalse(limiter.acquire())
+        for _ in range(10):
+            limiter.release(10)
+            limiter.acquire()
+        self.assertGreater(limiter.limit, 2)
+
+        for _ in range(20):
+            limiter.release(1000)
+            limiter.acquire()
+        self.assertEqual(limiter.limit, 1)
+        self.assertGreaterEqual(limiter.stats()['rejected'], 1)
+
+    @override_settings(
+        CONCURRENCY_LIMITS_ENABLED=True,
+        CONCURRENCY_ROUTE_CLASSES={'surveys:niiedu_login': 'upstream'},
+        CONCURRENCY_LIMITS={'upstream': {'initial': 1, 'minimum': 1, 'target_ms': 1500}},
+    )
+    def test_saturated_route_class_is_shed(self):
+        """Тест 503 с Retry-After только для исчерпанного класса маршрутов"""
+        factory = RequestFactory()
+        middleware = ConcurrencyLimitMiddleware(lambda request: HttpResponse('ok'))
+        middleware.limiters['upstream'].acquire()  # занят медленным входом
+
+        response = middleware(factory.post('/survey/test/login/'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '2')
+
+        self.assertEqual(middleware(factory.get('/')).status_code, 200)
+
+    @override_settings(CONCURRENCY_LIMITS_ENABLED=False)
+    def test_disabled_for_sync_workers(self):
+        """Тест, что без CONCURRENCY_LIMITS_ENABLED middleware не подключается"""
+        with self.assertRaises(MiddlewareNotUsed):
+            ConcurrencyLimitMiddleware(lambda request: HttpResponse('ok'))
+
+
+class HookMiddleware:
+    """Middleware профиля с process_exception и process_template_response"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        return HttpResponse(f'{exception} {request.user.is_anonymous}', status=503)
+
+    def process_template_response(self, request, response):
+        response.context_data['hook'] = 'ok'
+        return response
+
+
+def _failing_view(request):
+    raise ValueError('boom')
+
+
+def _template_view(request):
+    return TemplateResponse(request, engines['django'].from_string('{{ hook }}'), {})
+
+
+urlpatterns = [
+    path('boom/', _failing_view, name='boom'),
+    path('template/', _template_view, name='template'),
+]
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    SURVEY_CATALOG_PATH=Path(tempfile.gettempdir()) / 'route-profile-tests-missing.bin',
+    SURVEY_COUNTER_BACKEND='memory',
+)
+class RouteProfileTests(TestCase):
+    """Тесты профилей middleware по маршрутам"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.survey = Survey.objects.create(
+            title='Публичный опрос',
+            slug='publichnyj',
+            google_form_url='https://docs.google.com/forms/d/test/viewform',
+        )
+        # Браузер с сессией и cookie CSRF после входа в админку
+        self.client.cookies['sessionid'] = 'x' * 32
+        self.client.cookies['csrftoken'] = 'y' * 32
+
+    def test_public_routes_skip_stateful_middleware(self):
+        """Тест, что список и embed не проходят сессии, CSRF, пользователя и сообщения"""
+        for url in [reverse('surveys:survey_list'), reverse('surveys:survey_embed', args=[self.survey.slug])]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.wsgi_request.route_profile, 'lean')
+            self.assertFalse(hasattr(response.wsgi_request, 'session'))
+            self.assertFalse(hasattr(response.wsgi_request, 'user'))
+            self.assertNotIn('Cookie', response.get('Vary', ''))
+            self.assertFalse(response.cookies)
+
+        response = self.client.get(reverse('admin:login'))
+        self.assertEqual(response.wsgi_request.route_profile, 'full')
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_unsafe_methods_keep_csrf(self):
+        """Тест, что POST на маршрут с профилем lean проверяет CSRF"""
+        middleware = RouteProfileMiddleware(lambda request: HttpResponse('ok'))
+        request = RequestFactory().post(reverse('surveys:survey_embed', args=[self.survey.slug]))
+        middleware(request)
+        self.assertEqual(request.route_profile, 'full')
+        response = middleware.process_view(request, lambda request: None, (), {})
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(
+        ROOT_URLCONF=__name__,
+        ROUTE_MIDDLEWARE_PROFILES={
+            'full': [*settings.STATEFUL_MIDDLEWARE, 'apps.common.tests.HookMiddleware'],
+            'lean': [],
+        },
+    )
+    def test_full_profile_hooks(self):
+        """Тест, что process_exception и process_template_response профиля вызываются"""
+        response = self.client.get('/boom/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.wsgi_request.route_profile, 'full')
+        # Исключение обработано внутри профиля: пользователь уже определен,
+        # а ответ прошел SessionMiddleware (Vary: Cookie)
+        self.assertEqual(response.content, b'boom True')
+        self.assertIn('Cookie', response['Vary'])
+
+        response = self.client.get('/template/')
+        self.assertEqual(response.content, b'ok')
+
+    def test_system_check_requires_admin_middleware(self):
+        """Тест проверки, заменяющей отключенные admin.E408–E410"""
+        self.assertEqual(check_route_profiles(None), [])
+
+        full = [path for path in settings.STATEFUL_MIDDLEWARE if 'messages' not in path]
+        middleware = [path for path in settings.MIDDLEWARE if 'RouteProfile' not in path]
+        with override_settings(ROUTE_MIDDLEWARE_PROFILES={'full': full}, MIDDLEWARE=middleware):
+            self.assertEqual(
+                [error.id for error in check_route_profiles(None)],
+                ['common.E001', 'common.E002'],
+            )
+
+
+class StaticPipelineTests(SimpleTestCase):
+    """Тесты сборки статики со сжатием и раздачи сжатых копий"""
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = Path(root.name)
+        settings_override = override_settings(
+            STATIC_ROOT=self.root,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'apps.common.staticfiles.CompressedManifestStaticFilesStorage'},
+            },
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            DEBUG=False,
+            SERVE_STATIC=True,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hashed = staticfiles_storage.stored_name('css/niu-styles.css')
+        self.middleware = PrecompressedStaticMiddleware(lambda request: HttpResponse(status=404))
+
+    def get(self, name, **headers):
+        response = self.middleware(RequestFactory().get(f'/static/{name}', **headers))
+        if response.streaming:
+            response.body = b''.join(response.streaming_content)
+            response.close()
+        return response
+
+    def test_collectstatic_writes_hashed_and_compressed(self):
+        """Тест имени с хэшем в манифесте и gzip-копии рядом с ним"""
+        self.assertRegex(self.hashed, r'^css/niu-styles\.[0-9a-f]{12}\.css$')
+        original = (self.root / self.hashed).read_bytes()
+        self.assertEqual(gzip.decompress((self.root / f'{self.hashed}.gz').read_bytes()), original)
+        self.assertIn(self.hashed, staticfiles_storage.url('css/niu-styles.css'))
+
+    def test_serves_variant_by_accept_encoding(self):
+        """Тест выбора сжатой копии по Accept-Encoding и immutable для хэшированных имен"""
+        original = (self.root / self.hashed).read_bytes()
+
+        response = self.get(self.hashed, HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.body), original)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'text/css; charset=utf-8')
+
+        response = self.get(self.hashed, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.body, original)
+
+        response = self.get('css/niu-styles.css')
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+
+        response = self.get(self.hashed, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(self.get('../staticfiles.json').status_code, 404)
+
+
+class ShardedCacheTests(SimpleTestCase):
+    """Тесты кэша на нескольких узлах с согласованным хэшированием"""
+
+    def make_cache(self, count, **options):
+        nodes = [f'{self.id()}-node-{number}' for number in range(count)]
+        return ShardedCache(nodes, {'OPTIONS': {
+            'NODE_BACKEND': 'django.core.cache.backends.locmem.LocMemCache', **options,
+        }})
+
+    def test_keys_spread_and_rebalance_minimally(self):
+        """Тест распределения ключей и переезда ~1/N ключей при добавлении узла"""
+        keys = [f'niiedu_auth_{number}' for number in range(6000)]
+        three = self.make_cache(3)
+        before = {key: three.node_for(key) for key in keys}
+        for node in three.live_nodes:
+            self.assertAlmostEqual(list(before.values()).count(node) / len(keys), 1 / 3, delta=0.08)
+
+        four = self.make_cache(4)
+        after = {key: four.node_for(key) for key in keys}
+        moved = [key for key in keys if before[key] != after[key]]
+        self.assertLess(len(moved) / len(keys), 0.35)
+        self.assertEqual({after[key] for key in moved}, {f'{self.id()}-node-3'})
+
+        four.set_many({key: key for key in keys[:100]})
+        self.assertEqual(four.get_many(keys[:100]), {key: key for key in keys[:100]})
+
+    def test_failing_node_is_ejected_and_returns(self):
+        """Тест исключения узла после ошибок подряд и возврата после RETRY_AFTER"""
+        cache = self.make_cache(3, FAILURE_THRESHOLD=2, RETRY_AFTER=30)
+        keys = [f'page_{number}' for number in range(300)]
+        for key in keys:
+            cache.set(key, key)
+        broken = cache.node_for(keys[0])
+        owned = [key for key in keys if cache.node_for(key) == broken]
+        others = {key: cache.node_for(key) for key in keys if key not in owned}
+
+        with patch.object(cache._nodes[broken], 'get', side_effect=ConnectionError('down')):
+            self.assertIsNone(cache.get(owned[0]))  # ошибка соединения — промах
+            self.assertIsNone(cache.get(owned[1]))
+        self.assertNotIn(broken, cache.live_nodes)
+        self.assertNotIn(broken, {cache.node_for(key) for key in owned})
+        # Ключи остальных узлов не переезжают
+        self.assertEqual({key: cache.node_for(key) for key in others}, others)
+        other_key = next(iter(others))
+        self.assertEqual(cache.get(other_key), other_key)
+
+        with patch('apps.common.sharded_cache.time.monotonic', return_value=time.monotonic() + 31):
+            self.assertIn(broken, cache.live_nodes)
+            # Значения до исключения не возвращаются: у узла новая эпоха
+            self.assertIsNone(cache.get(owned[0]))
+            cache.set(owned[0], 'new')
+            self.assertEqual(cache.get(owned[0]), 'new')
+            self.assertEqual(cache.get(other_key), other_key)
+
+    def test_rejoined_node_does_not_resurrect_old_values(self):
+        """Тест: версия, измененная во время исключения узла, не откатывается после возвращения"""
+        cache = self.make_cache(3, FAILURE_THRESHOLD=1, RETRY_AFTER=30)
+        # Другой процесс с теми же узлами (LocMemCache с тем же LOCATION общий)
+        other = self.make_cache(3, FAILURE_THRESHOLD=1, RETRY_AFTER=30, EPOCH_REFRESH=5)
+        cache.set('survey_list_version', 'v1')
+        self.assertEqual(other.get('survey_list_version'), 'v1')
+        home = cache.node_for('survey_list_version')
+
+        with patch.object(cache._nodes[home], 'get', side_effect=ConnectionError('down')):
+            cache.get('survey_list_version')
+        cache.set('survey_list_version', 'v2')  # запись ушла к соседу
+        self.assertNotEqual(cache.node_for('survey_list_version'), home)
+        self.assertEqual(cache.get('survey_list_version'), 'v2')
+
+        now = time.monotonic()
+        with patch('apps.common.sharded_cache.time.monotonic', return_value=now + 31):
+            self.assertIsNone(cache.get('survey_list_version'))
+        # Второй процесс узнает новую эпоху после EPOCH_REFRESH
+        with patch('apps.common.sharded_cache.time.monotonic', return_value=now + 37):
+            self.assertIsNone(other.get('survey_list_version'))
+            cache.set('survey_list_version', 'v3')
+            self.assertEqual(other.get('survey_list_version'), 'v3')
+
+        # Повторное исключение не возвращает копию у соседа
+        with patch.object(cache._nodes[home], 'get', side_effect=ConnectionError('down')):
+            cache.get('survey_list_version')
+        self.assertIsNone(cache.get('survey_list_version'))
+
+    def test_failed_delete_counts_and_no_remap_misses(self):
+        """Тест: неудачное удаление считается ошибкой узла; без REMAP_ON_FAILURE ключи узла — промахи"""
+        cache = self.make_cache(3, FAILURE_THRESHOLD=2, REMAP_ON_FAILURE=False)
+        cache.set('niiedu_auth_1', {'name': 'Student'})
+        home = cache.node_for('niiedu_auth_1')
+
+        with patch.object(cache._nodes[home], 'delete', side_effect=ConnectionError('down')):
+            cache.delete('niiedu_auth_1')
+            # Одна ошибка записи не исключает узел
+            self.assertIn(home, cache.live_nodes)
+            cache.delete('niiedu_auth_1')
+        self.assertNotIn(home, cache.live_nodes)
+        self.assertIsNone(cache.node_for('niiedu_auth_1'))
+        self.assertIsNone(cache.get('niiedu_auth_1'))
+        cache.set('niiedu_auth_1', {'name': 'Student'})
+        self.assertFalse(any(node.get('niiedu_auth_1') for node in cache._nodes.values() if node is not cache._nodes[home]))
+
+        with patch('apps.common.sharded_cache.time.monotonic', return_value=time.monotonic() + 31):
+            self.assertIsNone(cache.get('niiedu_auth_1'))
+
+    def test_epoch_bumped_once_per_outage_and_per_alias(self):
+        """Тест: узел, исключенный несколькими процессами, получает одну новую эпоху; у псевдонимов эпохи раздельные"""
+        processes = [self.make_cache(2, FAILURE_THRESHOLD=1, EPOCH_KEY='_shard_epoch:sessions') for _ in range(3)]
+        default = self.make_cache(2, FAILURE_THRESHOLD=1, EPOCH_KEY='_shard_epoch:default')
+        processes[0].set('session_1', 'data')
+        default.set('page_1', 'page')
+        home = processes[0].node_for('session_1')
+        default_home = default.node_for('page_1')
+
+        for process in processes:
+            with patch.object(process._nodes[home], 'get', side_effect=ConnectionError('down')):
+                process.get('session_1')
+            self.assertNotIn(home, process.live_nodes)
+
+        with patch('apps.common.sharded_cache.time.monotonic', return_value=time.monotonic() + 31):
+            for process in processes:
+                self.assertIn(home, process.live_nodes)
+                self.assertEqual(process._epochs[home][0], 1)
+            processes[1].set('session_1', 'new')
+            self.assertEqual(processes[2].get('session_1'), 'new')
+        self.assertEqual(default._epoch(default_home), 0)
+        self.assertEqual(default.get('page_1'), 'page')
+
+
+class BenchmarkHistoryTests(TestCase):
+    """Тесты истории микробенчмарков и сравнения запусков"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.history = Path(directory.name) / 'benchmarks.jsonl'
+
+    def test_mann_whitney_u(self):
+        """Тест значимости сдвига медианы и отсутствия ложной тревоги"""
+        rng = random.Random(0)
+        base = [rng.lognormvariate(0, 0.2) for _ in range(300)]
+        same = [rng.lognormvariate(0, 0.2) for _ in range(300)]
+        slower = [value * 1.2 for value in same]
+
+        self.assertGreater(mann_whitney_u(base, same)[1], 0.01)
+        self.assertLess(mann_whitney_u(base, slower)[1], 1e-6)
+        self.assertEqual(mann_whitney_u([1.0] * 10, [1.0] * 10)[1], 1.0)
+
+    def test_microbench_history_and_compare(self):
+        """Тест записи запусков microbench и отметки регрессии в bench_compare"""
+        for label in ['base', 'head']:
+            call_command(
+                'microbench', iterations=3, sizes='2', label=label,
+                history=str(self.history), stdout=io.StringIO(),
+            )
+        runs = read_history(self.history)
+        self.assertEqual(len(runs), 2)
+        base_run = next(iter(runs.values()))
+        self.assertIn('dashboard_callback [n=2]', base_run)
+        self.assertEqual(len(base_run['survey_list.html [n=2]']['samples']), 3)
+
+        # Синтетический запуск: список опросов рендерится вдвое дольше
+        rng = random.Random(1)
+        records = []
+        for run, factor in [('1-base', 1.0), ('2-head', 2.0)]:
+            for name in ['survey_list.html [n=2]', 'Survey.short_description (x1000)']:
+                samples = [rng.gauss(1.0, 0.05) * (factor if name.startswith('survey_list') else 1) for _ in range(100)]
+                records.append({'run': run, 'name': name, 'p50_ms': sorted(samples)[50], 'samples': samples})
+        self.history.write_text(''.join(json.dumps(record) + '\n' for record in records))
+
+        out = io.StringIO()
+        call_command('bench_compare', history=str(self.history), stdout=out)
+        self.assertIn('регрессия', out.getvalue())
+        self.assertEqual(out.getvalue().count('регрессия'), 1)
+        with self.assertRaises(CommandError):
+            call_command('bench_compare', '1-base', '2-head', history=str(self.history),
+                         fail_on_regression=True, stdout=io.StringIO())
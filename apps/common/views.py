@@ -0,0 +1,13 @@
+"""
+Служебные представления
+"""
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from .db import pool_stats
+
+
+@staff_member_required
+def db_pool_stats_view(request):
+    """Метрики соединений с БД процесса, обработавшего запрос"""
+    return JsonResponse({'databases': pool_stats()})
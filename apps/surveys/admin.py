@@ -1,6 +1,17 @@
-from django.contrib import admin
+import logging
+import time
+from datetime import datetime
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.http import FileResponse, Http404, HttpRequest, JsonResponse, QueryDict, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.template.response import TemplateResponse
 from django.utils.html import format_html
-from django.urls import reverse
+from django.urls import path, reverse
+from django.utils import timezone
 from unfold.admin import ModelAdmin, TabularInline
 from unfold.contrib.filters.admin import (
     RangeDateFilter,
@@ -10,7 +21,45 @@ from unfold.contrib.filters.admin import (
 from unfold.decorators import display
 from simple_history.admin import SimpleHistoryAdmin
 
+from apps.common.tasks import enqueue
+
+from .allow_list import clear_allow_list, import_allow_list
+from .bulk import bulk_progress, bulk_update_surveys
+from .counters import count_respondents
+from .export import FORMATS, export_filename, export_owner, export_path, export_stream, with_totals
+from .form_checks import STATUS_LABELS, get_form_statuses
 from .models import Survey
+from .tasks import export_surveys_file, ingest_survey_responses
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseUploadForm(forms.Form):
+    """Форма загрузки CSV-экспорта ответов Google Forms"""
+    file = forms.FileField(label='CSV-файл')
+
+
+class AllowListUploadForm(forms.Form):
+    """Форма загрузки списка допуска студентов"""
+    file = forms.FileField(
+        label='Файл со списком',
+        help_text='CSV или текст: логин NII EDU — первое число в каждой строке'
+    )
+    replace = forms.BooleanField(
+        label='Заменить текущий список',
+        required=False,
+        initial=True,
+        help_text='Без отметки логины добавляются к уже загруженным'
+    )
+    clear = forms.BooleanField(
+        label='Удалить список (опрос доступен всем студентам)',
+        required=False
+    )
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.data.get('clear'):
+            self.fields['file'].required = False
 
 
 @admin.register(Survey)
@@ -24,8 +73,11 @@ class SurveyAdmin(ModelAdmin, SimpleHistoryAdmin):
         'title', 
         'is_active_display', 
         'google_form_link', 
+        'form_status_display',
         'short_description',
         'created_by',
+        'views_display',
+        'respondents_display',
         'created_at_display',
         'actions_display'
     ]
@@ -39,7 +91,10 @@ class SurveyAdmin(ModelAdmin, SimpleHistoryAdmin):
     search_fields = ['title', 'description']
     
     # Настройки readonly
-    readonly_fields = ['created_at', 'updated_at', 'created_by', 'updated_by']
+    readonly_fields = [
+        'created_at', 'updated_at', 'created_by', 'updated_by', 'response_stats_display',
+        'allow_list_display'
+    ]
     
     # Группировка полей в форме
     fieldsets = [
@@ -53,7 +108,12 @@ class SurveyAdmin(ModelAdmin, SimpleHistoryAdmin):
             'description': 'Вставьте ссылку на ваш Google Form'
         }),
         ('Настройки', {
-            'fields': ['is_active', 'is_login_req'],
+            'fields': ['is_active', 'is_login_req', 'opens_at', 'closes_at', 'allow_list_display'],
+            'classes': ['tab'],
+            'description': 'Опрос доступен, если он активен и текущее время попадает в окно публикации'
+        }),
+        ('Ответы', {
+            'fields': ['response_stats_display'],
             'classes': ['tab'],
         }),
         ('Служебная информация', {
@@ -66,11 +126,18 @@ class SurveyAdmin(ModelAdmin, SimpleHistoryAdmin):
     list_per_page = 25
     
     # Действия
-    actions = ['make_active', 'make_inactive']
+    actions = [
+        'make_active', 'make_inactive',
+        'export_csv', 'export_xlsx', 'export_history_csv', 'export_history_xlsx',
+    ]
     
     @display(description='Статус', label=True)
     def is_active_display(self, obj):
         """Красивое отображение статуса активности"""
+        if obj.is_active and not obj.is_open():
+            return format_html(
+                '<span class="badge badge-warning">По расписанию</span>'
+            )
         if obj.is_active:
             return format_html(
                 '<span class="badge badge-success">Активен</span>'
@@ -90,6 +157,33 @@ class SurveyAdmin(ModelAdmin, SimpleHistoryAdmin):
             obj.google_form_url
         )
     
+    @display(description='Проверка формы')
+    def form_status_display(self, obj):
+        """Результат последней проверки ссылки Google Form (check_forms)"""
+        result = getattr(obj, 'form_status', None)
+        if result is None:
+            return format_html('<span class="badge">Не проверялась</span>')
+        css = 'badge-success' if result['status'] == 'ok' else 'badge-danger'
+        checked_at = datetime.fromtimestamp(result['checked_at'], tz=timezone.get_current_timezone())
+        return format_html(
+            '<span class="badge {}" title="HTTP {} · {}">{}</span>',
+            css, result['http_status'] or '—', checked_at.strftime('%d.%m.%Y %H:%M'),
+            STATUS_LABELS[result['status']],
+        )
+    
+    @display(description='Просмотры / открытия', ordering='total_views')
+    def views_display(self, obj):
+        """Просмотры страницы и открытия формы за все время"""
+        return f'{obj.total_views or 0} / {obj.total_opens or 0}'
+    
+    @display(description='Уникальные студенты')
+    def respondents_display(self, obj):
+        """Уникальные студенты NII EDU: за сегодня / за все время"""
+        if not obj.is_login_req:
+            return '—'
+        today, total = getattr(obj, 'respondent_counts', ('?', '?'))
+        return f'{today} / {total}'
+    
     @display(description='Дата создания', ordering='created_at')
     def created_at_display(self, obj):
         """Форматированная дата создания"""
@@ -111,7 +205,7 @@ class SurveyAdmin(ModelAdmin, SimpleHistoryAdmin):
     
     def make_active(self, request, queryset):
         """Активировать выбранные опросы"""
-        updated = queryset.update(is_active=True)
+        updated = self._bulk_update(request, queryset, 'Активация опроса', is_active=True)
         self.message_user(
             request, 
             f'{updated} опросов было активировано.'
@@ -120,13 +214,239 @@ class SurveyAdmin(ModelAdmin, SimpleHistoryAdmin):
     
     def make_inactive(self, request, queryset):
         """Деактивировать выбранные опросы"""
-        updated = queryset.update(is_active=False)
+        updated = self._bulk_update(request, queryset, 'Деактивация опроса', is_active=False)
         self.message_user(
             request, 
             f'{updated} опросов было деактивировано.'
         )
     make_inactive.short_description = 'Деактивировать выбранные опросы'
     
+    def export_csv(self, request, queryset):
+        """Выгрузить выбранные опросы в CSV"""
+        return self._export(request, queryset, 'surveys', 'csv')
+    export_csv.short_description = 'Выгрузить опросы (CSV)'
+    
+    def export_xlsx(self, request, queryset):
+        """Выгрузить выбранные опросы в XLSX"""
+        return self._export(request, queryset, 'surveys', 'xlsx')
+    export_xlsx.short_description = 'Выгрузить опросы (XLSX)'
+    
+    def export_history_csv(self, request, queryset):
+        """Выгрузить историю выбранных опросов в CSV"""
+        return self._export(request, queryset, 'history', 'csv')
+    export_history_csv.short_description = 'Выгрузить историю изменений (CSV)'
+    
+    def export_history_xlsx(self, request, queryset):
+        """Выгрузить историю выбранных опросов в XLSX"""
+        return self._export(request, queryset, 'history', 'xlsx')
+    export_history_xlsx.short_description = 'Выгрузить историю изменений (XLSX)'
+    
+    @display(description='Список допуска')
+    def allow_list_display(self, obj):
+        """Размер списка допуска и ссылка на загрузку"""
+        if not obj.pk:
+            return 'Сохраните опрос, чтобы загрузить список допуска.'
+        upload_url = reverse('admin:surveys_survey_allow_list_upload', args=[obj.pk])
+        if not obj.allow_list_size:
+            return format_html('Все студенты NII EDU · <a href="{}">загрузить список</a>', upload_url)
+        return format_html(
+            'Студентов: {} · <a href="{}">изменить список</a>', obj.allow_list_size, upload_url
+        )
+    
+    @display(description='Статистика ответов')
+    def response_stats_display(self, obj):
+        """Распределения ответов и доля заполнения из загруженного экспорта"""
+        if not obj.pk:
+            return 'Сохраните опрос, чтобы загрузить ответы.'
+        try:
+            from .aggregation import ResponseAggregator
+            # Только последний checkpoint: новые строки агрегирует задача
+            # aggregate_survey_responses или команда aggregate_responses
+            aggregator = ResponseAggregator(obj.pk)
+            summary = aggregator.summary()
+        except ImportError:
+            return 'Для статистики ответов установите numpy и pandas.'
+        return render_to_string('admin/surveys/survey/response_stats.html', {
+            'summary': summary,
+            'pending': max(aggregator.store.rows - aggregator.offset, 0),
+            'upload_url': reverse('admin:surveys_survey_responses_upload', args=[obj.pk]),
+            'crosstab_url': reverse('admin:surveys_survey_responses_crosstab', args=[obj.pk]),
+        })
+    
+    def get_urls(self):
+        urls = [
+            path(
+                'exports/<str:filename>/',
+                self.admin_site.admin_view(self.export_download_view),
+                name='surveys_survey_export_download',
+            ),
+            path(
+                'bulk-progress/',
+                self.admin_site.admin_view(self.bulk_progress_view),
+                name='surveys_survey_bulk_progress',
+            ),
+            path(
+                '<int:pk>/responses/upload/',
+                self.admin_site.admin_view(self.responses_upload_view),
+                name='surveys_survey_responses_upload',
+            ),
+            path(
+                '<int:pk>/allow-list/upload/',
+                self.admin_site.admin_view(self.allow_list_upload_view),
+                name='surveys_survey_allow_list_upload',
+            ),
+            path(
+                '<int:pk>/responses/crosstab/',
+                self.admin_site.admin_view(self.responses_crosstab_view),
+                name='surveys_survey_responses_crosstab',
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def export_download_view(self, request, filename):
+        """Готовый файл выгрузки, записанный в фоне"""
+        if not self.has_view_permission(request):
+            return redirect('admin:surveys_survey_changelist')
+        if export_owner(filename) != request.user.pk:
+            raise Http404('Выгрузка не найдена')
+        path = export_path(filename)
+        if path is None:
+            messages.warning(request, 'Файл выгрузки еще готовится, попробуйте через минуту.')
+            return redirect('admin:surveys_survey_changelist')
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename)
+    
+    def bulk_progress_view(self, request):
+        """Ход последнего массового изменения пользователя (JSON)"""
+        if not self.has_change_permission(request):
+            raise Http404('Нет доступа')
+        return JsonResponse({'progress': bulk_progress(request.user.pk)})
+    
+    def responses_upload_view(self, request, pk):
+        """Загрузка CSV: файл сохраняется и обрабатывается в фоне"""
+        survey = get_object_or_404(Survey, pk=pk)
+        if not self.has_change_permission(request, survey):
+            return redirect('admin:surveys_survey_changelist')
+        
+        form = ResponseUploadForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            inbox = settings.SURVEY_RESPONSES_INBOX / 'uploads'
+            inbox.mkdir(parents=True, exist_ok=True)
+            target = inbox / f'{survey.pk}__{timezone.now():%Y%m%d%H%M%S%f}.csv'
+            with open(target, 'wb') as f:
+                for chunk in form.cleaned_data['file'].chunks():
+                    f.write(chunk)
+            
+            enqueue(ingest_survey_responses, survey.pk, str(target))
+            messages.success(request, 'Файл принят, ответы загружаются в фоне.')
+            return redirect('admin:surveys_survey_change', survey.pk)
+        
+        return TemplateResponse(request, 'admin/surveys/survey/response_upload.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Загрузка ответов',
+            'survey': survey,
+            'form': form,
+        })
+    
+    def allow_list_upload_view(self, request, pk):
+        """Загрузка списка допуска: файл читается построчно и вставляется частями"""
+        survey = get_object_or_404(Survey, pk=pk)
+        if not self.has_change_permission(request, survey):
+            return redirect('admin:surveys_survey_changelist')
+        
+        form = AllowListUploadForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            if form.cleaned_data['clear']:
+                clear_allow_list(survey, user=request.user)
+                messages.success(request, 'Список допуска удален, опрос доступен всем студентам.')
+            else:
+                size = import_allow_list(
+                    survey, form.cleaned_data['file'],
+                    replace=form.cleaned_data['replace'], user=request.user,
+                )
+                messages.success(request, f'Список допуска загружен: {size} студентов.')
+            return redirect('admin:surveys_survey_change', survey.pk)
+        
+        return TemplateResponse(request, 'admin/surveys/survey/allow_list_upload.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Список допуска',
+            'survey': survey,
+            'form': form,
+        })
+    
+    def responses_crosstab_view(self, request, pk):
+        """Таблица сопряженности двух вопросов"""
+        from .responses import ResponseStore
+        
+        survey = get_object_or_404(Survey, pk=pk)
+        if not self.has_view_permission(request, survey):
+            return redirect('admin:surveys_survey_changelist')
+        
+        store = ResponseStore(survey.pk)
+        questions = store.questions
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Таблица сопряженности',
+            'survey': survey,
+            'questions': questions,
+        }
+        try:
+            row = int(request.GET['row'])
+            column = int(request.GET['column'])
+        except (KeyError, ValueError):
+            row = column = None
+        
+        if row is not None and 0 <= row < len(questions) and 0 <= column < len(questions):
+            crosstab = store.crosstab(row, column)
+            crosstab['table_rows'] = [
+                {'title': title, 'counts': counts}
+                for title, counts in zip(crosstab['rows'], crosstab['table'])
+            ]
+            context.update({'row': row, 'column': column, 'crosstab': crosstab})
+        
+        return TemplateResponse(request, 'admin/surveys/survey/response_crosstab.html', context)
+    
+    def _bulk_update(self, request, queryset, change_reason, **fields):
+        """
+        Изменение частями с записью истории и сбросом кэша на каждую часть
+        """
+        started = time.monotonic()
+        updated = bulk_update_surveys(
+            queryset, user=request.user, change_reason=change_reason, **fields
+        )
+        logger.info(
+            'Массовое действие «%s»: %s опросов за %.1f с',
+            change_reason, updated, time.monotonic() - started,
+        )
+        return updated
+    
+    def _export(self, request, queryset, kind, fmt):
+        """
+        Потоковая выгрузка отфильтрованного списка; большая — файлом в фоне
+        """
+        survey_ids = queryset.values('pk')
+        rows = queryset.count() if kind == 'surveys' else Survey.history.filter(id__in=survey_ids).count()
+        filename = export_filename(kind, fmt, request.user.pk)
+        
+        if rows > settings.SURVEY_EXPORT_BACKGROUND_ROWS:
+            # Весь отфильтрованный список задача собирает сама по параметрам
+            # changelist; отмеченных вручную строк не больше одной страницы
+            if request.POST.get('select_across') == '1':
+                scope = {'query': request.GET.urlencode()}
+            else:
+                scope = {'survey_ids': list(queryset.values_list('pk', flat=True))}
+            enqueue(export_surveys_file, kind, fmt, filename, request.user.pk, **scope)
+            url = reverse('admin:surveys_survey_export_download', args=[filename])
+            self.message_user(request, format_html(
+                'Выгрузка {} строк готовится в фоне. Файл будет доступен по ссылке: <a href="{}">{}</a>',
+                rows, url, filename,
+            ))
+            return None
+        
+        source = queryset if kind == 'surveys' else survey_ids
+        response = StreamingHttpResponse(export_stream(kind, fmt, source), content_type=FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
     def save_model(self, request, obj, form, change):
         """Автоматическое заполнение полей при сохранении"""
         if not change:  # Новый объект
@@ -134,12 +454,35 @@ class SurveyAdmin(ModelAdmin, SimpleHistoryAdmin):
         obj.updated_by = request.user
         super().save_model(request, obj, form, change)
     
+    def get_changelist_instance(self, request):
+        """Статусы форм и счетчики студентов для всей страницы списка, а не по опросу на строку"""
+        changelist = super().get_changelist_instance(request)
+        surveys = list(changelist.result_list)
+        statuses = get_form_statuses([survey.pk for survey in surveys])
+        survey_ids = [survey.pk for survey in surveys if survey.is_login_req]
+        today = count_respondents(survey_ids, period='today')
+        total = count_respondents(survey_ids)
+        for survey in surveys:
+            survey.form_status = statuses.get(survey.pk)
+            survey.respondent_counts = (today.get(survey.pk, '?'), total.get(survey.pk, '?'))
+        return changelist
+    
+    def changelist_queryset(self, user, query):
+        """Queryset списка с фильтрами, поиском и сортировкой из строки запроса changelist"""
+        request = HttpRequest()
+        request.method = 'GET'
+        request.GET = QueryDict(query)
+        request.user = user
+        # Без статусов форм и счетчиков студентов из get_changelist_instance ниже
+        changelist = super().get_changelist_instance(request)
+        return changelist.get_queryset(request)
+    
     def get_queryset(self, request):
         """Оптимизация запросов"""
-        return super().get_queryset(request).select_related(
+        return with_totals(super().get_queryset(request).select_related(
             'created_by', 
             'updated_by'
-        )
+        ))
         
     # Настройки Unfold
     warn_unsaved_form = True
@@ -154,5 +497,5 @@ class SurveyAdmin(ModelAdmin, SimpleHistoryAdmin):
     )
     
     tab_settings = (
-        ('Настройки', {'fields': ['is_active', 'is_login_req']}),
+        ('Настройки', {'fields': ['is_active', 'is_login_req', 'opens_at', 'closes_at']}),
     ) 
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+Инкрементальная агрегация ответов опроса
+
+Колоночное хранилище (responses.ResponseStore) только дописывается, поэтому
+агрегатор хранит накопленные гистограммы и смещение уже обработанных строк
+(checkpoint) и при каждом запуске читает только новые строки. Добавление
+N ответов стоит O(N) независимо от общего количества ответов.
+
+Состояние хранится рядом с данными опроса в aggregate.json и заменяется
+атомарно.
+"""
+import json
+import os
+
+from django.core.cache import cache
+
+from .responses import ResponseStore
+
+AGGREGATE_LOCK_TIMEOUT = 60 * 10
+
+
+class ResponseAggregator:
+    """Накопленная статистика ответов одного опроса"""
+
+    def __init__(self, survey_id):
+        self.store = ResponseStore(survey_id)
+        self.state_path = self.store.path / 'aggregate.json'
+        self.state = self._read_state()
+
+    def _read_state(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'offset': 0, 'histograms': [], 'answered_histogram': [0]}
+
+    def _write_state(self):
+        tmp_path = self.state_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    @property
+    def offset(self):
+        return self.state['offset']
+
+    def update(self):
+        """
+        Добавляет к статистике строки, появившиеся после checkpoint
+
+        Returns:
+            Количество обработанных строк (0, если новых нет или агрегация
+            уже выполняется в другом процессе)
+        """
+        if self.store.rows <= self.offset:
+            return 0
+
+        lock_key = f"survey_aggregate_lock_{self.store.survey_id}"
+        if not cache.add(lock_key, 1, AGGREGATE_LOCK_TIMEOUT):
+            return 0
+        try:
+            # Состояние могло обновиться, пока ждали блокировку
+            self.state = self._read_state()
+            return self._consume(self.offset, self.store.rows)
+        finally:
+            cache.delete(lock_key)
+
+    def _consume(self, start, stop):
+        import numpy as np
+
+        histograms = self.state['histograms']
+        answered = np.zeros(stop - start, dtype=np.int32)
+
+        for index, question in enumerate(self.store.questions):
+            if index == len(histograms):
+                histograms.append([0])  # новый вопрос
+            codes = self.store.question_codes(index, start, stop)
+            mask = codes >= 0
+            answered += mask
+
+            batch = np.bincount(codes[mask], minlength=len(question['categories']))
+            histogram = np.array(histograms[index], dtype=np.int64)
+            if question['is_text'] and histogram.size > 1:
+                # Вопрос стал свободным ответом: считаем только факт ответа
+                histogram = np.array([histogram.sum()], dtype=np.int64)
+            size = max(histogram.size, batch.size)
+            histogram = np.pad(histogram, (0, size - histogram.size))
+            histogram[:batch.size] += batch
+            histograms[index] = histogram.tolist()
+
+        # Распределение количества отвеченных вопросов по строкам
+        answered_histogram = np.array(self.state['answered_histogram'], dtype=np.int64)
+        batch = np.bincount(answered, minlength=len(self.store.questions) + 1)
+        size = max(answered_histogram.size, batch.size)
+        answered_histogram = np.pad(answered_histogram, (0, size - answered_histogram.size))
+        answered_histogram[:batch.size] += batch
+        self.state['answered_histogram'] = answered_histogram.tolist()
+
+        self.state['offset'] = stop
+        self._write_state()
+        return stop - start
+
+    def summary(self):
+        """
+        Сводка по накопленной статистике для админки (response_stats_display)
+
+        Returns:
+            Dict: rows — учтено строк, completion — как ResponseStore.completion(),
+            distributions — список ResponseStore.distribution() по вопросам
+        """
+        questions = self.store.questions
+        rows = self.offset
+        answered_histogram = self.state['answered_histogram']
+        total = len(questions)
+
+        distributions = []
+        question_rates = []
+        for question, histogram in zip(questions, self.state['histograms']):
+            answered = sum(histogram)
+            question_rates.append(answered / rows if rows else 0.0)
+            distributions.append({
+                'title': question['title'],
+                'is_text': question['is_text'],
+                'counts': dict(zip(question['categories'], histogram)),
+                'answered': answered,
+                'missing': rows - answered,
+            })
+
+        complete = answered_histogram[total] if total < len(answered_histogram) else 0
+        answered_total = sum(count * k for k, count in enumerate(answered_histogram))
+        return {
+            'rows': rows,
+            'completion': {
+                'complete_rate': complete / rows if rows and total else 0.0,
+                'mean_answered': answered_total / (rows * total) if rows and total else 0.0,
+                'question_rates': question_rates,
+            },
+            'distributions': distributions,
+        }
@@ -0,0 +1,184 @@
+"""
+Списки допуска студентов к опросам
+
+Список загружается файлом (CSV или по логину на строку) и хранится в
+таблице SurveyAllowedStudent. Для проверки на каждом запросе список
+собирается в StudentBitmap и кладется в кэш под ключом с версией списка.
+Текущие версия и размер списка (allow_list_version, allow_list_size)
+записываются в общий кэш после коммита загрузки или удаления, а не берутся
+из копии опроса в снимке каталога: иначе другие серверы видели бы прежний
+список до пересборки своего снимка. Проверка принадлежности не делает
+запросов к базе данных, пока эта запись есть в кэше. Последние битовые
+массивы дополнительно держатся в памяти процесса.
+
+Опрос с пустым списком (размер 0) доступен любому студенту.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.common.bitmaps import StudentBitmap
+
+from .models import Survey, SurveyAllowedStudent
+
+IMPORT_BATCH_SIZE = 5000
+ALLOW_LIST_TIMEOUT = 60 * 60 * 24 * 30  # 30 дней: ключ меняется с версией списка
+LOCAL_CACHE_SIZE = 32  # битовых массивов в памяти процесса
+
+STUDENT_ID_PATTERN = re.compile(r'\d+')
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def allow_list_cache_key(survey_id, version):
+    return f"survey_allow_list_{survey_id}_{version}"
+
+
+def allow_list_state_key(survey_id):
+    return f"survey_allow_list_state_{survey_id}"
+
+
+def allow_list_state(survey_id):
+    """
+    Текущие версия и размер списка допуска: общий кэш, затем база данных
+
+    Returns:
+        (allow_list_version, allow_list_size)
+    """
+    key = allow_list_state_key(survey_id)
+    state = cache.get(key)
+    if state is None:
+        state = Survey.objects.filter(pk=survey_id).values_list(
+            'allow_list_version', 'allow_list_size'
+        ).first() or (0, 0)
+        # add: не перезаписывает версию, опубликованную после чтения из базы
+        cache.add(key, tuple(state), ALLOW_LIST_TIMEOUT)
+    return tuple(state)
+
+
+def _publish_state(survey_id, version, size, bitmap=None):
+    """После коммита записывает версию и размер списка (и битовый массив) в кэш"""
+    def publish():
+        if bitmap is not None:
+            cache.set(allow_list_cache_key(survey_id, version), bitmap.to_bytes(), ALLOW_LIST_TIMEOUT)
+        cache.set(allow_list_state_key(survey_id), (version, size), ALLOW_LIST_TIMEOUT)
+
+    transaction.on_commit(publish)
+
+
+def parse_student_ids(lines):
+    """
+    Логины студентов из строк файла: первое число в каждой строке
+
+    Строки без чисел (заголовок CSV, пустые) пропускаются.
+    """
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8-sig', errors='ignore')
+        match = STUDENT_ID_PATTERN.search(line)
+        if match:
+            yield int(match.group())
+
+
+def _batches(student_ids, size):
+    batch = set()
+    for student_id in student_ids:
+        batch.add(student_id)
+        if len(batch) >= size:
+            yield batch
+            batch = set()
+    if batch:
+        yield batch
+
+
+def _build_bitmap(survey_id):
+    return StudentBitmap(
+        SurveyAllowedStudent.objects
+        .filter(survey_id=survey_id)
+        .values_list('student_id', flat=True)
+        .iterator(chunk_size=IMPORT_BATCH_SIZE)
+    )
+
+
+def import_allow_list(survey, lines, replace=True, user=None, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Загружает список допуска опроса потоково, частями по batch_size
+
+    Args:
+        survey: Опрос
+        lines: Строки файла (файловый объект или итерируемое)
+        replace: Заменить список (иначе — дополнить)
+        user: Пользователь для истории изменений
+
+    Returns:
+        Количество студентов в списке после загрузки
+    """
+    with transaction.atomic():
+        if replace:
+            SurveyAllowedStudent.objects.filter(survey=survey).delete()
+        for batch in _batches(parse_student_ids(lines), batch_size):
+            SurveyAllowedStudent.objects.bulk_create(
+                [SurveyAllowedStudent(survey=survey, student_id=student_id) for student_id in batch],
+                ignore_conflicts=True,
+            )
+
+        bitmap = _build_bitmap(survey.pk)
+        survey.allow_list_size = len(bitmap)
+        survey.allow_list_version = time.time_ns()
+        survey._change_reason = 'Загрузка списка допуска'
+        if user is not None:
+            survey._history_user = user
+        survey.save(update_fields=['allow_list_size', 'allow_list_version'])
+        _publish_state(survey.pk, survey.allow_list_version, survey.allow_list_size, bitmap)
+
+    return survey.allow_list_size
+
+
+def clear_allow_list(survey, user=None):
+    """Удаляет список допуска: опрос снова доступен любому студенту"""
+    with transaction.atomic():
+        SurveyAllowedStudent.objects.filter(survey=survey).delete()
+        survey.allow_list_size = 0
+        survey.allow_list_version = 0
+        survey._change_reason = 'Удаление списка допуска'
+        if user is not None:
+            survey._history_user = user
+        survey.save(update_fields=['allow_list_size', 'allow_list_version'])
+        _publish_state(survey.pk, 0, 0)
+
+
+def allowed_students(survey: Survey, version) -> StudentBitmap:
+    """Битовый массив версии списка допуска: память процесса, затем кэш, затем база данных"""
+    key = allow_list_cache_key(survey.pk, version)
+    with _local_lock:
+        bitmap = _local.get(key)
+        if bitmap is not None:
+            _local.move_to_end(key)
+            return bitmap
+
+    data = cache.get(key)
+    if data is not None:
+        bitmap = StudentBitmap.from_bytes(data)
+    else:
+        bitmap = _build_bitmap(survey.pk)
+        cache.set(key, bitmap.to_bytes(), ALLOW_LIST_TIMEOUT)
+
+    with _local_lock:
+        _local[key] = bitmap
+        _local.move_to_end(key)
+        while len(_local) > LOCAL_CACHE_SIZE:
+            _local.popitem(last=False)
+    return bitmap
+
+
+def is_student_allowed(survey: Survey, login) -> bool:
+    """Допущен ли студент к опросу (пустой список — допущены все)"""
+    version, size = allow_list_state(survey.pk)
+    if not size:
+        return True
+    return login in allowed_students(survey, version)
@@ -8,4 +8,4 @@ class SurveysConfig(AppConfig):
     
     def ready(self):
         """Импорт сигналов при готовности приложения"""
-        pass 
\ No newline at end of file
+        from . import signals  # noqa: F401 
\ No newline at end of file
@@ -0,0 +1,138 @@
+"""
+Массовое изменение опросов частями с записью истории
+
+queryset.update() не создает исторических записей, а save() по одному
+объекту слишком медленный для тысяч опросов. Здесь опросы обновляются
+частями по SURVEY_BULK_CHUNK_SIZE: на каждую часть один UPDATE и одна
+вставка истории в одной транзакции, а после ее коммита — один сброс кэша,
+очистка кэша прокси и задача прогрева опросов этой части. Сброс до коммита
+позволил бы параллельному запросу снова закэшировать старые строки.
+
+Историю пишет INSERT ... SELECT из обновленных строк: bulk_history_create
+создает модель на каждую строку и тратит на это три четверти времени.
+
+Ход изменения хранится в кэше под ключом пользователя (bulk_progress) и
+отдается в админке.
+"""
+import logging
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.common.tasks import enqueue
+
+from .cache import invalidate_surveys
+from .edge import queue_purge
+from .models import Survey
+from .tasks import rebuild_survey_catalog, warm_survey_cache
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_TIMEOUT = 60 * 60  # 1 час
+
+
+def bulk_progress_key(user_id):
+    return f"survey_bulk_progress_{user_id}"
+
+
+def bulk_progress(user_id):
+    """
+    Ход последнего массового изменения пользователя
+
+    Returns:
+        {'change_reason', 'done', 'total', 'finished'} или None
+    """
+    return cache.get(bulk_progress_key(user_id))
+
+
+def _after_commit(survey_ids, slugs):
+    """Сброс кэша, очистка прокси и прогрев одной части после коммита"""
+    invalidate_surveys(slugs)
+    queue_purge(survey_ids)
+    enqueue(warm_survey_cache, survey_ids, lists=False)
+
+
+def _insert_history(survey_ids, user, change_reason, history_date):
+    """Исторические записи «~» для опросов одной вставкой"""
+    history = Survey.history.model
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(field.column)
+        for field in history._meta.concrete_fields
+        if not field.name.startswith('history_')
+    )
+    placeholders = ', '.join(['%s'] * len(survey_ids))
+    date_field = history._meta.get_field('history_date')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(history._meta.db_table)} ({columns}, '
+            f'{quote("history_date")}, {quote("history_change_reason")}, '
+            f'{quote("history_type")}, {quote("history_user_id")}) '
+            f'SELECT {columns}, %s, %s, %s, %s FROM {quote(Survey._meta.db_table)} '
+            f'WHERE {quote(Survey._meta.pk.column)} IN ({placeholders})',
+            [
+                date_field.get_db_prep_save(history_date, connection),
+                change_reason,
+                '~',
+                user.pk if user else None,
+                *survey_ids,
+            ],
+        )
+
+
+def bulk_update_surveys(queryset, user=None, change_reason='', chunk_size=None,
+                        progress=None, **fields):
+    """
+    Обновляет опросы частями с историей изменений
+
+    Args:
+        queryset: Опросы для изменения
+        user: Пользователь для истории и updated_by
+        change_reason: Причина изменения для истории
+        chunk_size: Размер части (по умолчанию SURVEY_BULK_CHUNK_SIZE)
+        progress: Функция progress(done, total) после каждой части
+            (ход также пишется в кэш, см. bulk_progress)
+        **fields: Новые значения полей
+
+    Returns:
+        Количество измененных опросов
+    """
+    chunk_size = chunk_size or settings.SURVEY_BULK_CHUNK_SIZE
+    survey_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    now = timezone.now()
+    fields['updated_at'] = now
+    if user is not None:
+        fields['updated_by'] = user
+
+    def report(done, finished=False):
+        if user is not None:
+            cache.set(bulk_progress_key(user.pk), {
+                'change_reason': change_reason,
+                'done': done,
+                'total': len(survey_ids),
+                'finished': finished,
+            }, PROGRESS_TIMEOUT)
+
+    updated = 0
+    report(0)
+    for start in range(0, len(survey_ids), chunk_size):
+        chunk = survey_ids[start:start + chunk_size]
+        with transaction.atomic():
+            updated += Survey.objects.filter(pk__in=chunk).update(**fields)
+            _insert_history(chunk, user, change_reason, now)
+            slugs = list(Survey.objects.filter(pk__in=chunk).values_list('slug', flat=True))
+            transaction.on_commit(partial(_after_commit, chunk, slugs))
+        logger.info('Массовое изменение опросов: %s из %s', updated, len(survey_ids))
+        report(updated)
+        if progress:
+            progress(updated, len(survey_ids))
+
+    if survey_ids:
+        # Первые страницы списка — один раз, а не на каждую часть
+        enqueue(warm_survey_cache, [])
+        enqueue(rebuild_survey_catalog)
+    report(updated, finished=True)
+    return updated
@@ -0,0 +1,58 @@
+"""
+Кэширование активных опросов по slug
+"""
+from django.core.cache import cache
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from .catalog import get_snapshot, invalidate_catalog
+from .models import Survey
+from .pages import bump_list_version, invalidate_detail_pages
+
+SURVEY_CACHE_TIMEOUT = 600  # 10 минут
+
+
+def survey_cache_key(slug: str) -> str:
+    return f"survey_slug_{slug}"
+
+
+def get_active_survey(slug: str) -> Survey:
+    """
+    Активный опрос по slug: снимок каталога, затем кэш, затем база данных
+
+    Снимок и кэш хранят активные опросы вне зависимости от расписания,
+    окно публикации проверяется при каждом запросе.
+
+    Raises:
+        Http404: Если активного опроса с таким slug нет или он закрыт
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        survey = snapshot.get(slug)
+    else:
+        cache_key = survey_cache_key(slug)
+        survey = cache.get(cache_key)
+        if survey is None:
+            survey = get_object_or_404(Survey, slug=slug, is_active=True)
+            cache.set(cache_key, survey, SURVEY_CACHE_TIMEOUT)
+
+    if survey is None or not survey.is_open():
+        raise Http404('Опрос не найден')
+    return survey
+
+
+def warm_survey(survey: Survey) -> None:
+    """Заполняет кэш для опроса (или удаляет запись, если опрос неактивен)"""
+    if survey.is_active:
+        cache.set(survey_cache_key(survey.slug), survey, SURVEY_CACHE_TIMEOUT)
+    else:
+        cache.delete(survey_cache_key(survey.slug))
+
+
+def invalidate_surveys(slugs) -> None:
+    """Удаляет опросы, их страницы и страницы списка из кэша и снимок каталога"""
+    slugs = list(slugs)
+    cache.delete_many([survey_cache_key(slug) for slug in slugs if slug])
+    invalidate_detail_pages(slugs)
+    bump_list_version()
+    invalidate_catalog()
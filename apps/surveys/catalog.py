@@ -0,0 +1,293 @@
+"""
+Снимок каталога активных опросов в общей памяти
+
+Все активные опросы записываются в один неизменяемый бинарный файл
+(SURVEY_CATALOG_PATH), который каждый воркер отображает через mmap. Страницы
+файла лежат в page cache ОС один раз на сервер, поэтому поиск по slug не
+обращается ни к БД, ни к кэшу и почти не расходует память воркера.
+
+Формат файла:
+
+    заголовок   MAGIC, версия формата, подпись схемы, количество записей,
+                версия каталога
+    индекс      (hash slug, смещение, длина) * count, отсортирован по hash
+    данные      записи в JSON (значения полей модели Survey)
+
+Файл пересобирается целиком и заменяется атомарно (os.replace).
+
+Файл лежит на каждом сервере свой, поэтому актуальность проверяется по
+версии каталога в общем кэше (survey_catalog_version). После коммита любого
+изменения опросов версия заменяется новым случайным числом, и снимки всех
+серверов, собранные с прежней версией, перестают использоваться: поиск идет
+через кэш и ORM, пока снимок сервера не пересобран. Процесс перечитывает
+версию из кэша не чаще раза в VERSION_CHECK_INTERVAL секунд.
+
+Снимок на сервере с воркером Celery пересобирает задача после изменения и
+Celery beat; на остальных серверах — build_catalog --loop.
+"""
+import datetime
+import hashlib
+import json
+import mmap
+import os
+import secrets
+import socket
+import struct
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Survey
+
+MAGIC = b'SCAT'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<4sIQIQ')  # magic, версия, подпись схемы, count, версия каталога
+ENTRY = struct.Struct('<QII')  # hash slug, смещение, длина
+REBUILD_LOCK_TIMEOUT = 60 * 5
+VERSION_KEY = 'survey_catalog_version'
+VERSION_CHECK_INTERVAL = 1.0  # секунды
+
+_lock = threading.Lock()
+_current = None
+_checked_version = (None, float('-inf'))  # (версия из кэша, time.monotonic() проверки)
+
+
+class _RecordEncoder(DjangoJSONEncoder):
+    """Время с микросекундами (DjangoJSONEncoder округляет до миллисекунд)"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _slug_hash(slug):
+    return int.from_bytes(hashlib.blake2b(slug.encode(), digest_size=8).digest(), 'little')
+
+
+def _fields():
+    return list(Survey._meta.concrete_fields)
+
+
+def _schema_signature():
+    """Подпись набора полей: снимок от другой версии модели не читается"""
+    names = ','.join(field.attname for field in _fields())
+    return _slug_hash(names)
+
+
+def catalog_path():
+    return Path(settings.SURVEY_CATALOG_PATH)
+
+
+def catalog_version(create=False):
+    """
+    Текущая версия каталога из общего кэша
+
+    Args:
+        create: Создать версию, если ее нет в кэше (перед пересборкой)
+
+    Returns:
+        Число или None, если версии нет или кэш недоступен
+    """
+    global _checked_version
+    version = cache.get(VERSION_KEY)
+    if version is None and create:
+        cache.add(VERSION_KEY, secrets.randbits(63), None)
+        version = cache.get(VERSION_KEY)
+    _checked_version = (version, time.monotonic())
+    return version
+
+
+def _shared_version():
+    """Версия каталога из кэша, не чаще раза в VERSION_CHECK_INTERVAL"""
+    version, checked_at = _checked_version
+    if time.monotonic() - checked_at >= VERSION_CHECK_INTERVAL:
+        version = catalog_version()
+    return version
+
+
+class CatalogSnapshot:
+    """Снимок каталога, отображенный в память (только чтение)"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, signature, self.count, self.version = HEADER.unpack_from(self.buffer, 0)
+        if (magic, version, signature) != (MAGIC, FORMAT_VERSION, _schema_signature()):
+            raise ValueError('Снимок каталога устарел')
+        self.data_offset = HEADER.size + ENTRY.size * self.count
+        self.fields = _fields()
+        self.field_names = [field.attname for field in self.fields]
+        self.slug_index = self.field_names.index('slug')
+
+    def _find(self, key):
+        """Бинарный поиск первой записи с данным hash"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if ENTRY.unpack_from(self.buffer, HEADER.size + middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get(self, slug):
+        """
+        Активный опрос по slug
+
+        Returns:
+            Survey или None, если активного опроса с таким slug нет
+        """
+        key = _slug_hash(slug)
+        index = self._find(key)
+        while index < self.count:
+            entry_key, offset, length = ENTRY.unpack_from(
+                self.buffer, HEADER.size + index * ENTRY.size
+            )
+            if entry_key != key:
+                break
+            start = self.data_offset + offset
+            record = json.loads(self.buffer[start:start + length])
+            if record[self.slug_index] == slug:
+                return self._to_instance(record)
+            index += 1  # коллизия hash
+        return None
+
+    def _to_instance(self, record):
+        values = [field.to_python(value) for field, value in zip(self.fields, record)]
+        return Survey.from_db('default', self.field_names, values)
+
+    def __len__(self):
+        return self.count
+
+
+def write_snapshot(surveys, path=None, version=None):
+    """
+    Записывает снимок каталога и атомарно заменяет текущий файл
+
+    Args:
+        surveys: Итерируемые активные опросы (читаются после версии)
+        path: Путь к файлу (по умолчанию SURVEY_CATALOG_PATH)
+        version: Версия каталога, прочитанная до выборки опросов
+            (по умолчанию текущая)
+
+    Returns:
+        Количество записей
+    """
+    if version is None:
+        version = catalog_version(create=True)
+    path = Path(path or catalog_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fields = _fields()
+    encoder = _RecordEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    records = []
+    for survey in surveys:
+        values = [field.value_from_object(survey) for field in fields]
+        records.append((_slug_hash(survey.slug), encoder.encode(values).encode()))
+    records.sort(key=lambda item: item[0])
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.catalog-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, _schema_signature(), len(records), version or 0))
+            offset = 0
+            for key, data in records:
+                f.write(ENTRY.pack(key, offset, len(data)))
+                offset += len(data)
+            for _, data in records:
+                f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(records)
+
+
+def rebuild_catalog():
+    """
+    Пересобирает снимок этого сервера из активных опросов
+
+    Одновременно работает одна пересборка на сервер; если версия каталога
+    изменилась во время нее, снимок собирается повторно.
+
+    Returns:
+        Количество записей или None, если пересборка уже выполняется
+    """
+    lock_key = f'survey_catalog_lock_{socket.gethostname()}_{_slug_hash(str(catalog_path()))}'
+    if not cache.add(lock_key, 1, REBUILD_LOCK_TIMEOUT):
+        return None
+    try:
+        while True:
+            version = catalog_version(create=True)
+            # Закрытые по расписанию опросы уже не откроются
+            surveys = Survey.objects.filter(is_active=True).exclude(closes_at__lte=timezone.now())
+            count = write_snapshot(surveys.iterator(), version=version)
+            if catalog_version() == version:
+                return count
+    finally:
+        cache.delete(lock_key)
+
+
+def invalidate_catalog():
+    """
+    После коммита: новая версия каталога в общем кэше
+
+    Снимки всех серверов перестают использоваться до пересборки; файл этого
+    сервера удаляется сразу.
+    """
+    def invalidate():
+        global _checked_version
+        version = secrets.randbits(63)
+        cache.set(VERSION_KEY, version, None)
+        _checked_version = (version, time.monotonic())
+        try:
+            os.unlink(catalog_path())
+        except FileNotFoundError:
+            pass
+
+    transaction.on_commit(invalidate)
+
+
+def get_snapshot():
+    """
+    Актуальный снимок каталога текущего процесса
+
+    Файл проверяется одним stat() на вызов: если его удалили или заменили,
+    отображение пересоздается. Снимок с версией, отличной от версии в
+    общем кэше, не используется.
+
+    Returns:
+        CatalogSnapshot или None, если актуального снимка нет
+    """
+    global _current
+    try:
+        stat = os.stat(catalog_path())
+    except FileNotFoundError:
+        _current = None
+        return None
+
+    snapshot = _current
+    if snapshot is None or snapshot.identity != (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+        with _lock:
+            try:
+                # Старое отображение закроется сборщиком мусора, когда его
+                # перестанут использовать другие потоки
+                _current = CatalogSnapshot(catalog_path())
+            except (OSError, ValueError, struct.error):
+                _current = None
+            snapshot = _current
+
+    if snapshot is None or snapshot.version != _shared_version():
+        return None
+    return snapshot
@@ -0,0 +1,315 @@
+"""
+Счетчики просмотров опросов с пакетной записью в БД
+
+Просмотр страницы не пишет в базу данных: счетчик увеличивается в Redis
+(HINCRBY) или в памяти процесса, а flush_counters() периодически переносит
+накопленные значения в SurveyDailyStat одним пакетом.
+
+Бэкенд задается настройкой SURVEY_COUNTER_BACKEND:
+    redis — общий хэш в Redis на каждый день, сброс задачей Celery beat
+    memory — Counter в памяти процесса, сброс после запроса раз в интервал
+
+Уникальные студенты опросов с авторизацией считаются там же:
+HyperLogLog в Redis (PFADD/PFCOUNT, ~12 КБ на ключ, погрешность ~0.8%)
+или точный StudentBitmap, который сбрасывается в SurveyDailyStat.respondents.
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.signals import request_finished, setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.common.bitmaps import StudentBitmap
+
+from .models import Survey, SurveyDailyStat
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('views', 'opens')
+RESPONDENTS_DAILY_TTL = 60 * 60 * 24 * 90  # дневные HyperLogLog хранятся 90 дней
+
+
+class RedisCounterBackend:
+    """Счетчики в Redis: хэш survey_counters:<дата>, поле <survey_id>:<поле>"""
+
+    key_prefix = 'survey_counters'
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def incr(self, day, survey_id, field):
+        self.client.hincrby(f'{self.key_prefix}:{day.isoformat()}', f'{survey_id}:{field}', 1)
+
+    def drain(self):
+        """Атомарно забирает и обнуляет накопленные значения"""
+        counts = Counter()
+        for key in self.client.scan_iter(f'{self.key_prefix}:*'):
+            pipe = self.client.pipeline(transaction=True)
+            pipe.hgetall(key)
+            pipe.delete(key)
+            values, _ = pipe.execute()
+            day = date.fromisoformat(key.decode().split(':', 1)[1])
+            for name, value in values.items():
+                survey_id, field = name.decode().split(':')
+                counts[(day, int(survey_id), field)] += int(value)
+        return counts
+
+    def restore(self, counts, respondents=None):
+        """Возвращает значения обратно, если запись в БД не удалась"""
+        pipe = self.client.pipeline(transaction=False)
+        for (day, survey_id, field), value in counts.items():
+            pipe.hincrby(f'{self.key_prefix}:{day.isoformat()}', f'{survey_id}:{field}', value)
+        pipe.execute()
+
+    def _respondents_key(self, survey_id, day=None):
+        return f'survey_respondents:{survey_id}:{day.isoformat() if day else "total"}'
+
+    def add_respondent(self, day, survey_id, student_id):
+        daily_key = self._respondents_key(survey_id, day)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.pfadd(daily_key, student_id)
+        pipe.expire(daily_key, RESPONDENTS_DAILY_TTL)
+        pipe.pfadd(self._respondents_key(survey_id), student_id)
+        pipe.execute()
+
+    def drain_respondents(self):
+        # HyperLogLog живет в Redis, в БД переносить нечего
+        return {}
+
+    def count_respondents(self, survey_ids, days=None):
+        """
+        Оценка количества уникальных студентов (PFCOUNT)
+
+        Args:
+            survey_ids: ID опросов
+            days: Список дней; None — за все время
+
+        Returns:
+            Dict {survey_id: количество}
+        """
+        pipe = self.client.pipeline(transaction=False)
+        for survey_id in survey_ids:
+            if days is None:
+                pipe.pfcount(self._respondents_key(survey_id))
+            else:
+                pipe.pfcount(*[self._respondents_key(survey_id, day) for day in days])
+        return dict(zip(survey_ids, pipe.execute()))
+
+
+class MemoryCounterBackend:
+    """Счетчики в памяти процесса (каждый воркер сбрасывает свои)"""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._respondents = defaultdict(StudentBitmap)
+        self._lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    def incr(self, day, survey_id, field):
+        with self._lock:
+            self._counts[(day, survey_id, field)] += 1
+
+    def drain(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        return counts
+
+    def restore(self, counts, respondents=None):
+        with self._lock:
+            self._counts.update(counts)
+            for key, bitmap in (respondents or {}).items():
+                self._respondents[key].update(bitmap)
+
+    def add_respondent(self, day, survey_id, student_id):
+        with self._lock:
+            self._respondents[(day, survey_id)].add(student_id)
+
+    def drain_respondents(self):
+        with self._lock:
+            respondents, self._respondents = self._respondents, defaultdict(StudentBitmap)
+        return dict(respondents)
+
+    def count_respondents(self, survey_ids, days=None):
+        """Точное количество по битовым массивам из БД и еще не сброшенным"""
+        merged = defaultdict(StudentBitmap)
+        stats = SurveyDailyStat.objects.filter(
+            survey_id__in=survey_ids, respondents__isnull=False
+        )
+        if days is not None:
+            stats = stats.filter(date__in=days)
+        for survey_id, data in stats.values_list('survey_id', 'respondents'):
+            merged[survey_id].update(StudentBitmap.from_bytes(data))
+
+        with self._lock:
+            for (day, survey_id), bitmap in self._respondents.items():
+                if survey_id in survey_ids and (days is None or day in days):
+                    merged[survey_id].update(bitmap)
+
+        return {survey_id: len(merged[survey_id]) for survey_id in survey_ids}
+
+
+_backend = None
+_flush_lock = threading.Lock()
+
+
+def get_counter_backend():
+    """Бэкенд счетчиков согласно SURVEY_COUNTER_BACKEND (один на процесс)"""
+    global _backend
+    if _backend is None:
+        if settings.SURVEY_COUNTER_BACKEND == 'memory':
+            _backend = MemoryCounterBackend()
+        else:
+            _backend = RedisCounterBackend(settings.SURVEY_COUNTER_REDIS_URL)
+    return _backend
+
+
+@receiver(setting_changed)
+def reset_counter_backend(setting, **kwargs):
+    global _backend
+    if setting in ('SURVEY_COUNTER_BACKEND', 'SURVEY_COUNTER_REDIS_URL'):
+        _backend = None
+
+
+def _incr(survey_id, field):
+    try:
+        get_counter_backend().incr(timezone.localdate(), survey_id, field)
+    except Exception:
+        # Статистика не должна ломать показ опроса
+        logger.exception('Не удалось увеличить счетчик %s опроса %s', field, survey_id)
+
+
+def record_view(survey_id):
+    """Просмотр страницы опроса"""
+    _incr(survey_id, 'views')
+
+
+def record_open(survey_id):
+    """Загрузка встроенной Google Form"""
+    _incr(survey_id, 'opens')
+
+
+def record_respondent(survey_id, student_id):
+    """Студент NII EDU открыл опрос с авторизацией"""
+    try:
+        get_counter_backend().add_respondent(timezone.localdate(), survey_id, int(student_id))
+    except Exception:
+        logger.exception('Не удалось учесть студента опроса %s', survey_id)
+
+
+def count_respondents(survey_ids, period='total'):
+    """
+    Количество уникальных студентов по опросам
+
+    Args:
+        survey_ids: ID опросов
+        period: total — за все время, today — за сегодня, week — за 7 дней
+
+    Returns:
+        Dict {survey_id: количество}; пустой, если хранилище недоступно
+    """
+    survey_ids = list(survey_ids)
+    if not survey_ids:
+        return {}
+    days = None
+    if period != 'total':
+        today = timezone.localdate()
+        length = 7 if period == 'week' else 1
+        days = [today - timedelta(days=i) for i in range(length)]
+    try:
+        return get_counter_backend().count_respondents(survey_ids, days)
+    except Exception:
+        logger.exception('Не удалось получить количество студентов')
+        return {}
+
+
+def flush_counters():
+    """
+    Переносит накопленные счетчики в SurveyDailyStat
+
+    Returns:
+        Количество записанных строк статистики
+    """
+    if not _flush_lock.acquire(blocking=False):
+        return 0
+    try:
+        backend = get_counter_backend()
+        counts = backend.drain()
+        respondents = backend.drain_respondents()
+        if not counts and not respondents:
+            return 0
+        try:
+            return _write_counts(counts, respondents)
+        except Exception:
+            backend.restore(counts, respondents)
+            raise
+    finally:
+        _flush_lock.release()
+
+
+def _write_counts(counts, respondents):
+    totals = defaultdict(dict)
+    for (day, survey_id, field), value in counts.items():
+        if field in COUNTER_FIELDS:
+            totals[(day, survey_id)][field] = totals[(day, survey_id)].get(field, 0) + value
+    for key in respondents:
+        totals.setdefault(key, {})
+
+    survey_ids = set(Survey.objects.filter(
+        pk__in={survey_id for _, survey_id in totals}
+    ).values_list('pk', flat=True))
+    days = {day for day, _ in totals}
+
+    with transaction.atomic():
+        existing = {
+            (stat.date, stat.survey_id): stat
+            for stat in SurveyDailyStat.objects.select_for_update().filter(
+                date__in=days, survey_id__in=survey_ids
+            )
+        }
+        to_update, to_create = [], []
+        for (day, survey_id), values in totals.items():
+            if survey_id not in survey_ids:
+                continue  # опрос удален до сброса счетчиков
+            stat = existing.get((day, survey_id))
+            if stat is None:
+                stat = SurveyDailyStat(survey_id=survey_id, date=day)
+                to_create.append(stat)
+            else:
+                to_update.append(stat)
+            for field, value in values.items():
+                setattr(stat, field, getattr(stat, field) + value)
+
+            bitmap = respondents.get((day, survey_id))
+            if bitmap:
+                bitmap.update(StudentBitmap.from_bytes(stat.respondents))
+                stat.respondents = bitmap.to_bytes()
+                stat.unique_respondents = len(bitmap)
+
+        SurveyDailyStat.objects.bulk_update(
+            to_update, COUNTER_FIELDS + ('respondents', 'unique_respondents'), batch_size=500
+        )
+        SurveyDailyStat.objects.bulk_create(to_create, batch_size=500)
+
+    return len(to_update) + len(to_create)
+
+
+@receiver(request_finished)
+def flush_memory_counters(sender, **kwargs):
+    """Периодический сброс счетчиков из памяти (после отправки ответа)"""
+    backend = _backend
+    if not isinstance(backend, MemoryCounterBackend):
+        return
+    if time.monotonic() - backend.last_flush < settings.SURVEY_COUNTER_FLUSH_INTERVAL:
+        return
+    backend.last_flush = time.monotonic()
+    try:
+        flush_counters()
+    except Exception:
+        logger.exception('Не удалось сбросить счетчики просмотров')
@@ -0,0 +1,77 @@
+"""
+Кэширование публичных страниц на reverse proxy / CDN
+
+Страницы embed и опросов без входа отдаются с Cache-Control для общего кэша
+(s-maxage) и заголовком surrogate-ключей: survey-<pk> и общий ключ surveys.
+При изменении опросов ключи собираются за транзакцию и после коммита
+отправляются одной фоновой задачей на SURVEY_PURGE_URL пачками по
+SURVEY_PURGE_BATCH_SIZE.
+"""
+import math
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+
+from apps.common.tasks import enqueue
+
+ALL_SURVEYS_KEY = 'surveys'
+
+_pending = threading.local()
+
+
+def surrogate_key(survey_id):
+    return f'survey-{survey_id}'
+
+
+def add_edge_headers(response, survey_id, expires_at=None):
+    """
+    Заголовки для кэша на прокси, привязанные к опросу
+
+    Args:
+        expires_at: Ближайший переход по расписанию; s-maxage не длиннее него
+    """
+    s_maxage = settings.SURVEY_EDGE_CACHE_SECONDS
+    if expires_at is not None:
+        remaining = math.ceil((expires_at - timezone.now()).total_seconds())
+        s_maxage = max(0, min(s_maxage, remaining))
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=0,  # браузер перепроверяет, прокси хранит s-maxage
+        s_maxage=s_maxage,
+    )
+    response[settings.SURVEY_SURROGATE_KEY_HEADER] = f'{surrogate_key(survey_id)} {ALL_SURVEYS_KEY}'
+    return response
+
+
+def add_private_headers(response):
+    """Страница зависит от пользователя: прокси не должен ее хранить"""
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def queue_purge(survey_ids):
+    """
+    Добавляет опросы в очередь очистки кэша прокси
+
+    Ключи копятся до коммита транзакции и отправляются одной задачей;
+    после отката они уйдут со следующей очисткой.
+    """
+    if not settings.SURVEY_PURGE_URL:
+        return
+    keys = getattr(_pending, 'keys', set())
+    keys.update(surrogate_key(survey_id) for survey_id in survey_ids if survey_id)
+    _pending.keys = keys
+    transaction.on_commit(_flush)
+
+
+def _flush():
+    from .tasks import purge_edge_cache
+
+    keys = getattr(_pending, 'keys', None)
+    _pending.keys = set()
+    if keys:
+        enqueue(purge_edge_cache, sorted(keys))
@@ -0,0 +1,308 @@
+"""
+Потоковая выгрузка опросов и их истории в CSV и XLSX
+
+Строки читаются из базы частями через iterator() и сразу отдаются клиенту,
+поэтому память не зависит от размера выгрузки. XLSX собирается вручную:
+zip пишется в поток без перемотки (с дескрипторами данных), лист —
+строками inlineStr, без общей таблицы строк.
+"""
+import csv
+import io
+import os
+import re
+import secrets
+import tempfile
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import F, Func, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Survey, SurveyDailyStat
+
+ITERATOR_CHUNK_SIZE = 2000
+ROWS_PER_CHUNK = 500  # строк в одном куске ответа
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+HISTORY_TYPES = {'+': 'Создан', '~': 'Изменен', '-': 'Удален'}
+
+# Заголовок колонки -> выражение для values_list()
+SURVEY_COLUMNS = {
+    'ID': 'pk',
+    'Название': 'title',
+    'Slug': 'slug',
+    'Google Form': 'google_form_url',
+    'Активен': 'is_active',
+    'Требуется авторизация': 'is_login_req',
+    'Открывается': 'opens_at',
+    'Закрывается': 'closes_at',
+    'Создал': 'created_by__username',
+    'Дата создания': 'created_at',
+    'Дата обновления': 'updated_at',
+    'Просмотры': 'total_views',
+    'Открытия формы': 'total_opens',
+}
+
+HISTORY_COLUMNS = {
+    'ID записи': 'history_id',
+    'ID опроса': 'id',
+    'Название': 'title',
+    'Slug': 'slug',
+    'Активен': 'is_active',
+    'Требуется авторизация': 'is_login_req',
+    'Действие': 'history_type',
+    'Дата': 'history_date',
+    'Пользователь': 'history_user__username',
+    'Причина': 'history_change_reason',
+}
+
+
+def _daily_total(field):
+    """Сумма поля дневной статистики опроса коррелированным подзапросом"""
+    return Subquery(
+        SurveyDailyStat.objects
+        .filter(survey=OuterRef('pk'))
+        .order_by()
+        .annotate(total=Func(F(field), function='SUM'))
+        .values('total')
+    )
+
+
+def with_totals(queryset):
+    """
+    Просмотры и открытия формы за все время, как в списке админки
+
+    Подзапрос вместо Sum('daily_stats__...'): без JOIN и GROUP BY по всему
+    списку, а COUNT и выборки по pk (действия, удаление) его не выполняют.
+    """
+    return queryset.annotate(
+        total_views=_daily_total('views'),
+        total_opens=_daily_total('opens'),
+    )
+
+
+def survey_rows(queryset):
+    """Строки выгрузки опросов из queryset списка в админке"""
+    fields = list(SURVEY_COLUMNS.values())
+    for row in queryset.order_by('pk').values_list(*fields).iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield row
+
+
+def history_rows(survey_ids):
+    """Строки истории изменений опросов (survey_ids — список или подзапрос)"""
+    fields = list(HISTORY_COLUMNS.values())
+    type_index = fields.index('history_type')
+    queryset = Survey.history.filter(id__in=survey_ids).order_by('history_id')
+    for row in queryset.values_list(*fields).iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        row = list(row)
+        row[type_index] = HISTORY_TYPES.get(row[type_index], row[type_index])
+        yield row
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Да' if value else 'Нет'
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+
+def csv_stream(headers, rows):
+    """CSV кусками по ROWS_PER_CHUNK строк (с BOM для Excel)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(headers)
+    for number, row in enumerate(rows, 1):
+        writer.writerow([_cell_text(value) for value in row])
+        if number % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+class _StreamBuffer:
+    """Файл для ZipFile без перемотки: накопленное забирается через take()"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _column_name(index):
+    name = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = chr(65 + remainder) + name
+    return name
+
+
+def _xlsx_row(number, values):
+    cells = []
+    for index, value in enumerate(values):
+        ref = f'{_column_name(index)}{number}'
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        elif value is not None:
+            text = escape(_cell_text(value))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{number}">{"".join(cells)}</row>'
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def xlsx_stream(headers, rows):
+    """XLSX кусками: zip пишется в поток, лист — по ROWS_PER_CHUNK строк"""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            sheet.write(_xlsx_row(1, headers).encode())
+            for number, row in enumerate(rows, 2):
+                sheet.write(_xlsx_row(number, row).encode())
+                if number % ROWS_PER_CHUNK == 0:
+                    yield buffer.take()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.take()
+
+
+def export_stream(kind, fmt, source):
+    """
+    Куски файла выгрузки
+
+    Args:
+        kind: 'surveys' (source — queryset опросов) или 'history'
+            (source — ID опросов или подзапрос)
+        fmt: 'csv' или 'xlsx'
+    """
+    if kind == 'history':
+        headers, rows = list(HISTORY_COLUMNS), history_rows(source)
+    else:
+        headers, rows = list(SURVEY_COLUMNS), survey_rows(source)
+    stream = xlsx_stream if fmt == 'xlsx' else csv_stream
+    return stream(headers, rows)
+
+
+# <kind>_<дата>_<время>_<ID пользователя>_<случайный токен>.<формат>
+EXPORT_FILENAME_RE = re.compile(r'^(surveys|history)_\d{8}_\d{6}_(?P<owner>\d+)_[0-9a-f]{16}\.(csv|xlsx)$')
+
+
+def export_filename(kind, fmt, owner_id):
+    """
+    Имя файла выгрузки
+
+    Случайный токен не дает двум выгрузкам одной секунды перезаписать друг
+    друга, а по ID владельца скачивание разрешается только ему.
+    """
+    return f'{kind}_{timezone.localtime():%Y%m%d_%H%M%S}_{owner_id}_{secrets.token_hex(8)}.{fmt}'
+
+
+def export_owner(filename):
+    """ID пользователя, запустившего выгрузку, или None для чужого имени файла"""
+    match = EXPORT_FILENAME_RE.match(filename)
+    return int(match['owner']) if match else None
+
+
+def export_root():
+    return settings.SURVEY_EXPORT_ROOT
+
+
+def export_path(filename):
+    """Путь к готовой выгрузке или None (имя только из SURVEY_EXPORT_ROOT)"""
+    if os.path.basename(filename) != filename or filename.startswith('.'):
+        return None
+    path = export_root() / filename
+    return path if path.is_file() else None
+
+
+def prune_exports():
+    """Удаляет выгрузки старше SURVEY_EXPORT_KEEP_SECONDS"""
+    root = export_root()
+    if not root.exists():
+        return
+    expired = timezone.now().timestamp() - settings.SURVEY_EXPORT_KEEP_SECONDS
+    for path in root.iterdir():
+        if path.is_file() and path.stat().st_mtime < expired:
+            path.unlink(missing_ok=True)
+
+
+def write_export(kind, fmt, source, filename):
+    """
+    Записывает выгрузку в SURVEY_EXPORT_ROOT (через временный файл)
+
+    Returns:
+        Путь к готовому файлу
+    """
+    root = export_root()
+    root.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix='.export-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in export_stream(kind, fmt, source):
+                f.write(chunk)
+        os.replace(tmp_path, root / filename)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return root / filename
@@ -0,0 +1,185 @@
+"""
+Проверка ссылок Google Forms активных опросов
+
+Ссылки проверяются конкурентно через asyncio: одновременно не больше
+FORM_CHECK_CONCURRENCY запросов и не чаще FORM_CHECK_HOST_RATE запросов в
+секунду к одному хосту (все формы живут на docs.google.com, и без
+ограничения проверка тысяч опросов упирается в 429). HTTP-запросы
+выполняет requests в пуле потоков размером с FORM_CHECK_CONCURRENCY.
+
+Результат каждой проверки хранится в кэше вместе со временем проверки,
+ETag и Last-Modified. Следующая проверка той же ссылки отправляет
+If-None-Match / If-Modified-Since; ответ 304 подтверждает прежний статус
+без загрузки страницы формы.
+
+Статусы:
+    ok          форма открыта
+    closed      форма закрыта для ответов (редирект на /closedform)
+    login       форма требует входа в Google-аккаунт
+    missing     форма удалена или ссылка неверна (404 / 410)
+    error       другой ответ сервера или ошибка соединения
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Survey
+
+logger = logging.getLogger(__name__)
+
+FORM_STATUS_TIMEOUT = 60 * 60 * 24 * 7  # неделя: статус виден, даже если проверки остановились
+USER_AGENT = 'niu-survey-form-check/1.0'
+
+STATUS_LABELS = {
+    'ok': 'Открыта',
+    'closed': 'Закрыта',
+    'login': 'Нужен вход Google',
+    'missing': 'Не найдена',
+    'error': 'Ошибка',
+}
+
+
+def form_status_key(survey_id):
+    return f"survey_form_status_{survey_id}"
+
+
+def get_form_status(survey_id):
+    """Последний результат проверки формы опроса или None"""
+    return cache.get(form_status_key(survey_id))
+
+
+def get_form_statuses(survey_ids):
+    """Результаты проверки форм нескольких опросов одним запросом к кэшу"""
+    keys = {form_status_key(survey_id): survey_id for survey_id in survey_ids}
+    return {keys[key]: result for key, result in cache.get_many(keys).items()}
+
+
+def classify(response):
+    """Статус формы по ответу (после редиректов)"""
+    url = response.url or ''
+    if response.status_code in (404, 410):
+        return 'missing'
+    if response.status_code >= 400:
+        return 'error'
+    if '/closedform' in url:
+        return 'closed'
+    if 'accounts.google.com' in urlsplit(url).netloc:
+        return 'login'
+    return 'ok'
+
+
+class HostRateLimiter:
+    """Не чаще rate запросов в секунду к одному хосту"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._locks = {}
+        self._next = {}
+
+    async def wait(self, host):
+        if not self.interval:
+            return
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            delay = self._next.get(host, now) - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next[host] = max(now, self._next.get(host, now)) + self.interval
+
+
+def _fetch(session, url, previous, timeout):
+    """Условный GET ссылки формы (выполняется в потоке)"""
+    headers = {'User-Agent': USER_AGENT}
+    if previous and previous.get('url') == url:
+        if previous.get('etag'):
+            headers['If-None-Match'] = previous['etag']
+        if previous.get('last_modified'):
+            headers['If-Modified-Since'] = previous['last_modified']
+    # stream=True: тело страницы формы для статуса не нужно
+    with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        return response
+
+
+async def _check(survey_id, url, previous, session, executor, semaphore, limiter, timeout):
+    loop = asyncio.get_running_loop()
+    async with semaphore:
+        await limiter.wait(urlsplit(url).netloc)
+        started = time.perf_counter()
+        try:
+            response = await loop.run_in_executor(executor, _fetch, session, url, previous, timeout)
+        except Exception as error:
+            logger.warning('Проверка формы опроса %s не удалась: %s', survey_id, error)
+            return {
+                'status': 'error', 'http_status': None, 'error': str(error)[:200],
+                'url': url, 'checked_at': time.time(),
+                'elapsed_ms': (time.perf_counter() - started) * 1000,
+            }
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if response.status_code == 304 and previous:
+        return {**previous, 'http_status': 304, 'checked_at': time.time(), 'elapsed_ms': elapsed_ms}
+    return {
+        'status': classify(response),
+        'http_status': response.status_code,
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'checked_at': time.time(),
+        'elapsed_ms': elapsed_ms,
+    }
+
+
+async def _check_all(surveys, previous, concurrency, host_rate, timeout):
+    import requests
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = HostRateLimiter(host_rate)
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        results = await asyncio.gather(*(
+            _check(pk, url, previous.get(form_status_key(pk)), session, executor, semaphore, limiter, timeout)
+            for pk, url in surveys
+        ))
+    return dict(zip((pk for pk, _ in surveys), results))
+
+
+def check_forms(survey_ids=None, concurrency=None, host_rate=None, timeout=None):
+    """
+    Проверяет формы активных опросов и сохраняет статусы в кэш
+
+    Args:
+        survey_ids: Только эти опросы (по умолчанию все активные)
+        concurrency: Одновременных запросов (FORM_CHECK_CONCURRENCY)
+        host_rate: Запросов в секунду к одному хосту (FORM_CHECK_HOST_RATE)
+        timeout: Таймаут запроса в секундах (FORM_CHECK_TIMEOUT)
+
+    Returns:
+        Словарь {survey_id: результат проверки}
+    """
+    queryset = Survey.objects.filter(is_active=True)
+    if survey_ids is not None:
+        queryset = queryset.filter(pk__in=survey_ids)
+    surveys = list(queryset.values_list('pk', 'google_form_url'))
+    if not surveys:
+        return {}
+
+    previous = cache.get_many([form_status_key(pk) for pk, _ in surveys])
+    results = asyncio.run(_check_all(
+        surveys,
+        previous,
+        concurrency or settings.FORM_CHECK_CONCURRENCY,
+        settings.FORM_CHECK_HOST_RATE if host_rate is None else host_rate,
+        timeout or settings.FORM_CHECK_TIMEOUT,
+    ))
+    cache.set_many(
+        {form_status_key(pk): result for pk, result in results.items()}, FORM_STATUS_TIMEOUT
+    )
+    return results
@@ -0,0 +1,44 @@
+"""
+Инкрементальная агрегация загруженных ответов
+
+    python manage.py aggregate_responses [slug]
+    python manage.py aggregate_responses --loop --interval 10
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.surveys.aggregation import ResponseAggregator
+from apps.surveys.models import Survey
+
+
+class Command(BaseCommand):
+    help = 'Добавляет новые ответы к накопленной статистике опросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slug', nargs='?', help='Только этот опрос')
+        parser.add_argument('--loop', action='store_true', help='Работать непрерывно')
+        parser.add_argument('--interval', type=int, default=10, help='Пауза между проходами, секунды')
+
+    def handle(self, *args, **options):
+        while True:
+            for survey_id in self._survey_ids(options['slug']):
+                started = time.perf_counter()
+                rows = ResponseAggregator(survey_id).update()
+                if rows:
+                    self.stdout.write(
+                        f'Опрос {survey_id}: +{rows} ответов за {time.perf_counter() - started:.3f} с'
+                    )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+
+    def _survey_ids(self, slug):
+        if slug:
+            survey = Survey.objects.filter(slug=slug).first()
+            if survey is None:
+                raise CommandError(f'Опрос со slug "{slug}" не найден')
+            return [survey.pk]
+        root = settings.SURVEY_RESPONSES_ROOT
+        return [p.name for p in root.iterdir() if p.is_dir()] if root.exists() else []
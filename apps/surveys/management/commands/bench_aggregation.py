@@ -0,0 +1,52 @@
+"""
+Время инкрементальной агрегации на пачку ответов при росте объема данных
+"""
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from apps.surveys.aggregation import ResponseAggregator
+from apps.surveys.responses import ResponseStore
+
+from .bench_responses import write_synthetic_export
+
+
+class Command(BaseCommand):
+    help = 'Сравнение инкрементальной агрегации с полным пересчетом по мере роста данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batches', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=50_000)
+        parser.add_argument('--questions', type=int, default=20)
+
+    def handle(self, *args, **options):
+        local_cache = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with tempfile.TemporaryDirectory() as tmp, override_settings(
+            SURVEY_RESPONSES_ROOT=tmp, CACHES=local_cache
+        ):
+            batch = Path(tmp) / 'batch.csv'
+
+            self.stdout.write(f'{"всего строк":>12} {"инкремент, мс":>15} {"пересчет, мс":>15}')
+            for number in range(options['batches']):
+                # Каждая пачка — новые ответы: повторные отметки времени не загружаются
+                write_synthetic_export(
+                    batch, options['batch_size'], options['questions'],
+                    seed=number, start=number * options['batch_size'],
+                )
+                store = ResponseStore('bench')
+                store.ingest_csv(batch)
+
+                started = time.perf_counter()
+                ResponseAggregator('bench').update()
+                incremental = (time.perf_counter() - started) * 1000
+
+                started = time.perf_counter()
+                store.completion()
+                for index in range(len(store.questions)):
+                    store.distribution(index)
+                full = (time.perf_counter() - started) * 1000
+
+                self.stdout.write(f'{store.rows:>12} {incremental:>15.1f} {full:>15.1f}')
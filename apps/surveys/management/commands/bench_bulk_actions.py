@@ -0,0 +1,60 @@
+"""
+Массовое действие админки на большом числе опросов: время и история
+"""
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from apps.surveys.bulk import bulk_update_surveys
+from apps.surveys.models import Survey
+
+
+class Command(BaseCommand):
+    help = 'Замер деактивации опросов частями с записью истории'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--surveys', type=int, default=100_000)
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        local_cache = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        # Опросы создаются и откатываются в одной транзакции, фоновые задачи не запускаются
+        with tempfile.TemporaryDirectory() as tmp, override_settings(
+            SURVEY_CATALOG_PATH=Path(tmp) / 'catalog.bin', CACHES=local_cache
+        ), transaction.atomic():
+            Survey.objects.bulk_create([
+                Survey(
+                    title=f'Опрос {number}',
+                    slug=f'bench-bulk-{number}',
+                    google_form_url=f'https://docs.google.com/forms/d/e/{number}/viewform',
+                )
+                for number in range(options['surveys'])
+            ], batch_size=1000)
+            try:
+                self._bench(options)
+            finally:
+                transaction.set_rollback(True)
+
+    def _bench(self, options):
+        started = time.monotonic()
+
+        def progress(done, total):
+            self.stdout.write(f'  {done}/{total} за {time.monotonic() - started:.2f} с')
+
+        updated = bulk_update_surveys(
+            Survey.objects.filter(slug__startswith='bench-bulk-'),
+            change_reason='Деактивация опроса',
+            chunk_size=options['chunk_size'],
+            progress=progress,
+            is_active=False,
+        )
+        elapsed = time.monotonic() - started
+        history = Survey.history.filter(history_change_reason='Деактивация опроса').count()
+        self.stdout.write(self.style.SUCCESS(
+            f'{updated} опросов за {elapsed:.2f} с ({updated / elapsed:.0f} в секунду), '
+            f'исторических записей: {history}'
+        ))
@@ -0,0 +1,138 @@
+"""
+Поиск опроса по slug: снимок каталога (mmap) / кэш / ORM, и память воркера
+"""
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from apps.common.benchmarks import format_result, measure
+from apps.surveys.cache import get_active_survey
+from apps.surveys.catalog import CatalogSnapshot, catalog_path, get_snapshot, write_snapshot
+from apps.surveys.models import Survey
+
+
+def mapping_kb(path):
+    """
+    Rss / Pss / Private отображения файла из /proc/self/smaps (только Linux)
+    """
+    totals = {'Rss': 0, 'Pss': 0, 'Private': 0}
+    inside = False
+    try:
+        with open('/proc/self/smaps') as f:
+            for line in f:
+                parts = line.split()
+                if '-' in parts[0] and ':' not in parts[0]:
+                    inside = parts[-1] == str(path)
+                elif inside and parts[0] in ('Rss:', 'Pss:'):
+                    totals[parts[0][:-1]] += int(parts[1])
+                elif inside and parts[0].startswith('Private_'):
+                    totals['Private'] += int(parts[1])
+    except OSError:
+        return None
+    return totals
+
+
+class Command(BaseCommand):
+    help = 'Замер поиска опроса по slug и памяти на воркер для снимка каталога'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--surveys', type=int, default=10_000)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--iterations', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        local_cache = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with tempfile.TemporaryDirectory() as tmp, override_settings(
+            SURVEY_CATALOG_PATH=Path(tmp) / 'catalog.bin', CACHES=local_cache
+        ), transaction.atomic():
+            surveys = Survey.objects.bulk_create([
+                Survey(
+                    title=f'Опрос {number}',
+                    slug=f'bench-survey-{number}',
+                    google_form_url=f'https://docs.google.com/forms/d/e/{number}/viewform',
+                    description='Описание опроса ' * 10,
+                )
+                for number in range(options['surveys'])
+            ])
+            slugs = [survey.slug for survey in surveys]
+            try:
+                self._bench(slugs, options)
+            finally:
+                transaction.set_rollback(True)
+
+    def _bench(self, slugs, options):
+        iterations = options['iterations']
+        rng = random.Random(0)
+
+        def lookup():
+            get_active_survey(rng.choice(slugs))
+
+        # ORM и кэш: снимка нет
+        result = measure(lambda: Survey.objects.get(slug=rng.choice(slugs), is_active=True),
+                         iterations=iterations)
+        self.stdout.write(format_result('ORM', result))
+        for slug in slugs:
+            get_active_survey(slug)  # прогрев кэша
+        self.stdout.write(format_result('cache (locmem)', measure(lookup, iterations=iterations)))
+
+        write_snapshot(Survey.objects.filter(is_active=True).iterator())
+        snapshot = get_snapshot()
+        self.stdout.write(format_result('snapshot (mmap)', measure(lookup, iterations=iterations)))
+        self.stdout.write(format_result(
+            'snapshot: отсутствующий slug',
+            measure(lambda: snapshot.get('missing-survey'), iterations=iterations),
+        ))
+
+        size = catalog_path().stat().st_size
+        self.stdout.write(f'Размер снимка: {size / 1024:.1f} КБ на сервер')
+        self._bench_python_memory(slugs)
+        self._bench_worker_memory(slugs, options['workers'])
+
+    def _bench_python_memory(self, slugs):
+        """Память словаря slug -> Survey в процессе (аналог кэша на воркер)"""
+        tracemalloc.start()
+        local = {survey.slug: survey for survey in Survey.objects.filter(slug__in=slugs)}
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(f'dict slug -> Survey: {current / 1024:.1f} КБ на воркер ({len(local)} опросов)')
+
+    def _bench_worker_memory(self, slugs, workers):
+        """Память отображения снимка в воркерах после чтения всех записей"""
+        path = catalog_path()
+        if mapping_kb(path) is None or not hasattr(os, 'fork'):
+            self.stdout.write('Замер памяти воркеров доступен только в Linux')
+            return
+
+        snapshot = get_snapshot()
+        for slug in slugs:
+            snapshot.get(slug)  # страницы снимка в памяти родителя
+
+        readers = []
+        for _ in range(workers):
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                worker_snapshot = CatalogSnapshot(path)
+                for slug in slugs:
+                    worker_snapshot.get(slug)
+                os.write(write_fd, json.dumps(mapping_kb(path)).encode())
+                os._exit(0)
+            os.close(write_fd)
+            readers.append((pid, read_fd))
+
+        for pid, read_fd in readers:
+            with os.fdopen(read_fd) as f:
+                usage = json.loads(f.read())
+            os.waitpid(pid, 0)
+            self.stdout.write(
+                f"Воркер {pid}: снимок Rss {usage['Rss']} КБ, "
+                f"Pss {usage['Pss']} КБ, собственных страниц {usage['Private']} КБ"
+            )
@@ -0,0 +1,93 @@
+"""
+Повторный вход NII EDU: запрос к API против локальной проверки хэша пароля
+
+Поднимает заглушку NII EDU API с задержкой --upstream-delay-ms. Каждый
+студент входит дважды: первый вход идет в API, повторный (после выхода)
+с NIIEDU_LOCAL_VERIFY проверяется локально по PBKDF2-хэшу.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from apps.common.benchmarks import format_result, summarize
+from apps.surveys.services import NIIEDUAuthService
+from apps.surveys.tasks import get_auth_telemetry
+from config.celery import app as celery_app
+
+
+def upstream_handler(delay):
+    """Заглушка NII EDU API: успешный вход через delay секунд"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            time.sleep(delay)
+            body = json.dumps({'login': payload['login'], 'name': 'Student'}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = 'Задержка повторного входа NII EDU через API и с локальной проверкой'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=100)
+        parser.add_argument('--upstream-delay-ms', type=float, default=300)
+        parser.add_argument('--iterations', type=int, default=None, help='PBKDF2 (по умолчанию из настроек)')
+
+    def handle(self, *args, **options):
+        local_cache = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'auth': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'auth'},
+        }
+        verify_settings = {'NIIEDU_LOCAL_VERIFY': True}
+        if options['iterations']:
+            verify_settings['NIIEDU_LOCAL_VERIFY_ITERATIONS'] = options['iterations']
+
+        upstream = ThreadingHTTPServer(('127.0.0.1', 0), upstream_handler(options['upstream_delay_ms'] / 1000))
+        threading.Thread(target=upstream.serve_forever, daemon=True).start()
+        login_url = f'http://127.0.0.1:{upstream.server_port}/auth/login'
+
+        eager = celery_app.conf['CELERY_TASK_ALWAYS_EAGER']
+        # Телеметрия входа записывается на месте, без брокера
+        celery_app.conf['CELERY_TASK_ALWAYS_EAGER'] = True
+        try:
+            with override_settings(CACHES=local_cache, **verify_settings), \
+                    mock.patch.object(NIIEDUAuthService, 'LOGIN_URL', login_url):
+                self._bench(options)
+        finally:
+            celery_app.conf['CELERY_TASK_ALWAYS_EAGER'] = eager
+            upstream.shutdown()
+
+    def _bench(self, options):
+        first, repeat = [], []
+        for number in range(options['students']):
+            login = f'4622211{number:05d}'
+            for samples in (first, repeat):
+                started = time.perf_counter()
+                result = NIIEDUAuthService.login(login, f'password-{number}')
+                samples.append((time.perf_counter() - started) * 1000)
+                if not result['success']:
+                    raise RuntimeError(result['error'])
+                NIIEDUAuthService.logout(login)
+
+        telemetry = get_auth_telemetry()
+        self.stdout.write(format_result('первый вход (API)', summarize(first)))
+        self.stdout.write(format_result('повторный вход (локально)', summarize(repeat)))
+        self.stdout.write(self.style.SUCCESS(
+            f"запросов к API: {telemetry['success']}, "
+            f"без запроса к API: {telemetry['local']} из {options['students']} повторных входов"
+        ))
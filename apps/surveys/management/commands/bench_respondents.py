@@ -0,0 +1,74 @@
+"""
+Память на один опрос при учете уникальных студентов
+"""
+import random
+import sys
+from array import array
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.common.benchmarks import format_result, measure
+from apps.common.bitmaps import StudentBitmap
+
+
+def generate_logins(count, seed=0):
+    """
+    Логины в формате NII EDU: 4622 + год (2 цифры) + факультет (3) + номер (3),
+    например 462221101004
+    """
+    rng = random.Random(seed)
+    logins = set()
+    while len(logins) < count:
+        year = rng.randint(18, 25)
+        faculty = rng.randint(101, 140)
+        number = rng.randint(1, 999)
+        logins.add(int(f'4622{year:02d}{faculty:03d}{number:03d}'))
+    return list(logins)
+
+
+class Command(BaseCommand):
+    help = 'Замер памяти и скорости учета уникальных студентов (bitmap / HyperLogLog)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        logins = generate_logins(options['students'])
+        self.stdout.write(f'Студентов: {len(logins)}')
+
+        bitmap = StudentBitmap(logins)
+        exact = set(logins)
+        ordered = array('Q', sorted(logins))
+        self._row('StudentBitmap (память)', bitmap.nbytes)
+        self._row('StudentBitmap (сжатый, в БД)', len(bitmap.to_bytes()))
+        self._row('array(Q) отсортированный', ordered.itemsize * len(ordered))
+        self._row('set[int] Python', sys.getsizeof(exact) + sum(sys.getsizeof(i) for i in exact))
+        self._row('HyperLogLog (dense, теоретически)', 12 * 1024 + 16)
+        self._bench_redis(logins)
+
+        probe = iter(logins * 2)
+        self.stdout.write(format_result(
+            'StudentBitmap membership', measure(lambda: next(probe) in bitmap, iterations=10_000)
+        ))
+        self.stdout.write(f'Точное количество: {len(bitmap)}')
+
+    def _row(self, name, size):
+        self.stdout.write(f'{name:<40} {size / 1024:>10.1f} КБ')
+
+    def _bench_redis(self, logins):
+        try:
+            import redis
+            client = redis.Redis.from_url(settings.SURVEY_COUNTER_REDIS_URL)
+            key = 'survey_respondents:bench'
+            client.delete(key)
+            for start in range(0, len(logins), 10_000):
+                client.pfadd(key, *logins[start:start + 10_000])
+            self._row('HyperLogLog (Redis MEMORY USAGE)', client.memory_usage(key))
+            estimate = client.pfcount(key)
+            self.stdout.write(
+                f'PFCOUNT: {estimate} (ошибка {abs(estimate - len(logins)) / len(logins):.2%})'
+            )
+            client.delete(key)
+        except Exception as e:
+            self.stdout.write(f'Redis недоступен, замер HyperLogLog пропущен: {e}')
@@ -0,0 +1,60 @@
+"""
+Замер загрузки и статистики ответов на синтетическом экспорте Google Forms
+"""
+import csv
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from apps.common.benchmarks import format_result, measure
+from apps.surveys.responses import ResponseStore
+
+# Отметки времени разные у всех строк, иначе повторная загрузка их пропустит
+START = datetime(2025, 1, 1)
+ANSWERS = ['Полностью согласен', 'Согласен', 'Нейтрально', 'Не согласен', 'Полностью не согласен']
+
+
+def write_synthetic_export(path, rows, questions, seed=0, start=0):
+    """CSV в формате экспорта Google Forms: Timestamp + вопросы, строка start — первая"""
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Timestamp'] + [f'Вопрос {i + 1}' for i in range(questions)])
+        for row in range(rows):
+            writer.writerow(
+                [f'{START + timedelta(seconds=start + row):%Y/%m/%d %H:%M:%S}']
+                + [rng.choice(ANSWERS) if rng.random() > 0.05 else '' for _ in range(questions)]
+            )
+
+
+class Command(BaseCommand):
+    help = 'Замер загрузки CSV и векторной статистики ответов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500_000)
+        parser.add_argument('--questions', type=int, default=20)
+
+    def handle(self, *args, **options):
+        local_cache = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with tempfile.TemporaryDirectory() as tmp, override_settings(
+            SURVEY_RESPONSES_ROOT=tmp, CACHES=local_cache
+        ):
+            source = Path(tmp) / 'export.csv'
+            write_synthetic_export(source, options['rows'], options['questions'])
+            self.stdout.write(f'CSV: {source.stat().st_size / 1024 / 1024:.1f} МБ')
+
+            store = ResponseStore('bench')
+            started = time.perf_counter()
+            store.ingest_csv(source)
+            self.stdout.write(
+                f'Загрузка {store.rows} строк: {time.perf_counter() - started:.2f} с'
+            )
+
+            self.stdout.write(format_result('distribution (1 вопрос)', measure(lambda: store.distribution(0), iterations=50)))
+            self.stdout.write(format_result('crosstab (2 вопроса)', measure(lambda: store.crosstab(0, 1), iterations=50)))
+            self.stdout.write(format_result('completion (все вопросы)', measure(store.completion, iterations=20)))
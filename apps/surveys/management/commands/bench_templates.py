@@ -0,0 +1,107 @@
+"""
+Время рендера шаблонов опросов без кэша шаблонов и с ним
+
+    до      загрузчики без кэша: шаблон читается и компилируется на каждый рендер
+    после   cached.Loader из настроек
+
+Рендерится только шаблон (без view, базы и кэша страниц), поэтому замер
+показывает стоимость самого шаблона при промахе кэша страниц и для страниц,
+которые не кэшируются целиком (опросы со входом через NII EDU).
+
+Фрагменты {% cache %} не используются: скомпилированная статичная разметка
+рендерится быстрее, чем два обращения к кэшу по сети.
+"""
+import copy
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from apps.common.benchmarks import format_result, measure
+from apps.surveys.forms import NIIEDULoginForm
+from apps.surveys.models import Survey
+
+SCENARIOS = {
+    'до': False,
+    'после': True,
+}
+
+
+def _templates(cached_loaders):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    if not cached_loaders:
+        templates[0]['OPTIONS']['loaders'] = settings.TEMPLATE_LOADERS
+    return templates
+
+
+def _survey(number, **fields):
+    return Survey(
+        pk=number,
+        title=f'Опрос {number}',
+        slug=f'bench-templates-{number}',
+        google_form_url=f'https://docs.google.com/forms/d/e/{number}/viewform',
+        description='Описание опроса ' * 5,
+        created_at=timezone.now(),
+        **fields,
+    )
+
+
+def _cases():
+    """Шаблон и контекст, как их передают views"""
+    surveys = [_survey(number) for number in range(1, 49)]
+    paginator = Paginator(surveys, 12)
+    page = paginator.page(2)
+    survey = surveys[0]
+    login_survey = _survey(49, is_login_req=True)
+    return [
+        ('survey_list.html (стр. 2 из 4)', 'surveys/survey_list.html', {
+            'surveys': page.object_list, 'page_obj': page, 'paginator': paginator,
+            'is_paginated': True, 'title': 'Доступные опросы',
+        }),
+        ('survey_detail.html', 'surveys/survey_detail.html', {
+            'survey': survey, 'title': survey.title,
+            'embed_url': survey.get_google_form_embed_url(),
+        }),
+        ('survey_detail.html (вход NII EDU)', 'surveys/survey_detail.html', {
+            'survey': login_survey, 'title': login_survey.title,
+            'embed_url': login_survey.get_google_form_embed_url(),
+            'requires_auth': True, 'login_form': NIIEDULoginForm(),
+        }),
+        ('survey_embed.html', 'surveys/survey_embed.html', {
+            'survey': survey, 'embed_url': survey.get_google_form_embed_url(),
+        }),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Замер рендера шаблонов опросов без кэша шаблонов и с ним'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500)
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        cases = _cases()
+
+        results = {}
+        for scenario, cached_loaders in SCENARIOS.items():
+            with override_settings(TEMPLATES=_templates(cached_loaders)):
+                self.stdout.write(self.style.MIGRATE_HEADING(scenario))
+                for title, template_name, context in cases:
+                    result = measure(
+                        lambda: render_to_string(template_name, context, request=request),
+                        iterations=options['iterations'],
+                    )
+                    results.setdefault(title, {})[scenario] = result
+                    self.stdout.write(f'  {format_result(title, result)}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Ускорение (по медиане)'))
+        for title, by_scenario in results.items():
+            before, after = by_scenario['до']['p50_ms'], by_scenario['после']['p50_ms']
+            self.stdout.write(f'  {title:<40} x{before / after:.1f}')
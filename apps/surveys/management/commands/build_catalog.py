@@ -0,0 +1,37 @@
+"""
+Сборка снимка каталога активных опросов (например, при деплое)
+
+    python manage.py build_catalog
+    python manage.py build_catalog --loop --interval 5
+
+С --loop снимок этого сервера пересобирается, как только меняется версия
+каталога в общем кэше (на серверах без воркера Celery).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.surveys.catalog import catalog_path, get_snapshot, rebuild_catalog
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает снимок каталога активных опросов (SURVEY_CATALOG_PATH)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Работать непрерывно')
+        parser.add_argument('--interval', type=int, default=5, help='Пауза между проверками, секунды')
+
+    def handle(self, *args, **options):
+        while True:
+            if not options['loop'] or get_snapshot() is None:
+                self._rebuild()
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+
+    def _rebuild(self):
+        count = rebuild_catalog()
+        if count is None:
+            self.stdout.write('Пересборка уже выполняется в другом процессе')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{catalog_path()}: {count} опросов'))
@@ -0,0 +1,44 @@
+"""
+Проверка ссылок Google Forms активных опросов (то же делает задача Celery beat)
+"""
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from apps.surveys.form_checks import STATUS_LABELS, check_forms
+
+
+class Command(BaseCommand):
+    help = 'Проверяет ссылки Google Forms активных опросов и сохраняет статусы в кэш'
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_ids', nargs='*', type=int, help='Только эти опросы')
+        parser.add_argument('--concurrency', type=int, default=None)
+        parser.add_argument('--host-rate', type=float, default=None, help='Запросов в секунду к хосту, 0 — без ограничения')
+        parser.add_argument('--timeout', type=float, default=None)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        results = check_forms(
+            survey_ids=options['survey_ids'] or None,
+            concurrency=options['concurrency'],
+            host_rate=options['host_rate'],
+            timeout=options['timeout'],
+        )
+        elapsed = time.perf_counter() - started
+
+        for survey_id, result in sorted(results.items()):
+            if result['status'] != 'ok':
+                self.stdout.write(self.style.WARNING(
+                    f"  опрос {survey_id}: {STATUS_LABELS[result['status']]} "
+                    f"(HTTP {result['http_status'] or '—'}) {result['url']}"
+                ))
+
+        statuses = Counter(result['status'] for result in results.values())
+        not_modified = sum(1 for result in results.values() if result['http_status'] == 304)
+        self.stdout.write(self.style.SUCCESS(
+            f"Проверено форм: {len(results)} за {elapsed:.1f} с "
+            f"({', '.join(f'{STATUS_LABELS[status]}: {count}' for status, count in statuses.most_common())}; "
+            f"без изменений (304): {not_modified})"
+        ))
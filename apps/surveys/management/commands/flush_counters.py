@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.surveys.counters import flush_counters
+
+
+class Command(BaseCommand):
+    help = 'Переносит счетчики просмотров опросов в SurveyDailyStat'
+
+    def handle(self, *args, **options):
+        rows = flush_counters()
+        self.stdout.write(self.style.SUCCESS(f'Записано строк статистики: {rows}'))
@@ -0,0 +1,67 @@
+"""
+Загрузка CSV-экспортов ответов Google Forms
+
+    python manage.py ingest_responses <slug> <file.csv>
+    python manage.py ingest_responses --watch [--interval 30]
+
+В режиме --watch каталог SURVEY_RESPONSES_INBOX проверяется на файлы
+<slug>.csv или <slug>__<что угодно>.csv; загруженные файлы переносятся
+в подкаталог processed/, ошибочные — в failed/.
+"""
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.surveys.models import Survey
+from apps.surveys.responses import ResponseStore
+
+
+class Command(BaseCommand):
+    help = 'Загружает CSV-экспорт ответов Google Forms в колоночное хранилище'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slug', nargs='?')
+        parser.add_argument('path', nargs='?')
+        parser.add_argument('--watch', action='store_true', help='Следить за каталогом')
+        parser.add_argument('--directory', default=None, help='Каталог (по умолчанию SURVEY_RESPONSES_INBOX)')
+        parser.add_argument('--interval', type=int, default=30, help='Интервал проверки, секунды')
+        parser.add_argument('--once', action='store_true', help='Обработать каталог один раз и выйти')
+
+    def handle(self, *args, **options):
+        if options['watch'] or options['once']:
+            directory = Path(options['directory'] or settings.SURVEY_RESPONSES_INBOX)
+            directory.mkdir(parents=True, exist_ok=True)
+            while True:
+                self._process_directory(directory)
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+
+        if not options['slug'] or not options['path']:
+            raise CommandError('Укажите slug опроса и путь к CSV или используйте --watch')
+        survey = self._get_survey(options['slug'])
+        self._ingest(survey, Path(options['path']))
+
+    def _get_survey(self, slug):
+        try:
+            return Survey.objects.get(slug=slug)
+        except Survey.DoesNotExist:
+            raise CommandError(f'Опрос со slug "{slug}" не найден')
+
+    def _ingest(self, survey, path):
+        rows = ResponseStore(survey.pk).ingest_csv(path)
+        self.stdout.write(self.style.SUCCESS(f'{survey.slug}: загружено {rows} ответов из {path.name}'))
+
+    def _process_directory(self, directory):
+        for path in sorted(directory.glob('*.csv')):
+            slug = path.stem.split('__', 1)[0]
+            target = directory / 'processed'
+            try:
+                self._ingest(self._get_survey(slug), path)
+            except Exception as e:
+                self.stderr.write(f'{path.name}: {e}')
+                target = directory / 'failed'
+            target.mkdir(exist_ok=True)
+            path.rename(target / path.name)
@@ -0,0 +1,183 @@
+"""
+Микробенчмарки основных участков кода опросов с записью в историю
+
+Замеряются по отдельности:
+
+    Survey.get_google_form_embed_url, Survey.short_description
+    NIIEDULoginForm: валидация верных и ошибочных данных
+    Survey.save: генерация slug — свободного и занятого n опросами
+    dashboard_callback при n опросах в базе
+    survey_list.html с n опросами и survey_detail.html с описанием из n слов
+
+Размеры n задает --sizes. Опросы создаются в транзакции, которая
+откатывается в конце; каждое сохранение в замере Survey.save
+откатывается до точки сохранения, поэтому замер включает savepoint.
+
+Результаты с исходными замерами дописываются в BENCHMARK_HISTORY_PATH
+(JSONL) под id запуска; сравнение двух запусков — bench_compare.
+"""
+import platform
+import subprocess
+import tempfile
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from apps.common.benchmarks import append_history, format_result, measure
+from apps.common.dashboard import dashboard_callback
+from apps.surveys.forms import NIIEDULoginForm
+from apps.surveys.models import Survey
+
+# Валидация формы (десятки микросекунд) замеряется во столько раз чаще
+CHEAP_FACTOR = 10
+# Методы модели быстрее таймера: один замер — BATCH вызовов подряд
+BATCH = 1000
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _batch(func):
+    def run():
+        for _ in range(BATCH):
+            func()
+    return run
+
+
+def _rolled_back_save(title):
+    with transaction.atomic():
+        Survey(title=title, google_form_url='https://docs.google.com/forms/d/e/bench/viewform').save()
+        transaction.set_rollback(True)
+
+
+class Command(BaseCommand):
+    help = 'Микробенчмарки кода опросов с записью результатов в файл истории'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--sizes', default='10,100,1000', help='Размеры данных через запятую')
+        parser.add_argument('--filter', default='', help='Только замеры, в имени которых есть подстрока')
+        parser.add_argument('--label', default='', help='Метка запуска (ветка, описание изменения)')
+        parser.add_argument('--history', default=None, help='Файл истории (по умолчанию BENCHMARK_HISTORY_PATH)')
+        parser.add_argument('--no-save', action='store_true', help='Не записывать результаты в историю')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(',') if size.strip())
+        local_cache = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }
+        with tempfile.TemporaryDirectory() as tmp, override_settings(
+            CACHES=local_cache,
+            SURVEY_CATALOG_PATH=Path(tmp) / 'catalog.bin',
+            SURVEY_PURGE_URL='',
+        ), transaction.atomic():
+            try:
+                results = self._run(sizes, options)
+            finally:
+                transaction.set_rollback(True)
+
+        if options['no_save'] or not results:
+            return
+        created_at = timezone.now()
+        commit = git_commit()
+        run = f"{created_at:%Y%m%dT%H%M%S.%f}" + (f'-{commit}' if commit else '')
+        append_history(options['history'] or settings.BENCHMARK_HISTORY_PATH, [
+            {
+                'run': run,
+                'created_at': created_at.isoformat(),
+                'commit': commit,
+                'label': options['label'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'name': name,
+                **{key: value for key, value in result.items() if key != 'samples'},
+                'samples': [round(sample, 5) for sample in result['samples']],
+            }
+            for name, result in results.items()
+        ])
+        self.stdout.write(self.style.SUCCESS(f'Запуск {run} записан: {len(results)} замеров'))
+
+    def _cases(self, sizes):
+        """(имя, функция, множитель числа итераций, подготовка для размера)"""
+        survey = Survey(
+            title='Замер', slug='zamer', description='Описание опроса ' * 10,
+            google_form_url='https://docs.google.com/forms/d/e/bench/viewform',
+            created_at=timezone.now(),
+        )
+        valid = {'login': ' 462221101004 ', 'password': 'secret123'}
+        invalid = {'login': '4622-abc', 'password': ''}
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+
+        yield f'Survey.get_google_form_embed_url (x{BATCH})', _batch(survey.get_google_form_embed_url), 1, None
+        yield f'Survey.short_description (x{BATCH})', _batch(lambda: survey.short_description), 1, None
+        yield 'NIIEDULoginForm (верные данные)', lambda: NIIEDULoginForm(valid).is_valid(), CHEAP_FACTOR, None
+        yield 'NIIEDULoginForm (ошибки)', lambda: NIIEDULoginForm(invalid).is_valid(), CHEAP_FACTOR, None
+        # slugify без allow_unicode отбрасывает кириллицу: названия латиницей
+        yield 'Survey.save (новый slug)', lambda: _rolled_back_save('New survey'), 1, None
+
+        for size in sizes:
+            prepare = lambda size=size: self._fill(size)
+            yield f'Survey.save (slug занят) [n={size}]', lambda: _rolled_back_save('Dublikat'), 1, prepare
+            yield f'dashboard_callback [n={size}]', lambda: dashboard_callback(request, {}), 1, prepare
+
+            surveys = [
+                Survey(
+                    pk=number, title=f'Опрос {number}', slug=f'opros-{number}',
+                    description='Описание опроса ' * 5, created_at=timezone.now(),
+                    google_form_url=f'https://docs.google.com/forms/d/e/{number}/viewform',
+                )
+                for number in range(1, size + 1)
+            ]
+            list_context = {'surveys': surveys, 'title': 'Доступные опросы', 'is_paginated': False}
+            yield f'survey_list.html [n={size}]', (
+                lambda context=list_context: render_to_string('surveys/survey_list.html', context, request=request)
+            ), 1, None
+
+            detail = Survey(
+                pk=1, title='Опрос', slug='opros', description='слово ' * size,
+                google_form_url=survey.google_form_url, created_at=timezone.now(),
+            )
+            detail_context = {'survey': detail, 'title': detail.title, 'embed_url': detail.get_google_form_embed_url()}
+            yield f'survey_detail.html [n={size}]', (
+                lambda context=detail_context: render_to_string('surveys/survey_detail.html', context, request=request)
+            ), 1, None
+
+    def _fill(self, size):
+        """n опросов в базе; slug 'dublikat', 'dublikat-1', ... заняты"""
+        existing = Survey.objects.filter(slug__startswith='dublikat').count()
+        Survey.objects.bulk_create([
+            Survey(
+                title='Dublikat',
+                slug='dublikat' if number == 0 else f'dublikat-{number}',
+                google_form_url='https://docs.google.com/forms/d/e/bench/viewform',
+            )
+            for number in range(existing, size)
+        ])
+
+    def _run(self, sizes, options):
+        results = {}
+        for name, func, factor, prepare in self._cases(sizes):
+            if options['filter'] and options['filter'] not in name:
+                continue
+            if prepare is not None:
+                prepare()
+            result = measure(func, iterations=options['iterations'] * factor, keep_samples=True)
+            results[name] = result
+            self.stdout.write(format_result(name, result))
+        return results
@@ -0,0 +1,64 @@
+"""
+Прогрев кэша после деплоя или очистки Redis
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+
+from apps.surveys.warmup import languages, warm_caches
+
+
+class Command(BaseCommand):
+    help = 'Прогревает кэш slug, страниц опросов и страниц списка для всех активных опросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--deadline', type=float, default=None,
+            help='Ограничение времени в секундах (опросы по убыванию трафика)',
+        )
+        parser.add_argument(
+            '--list-pages', type=int, default=None,
+            help='Сколько первых страниц списка прогреть (по умолчанию все)',
+        )
+        parser.add_argument(
+            '--languages', default=None,
+            help='Языки через запятую (по умолчанию все из LANGUAGES)',
+        )
+        parser.add_argument('--progress-every', type=int, default=500)
+
+    def handle(self, *args, **options):
+        language_codes = None
+        if options['languages']:
+            language_codes = [code.strip() for code in options['languages'].split(',')]
+            unknown = set(language_codes) - set(languages())
+            if unknown:
+                raise CommandError(f"Неизвестные языки: {', '.join(sorted(unknown))}")
+
+        every = max(options['progress_every'], 1)
+        reported = [0]
+
+        def progress(done, total, elapsed):
+            if done - reported[0] >= every or done == total:
+                reported[0] = done
+                rate = done / elapsed if elapsed else 0
+                eta = (total - done) / rate if rate else 0
+                self.stdout.write(
+                    f'{done}/{total} опросов, {rate:.0f}/с, осталось ~{eta:.0f} с'
+                )
+
+        result = warm_caches(
+            concurrency=options['concurrency'],
+            deadline=options['deadline'],
+            list_pages=options['list_pages'],
+            language_codes=language_codes,
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Прогрето опросов: {result['surveys']}, страниц: {result['pages']} "
+            f"за {result['elapsed']:.1f} с (языки: {', '.join(language_codes or languages())}, "
+            f"кэш: {settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1]})"
+        ))
+        if result['skipped'] or result['failed']:
+            self.stdout.write(self.style.WARNING(
+                f"Пропущено по дедлайну: {result['skipped']}, с ошибкой: {result['failed']}"
+            ))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0004_historicalsurvey_is_login_req_survey_is_login_req'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveyDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('views', models.PositiveIntegerField(default=0, help_text='Открытия страницы опроса', verbose_name='Просмотры')),
+                ('opens', models.PositiveIntegerField(default=0, help_text='Загрузки встроенной Google Form', verbose_name='Открытия формы')),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='surveys.survey', verbose_name='Опрос')),
+            ],
+            options={
+                'verbose_name': 'Статистика опроса за день',
+                'verbose_name_plural': 'Статистика опросов по дням',
+                'db_table': 'surveys_survey_daily_stat',
+                'ordering': ['-date'],
+                'unique_together': {('survey', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0005_survey_daily_stat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='surveydailystat',
+            name='respondents',
+            field=models.BinaryField(blank=True, help_text='Сжатый StudentBitmap (только для SURVEY_COUNTER_BACKEND=memory)', null=True, verbose_name='Битовый массив студентов'),
+        ),
+        migrations.AddField(
+            model_name='surveydailystat',
+            name='unique_respondents',
+            field=models.PositiveIntegerField(default=0, help_text='Количество разных студентов NII EDU, открывших опрос (для SURVEY_COUNTER_BACKEND=memory)', verbose_name='Уникальные студенты'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0006_survey_daily_stat_respondents'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalsurvey',
+            name='closes_at',
+            field=models.DateTimeField(blank=True, help_text='Пусто — опрос доступен без ограничения по времени', null=True, verbose_name='Закрывается'),
+        ),
+        migrations.AddField(
+            model_name='historicalsurvey',
+            name='opens_at',
+            field=models.DateTimeField(blank=True, help_text='Пусто — опрос доступен сразу', null=True, verbose_name='Открывается'),
+        ),
+        migrations.AddField(
+            model_name='survey',
+            name='closes_at',
+            field=models.DateTimeField(blank=True, help_text='Пусто — опрос доступен без ограничения по времени', null=True, verbose_name='Закрывается'),
+        ),
+        migrations.AddField(
+            model_name='survey',
+            name='opens_at',
+            field=models.DateTimeField(blank=True, help_text='Пусто — опрос доступен сразу', null=True, verbose_name='Открывается'),
+        ),
+        migrations.AddIndex(
+            model_name='survey',
+            index=models.Index(fields=['is_active', 'opens_at'], name='survey_active_opens_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='survey',
+            index=models.Index(fields=['is_active', 'closes_at'], name='survey_active_closes_idx'),
+        ),
+    ]
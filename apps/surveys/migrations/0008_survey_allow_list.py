@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0007_survey_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalsurvey',
+            name='allow_list_size',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='0 — опрос доступен любому студенту NII EDU', verbose_name='Студентов в списке допуска'),
+        ),
+        migrations.AddField(
+            model_name='historicalsurvey',
+            name='allow_list_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Версия списка допуска'),
+        ),
+        migrations.AddField(
+            model_name='survey',
+            name='allow_list_size',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='0 — опрос доступен любому студенту NII EDU', verbose_name='Студентов в списке допуска'),
+        ),
+        migrations.AddField(
+            model_name='survey',
+            name='allow_list_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Версия списка допуска'),
+        ),
+        migrations.CreateModel(
+            name='SurveyAllowedStudent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('student_id', models.BigIntegerField(help_text='Логин NII EDU', verbose_name='ID студента')),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allowed_students', to='surveys.survey', verbose_name='Опрос')),
+            ],
+            options={
+                'verbose_name': 'Студент из списка допуска',
+                'verbose_name_plural': 'Списки допуска',
+                'db_table': 'surveys_survey_allowed_student',
+                'unique_together': {('survey', 'student_id')},
+            },
+        ),
+    ]
@@ -1,11 +1,43 @@
 from django.db import models
+from django.db.models import Min, Q
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.urls import reverse
 from django.core.validators import URLValidator
+from django.utils import timezone
 from django.utils.text import slugify
 from simple_history.models import HistoricalRecords
 
 
+class SurveyQuerySet(models.QuerySet):
+    """Выборки опросов с учетом окна публикации"""
+    
+    def published(self, now=None):
+        """Активные опросы, открытые в момент now"""
+        now = now or timezone.now()
+        return self.filter(
+            Q(opens_at__isnull=True) | Q(opens_at__lte=now),
+            Q(closes_at__isnull=True) | Q(closes_at__gt=now),
+            is_active=True,
+        )
+    
+    def next_transition(self, now=None):
+        """
+        Ближайшее открытие или закрытие активного опроса после now
+        
+        Returns:
+            datetime или None, если переходов по расписанию нет
+        """
+        now = now or timezone.now()
+        active = self.filter(is_active=True)
+        moments = [
+            active.filter(opens_at__gt=now).aggregate(moment=Min('opens_at'))['moment'],
+            active.filter(closes_at__gt=now).aggregate(moment=Min('closes_at'))['moment'],
+        ]
+        moments = [moment for moment in moments if moment is not None]
+        return min(moments) if moments else None
+
+
 class Survey(models.Model):
     """
     Модель опроса с интеграцией Google Forms
@@ -51,6 +83,33 @@ class Survey(models.Model):
         help_text='Требуется ли авторизация через NII EDU для доступа к опросу'
     )
     
+    opens_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Открывается',
+        help_text='Пусто — опрос доступен сразу'
+    )
+    
+    closes_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Закрывается',
+        help_text='Пусто — опрос доступен без ограничения по времени'
+    )
+    
+    allow_list_size = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Студентов в списке допуска',
+        help_text='0 — опрос доступен любому студенту NII EDU'
+    )
+    
+    allow_list_version = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия списка допуска'
+    )
+    
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата создания'
@@ -82,11 +141,18 @@ class Survey(models.Model):
     # Отслеживание истории изменений
     history = HistoricalRecords()
     
+    objects = SurveyQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Опрос'
         verbose_name_plural = 'Опросы'
         ordering = ['-created_at']
         db_table = 'surveys_survey'
+        indexes = [
+            # published() и next_transition() по окну публикации
+            models.Index(fields=['is_active', 'opens_at'], name='survey_active_opens_idx'),
+            models.Index(fields=['is_active', 'closes_at'], name='survey_active_closes_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -103,6 +169,25 @@ class Survey(models.Model):
             return self.google_form_url.replace('viewform', 'viewform?embedded=true')
         return self.google_form_url
     
+    def is_open(self, now=None):
+        """Опрос активен и момент now попадает в окно публикации"""
+        now = now or timezone.now()
+        return (
+            self.is_active
+            and (self.opens_at is None or self.opens_at <= now)
+            and (self.closes_at is None or self.closes_at > now)
+        )
+    
+    def next_transition(self, now=None):
+        """Ближайшее открытие или закрытие этого опроса после now"""
+        now = now or timezone.now()
+        moments = [moment for moment in (self.opens_at, self.closes_at) if moment and moment > now]
+        return min(moments) if moments else None
+    
+    def clean(self):
+        if self.opens_at and self.closes_at and self.closes_at <= self.opens_at:
+            raise ValidationError({'closes_at': 'Время закрытия должно быть позже времени открытия'})
+    
     @property
     def short_description(self):
         """Короткое описание для админки"""
@@ -126,4 +211,84 @@ class Survey(models.Model):
             self.slug = slug
         
         # Здесь можно добавить логику валидации Google Forms URL
-        super().save(*args, **kwargs) 
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class SurveyDailyStat(models.Model):
+    """
+    Дневная статистика просмотров опроса.
+    Заполняется пакетно из счетчиков (см. counters.flush_counters)
+    """
+    survey = models.ForeignKey(
+        Survey,
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+        verbose_name='Опрос'
+    )
+    
+    date = models.DateField(
+        verbose_name='Дата'
+    )
+    
+    views = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Просмотры',
+        help_text='Открытия страницы опроса'
+    )
+    
+    opens = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Открытия формы',
+        help_text='Загрузки встроенной Google Form'
+    )
+    
+    unique_respondents = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Уникальные студенты',
+        help_text='Количество разных студентов NII EDU, открывших опрос (для SURVEY_COUNTER_BACKEND=memory)'
+    )
+    
+    respondents = models.BinaryField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Битовый массив студентов',
+        help_text='Сжатый StudentBitmap (только для SURVEY_COUNTER_BACKEND=memory)'
+    )
+    
+    class Meta:
+        verbose_name = 'Статистика опроса за день'
+        verbose_name_plural = 'Статистика опросов по дням'
+        ordering = ['-date']
+        db_table = 'surveys_survey_daily_stat'
+        unique_together = ['survey', 'date']
+    
+    def __str__(self):
+        return f'{self.survey} — {self.date}'
+
+
+class SurveyAllowedStudent(models.Model):
+    """
+    Студент из списка допуска опроса.
+    Загружается файлом в админке (см. allow_list.import_allow_list)
+    """
+    survey = models.ForeignKey(
+        Survey,
+        on_delete=models.CASCADE,
+        related_name='allowed_students',
+        verbose_name='Опрос'
+    )
+    
+    student_id = models.BigIntegerField(
+        verbose_name='ID студента',
+        help_text='Логин NII EDU'
+    )
+    
+    class Meta:
+        verbose_name = 'Студент из списка допуска'
+        verbose_name_plural = 'Списки допуска'
+        db_table = 'surveys_survey_allowed_student'
+        unique_together = ['survey', 'student_id']
+    
+    def __str__(self):
+        return f'{self.survey} — {self.student_id}'
@@ -0,0 +1,138 @@
+"""
+Кэш готовых HTML-страниц списка и опросов
+
+Кэшируются только страницы, не зависящие от пользователя: список опросов и
+страницы опросов без входа через NII EDU (в них нет формы с CSRF-токеном и
+сообщений). Ключ включает язык. Страница опроса сбрасывается вместе с его
+slug, страницы списка — сменой версии списка при любом изменении опросов.
+
+Страница хранится не дольше ближайшего перехода по расписанию (открытия или
+закрытия опроса), поэтому изменения по расписанию не требуют сброса кэша.
+Когда страница истекает, ее рендерит один запрос (single_flight), остальные
+ждут готовую страницу, а не рендерят ее одновременно.
+"""
+import math
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.translation import get_language
+
+PAGE_CACHE_TIMEOUT = 60 * 30  # 30 минут
+PAGE_LOCK_TIMEOUT = 10
+PAGE_LOCK_WAIT = 2.0  # сколько ждать страницу, которую рендерит другой запрос
+PAGE_LOCK_POLL = 0.05
+LIST_VERSION_KEY = 'survey_list_version'
+
+
+def list_version():
+    """Текущая версия списка опросов"""
+    version = cache.get(LIST_VERSION_KEY)
+    if version is None:
+        # Версию мог создать другой процесс: берем ту, что оказалась в кэше
+        cache.add(LIST_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(LIST_VERSION_KEY)
+    return version
+
+
+def bump_list_version():
+    """Делает устаревшими все закэшированные страницы списка"""
+    cache.set(LIST_VERSION_KEY, time.time_ns(), None)
+
+
+def list_page_key(page, language=None):
+    return f"survey_page_list_{list_version()}_{language or get_language()}_{page}"
+
+
+def detail_page_key(slug, language=None):
+    return f"survey_page_detail_{language or get_language()}_{slug}"
+
+
+def invalidate_detail_pages(slugs):
+    """Удаляет страницы опросов на всех языках"""
+    cache.delete_many([
+        detail_page_key(slug, code)
+        for slug in slugs if slug
+        for code, _ in settings.LANGUAGES
+    ])
+
+
+def get_page(key):
+    """
+    Страница из кэша
+
+    Returns:
+        HttpResponse и дополнительные данные страницы (с expires_at) или
+        (None, None)
+    """
+    page = cache.get(key)
+    if page is None:
+        return None, None
+    expires_at = page.get('expires_at')
+    if expires_at is not None and timezone.now().timestamp() >= expires_at:
+        return None, None
+    response = HttpResponse(page['content'], content_type=page['content_type'])
+    extra = page.get('extra', {})
+    extra['expires_at'] = (
+        datetime.fromtimestamp(expires_at, tz=dt_timezone.utc) if expires_at is not None else None
+    )
+    return response, extra
+
+
+def store_page(key, response, expires_at=None, **extra):
+    """
+    Сохраняет отрендеренный ответ, если он не зависит от пользователя
+
+    Args:
+        expires_at: Ближайший переход по расписанию, после которого
+            страница устаревает
+    """
+    if response.status_code != 200 or response.cookies:
+        return False
+    timeout = PAGE_CACHE_TIMEOUT
+    if expires_at is not None:
+        remaining = (expires_at - timezone.now()).total_seconds()
+        if remaining <= 0:
+            return False
+        timeout = min(timeout, math.ceil(remaining))
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    cache.set(key, {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'expires_at': expires_at.timestamp() if expires_at is not None else None,
+        'extra': extra,
+    }, timeout)
+    return True
+
+
+@contextmanager
+def single_flight(key):
+    """
+    Один рендер страницы на промах кэша
+
+    Первый запрос берет блокировку и получает (None, None): он рендерит и
+    сохраняет страницу. Остальные до PAGE_LOCK_WAIT секунд ждут ее в кэше и
+    получают (response, extra); если страница так и не появилась, запрос
+    рендерит ее сам.
+    """
+    lock_key = f'{key}_lock'
+    acquired = cache.add(lock_key, 1, PAGE_LOCK_TIMEOUT)
+    # Нет ни блокировки, ни ее владельца — узел кэша недоступен, ждать некого
+    if not acquired and cache.has_key(lock_key):
+        deadline = time.monotonic() + PAGE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(PAGE_LOCK_POLL)
+            response, extra = get_page(key)
+            if response is not None:
+                yield response, extra
+                return
+    try:
+        yield None, None
+    finally:
+        if acquired:
+            cache.delete(lock_key)
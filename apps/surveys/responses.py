@@ -0,0 +1,359 @@
+"""
+Хранилище ответов Google Forms в колоночном формате
+
+Экспорт ответов (CSV) читается потоково кусками по CHUNK_SIZE строк и
+дописывается в каталог опроса:
+
+    <SURVEY_RESPONSES_ROOT>/<survey_id>/
+        manifest.json   — вопросы, варианты ответов, количество строк
+        <N>.codes       — коды ответов на вопрос N (int32, -1 = нет ответа)
+        timestamps.txt  — отметки времени загруженных строк, по одной на строку
+
+Экспорт Google Forms накопительный: каждый новый файл содержит и все прежние
+ответы. Поэтому дописываются только новые строки: отметка времени строки
+сравнивается с уже загруженными (с учетом повторов одной секунды).
+Загруженные отметки читаются из timestamps.txt потоком в компактный индекс:
+отсортированные 64-битные хэши и число строк с каждым (12 байт на отметку),
+а не строки в памяти. В файле без колонки отметки времени пропускаются
+первые rows строк — столько, сколько уже загружено.
+
+Каждый вопрос хранится как отдельный массив кодов, поэтому распределения,
+таблицы сопряженности и доля заполнения считаются векторно через
+np.memmap без загрузки файла в память.
+
+Требуются numpy и pandas (pip install survey[analytics]).
+"""
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+CHUNK_SIZE = 50_000
+TIMESTAMPS_BLOCK = 1024 * 1024  # байт timestamps.txt за одно чтение
+MAX_CATEGORIES = 500  # больше вариантов — вопрос со свободным ответом
+TEXT_ANSWER = 'Свободный ответ'
+CODE_DTYPE = '<i4'
+# Служебная колонка экспорта Google Forms, в статистику не входит
+TIMESTAMP_COLUMNS = {'Timestamp', 'Отметка времени'}
+INGEST_LOCK_TIMEOUT = 60 * 60  # одна загрузка на опрос одновременно
+
+
+class IngestBusy(RuntimeError):
+    """Загрузка ответов этого опроса уже выполняется"""
+
+
+def _hash_timestamps(timestamps):
+    """64-битные хэши отметок времени (numpy uint64)"""
+    import numpy as np
+    import pandas as pd
+
+    return pd.util.hash_array(np.asarray(timestamps, dtype=object))
+
+
+class ResponseStore:
+    """Колоночное хранилище ответов одного опроса"""
+
+    def __init__(self, survey_id):
+        self.survey_id = survey_id
+        self.path = Path(settings.SURVEY_RESPONSES_ROOT) / str(survey_id)
+        self.manifest = self._read_manifest()
+
+    # ---------- манифест ----------
+
+    def _read_manifest(self):
+        try:
+            with open(self.path / 'manifest.json', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'rows': 0, 'version': 0, 'questions': [], 'timestamps_size': 0}
+
+    def _write_manifest(self):
+        """Атомарная запись манифеста: читатели видят либо старую, либо новую версию"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path / 'manifest.json.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path / 'manifest.json')
+
+    @property
+    def rows(self):
+        return self.manifest['rows']
+
+    @property
+    def questions(self):
+        return self.manifest['questions']
+
+    def _codes_path(self, index):
+        return self.path / f'{index}.codes'
+
+    @property
+    def _timestamps_path(self):
+        return self.path / 'timestamps.txt'
+
+    def _stored_index(self, size):
+        """
+        Индекс загруженных отметок времени (первые size байт timestamps.txt)
+
+        Returns:
+            (отсортированные уникальные хэши, сколько строк с каждым)
+        """
+        import numpy as np
+
+        hashes = []
+        try:
+            with open(self._timestamps_path, 'rb') as f:
+                tail = b''
+                while size > 0:
+                    block = f.read(min(TIMESTAMPS_BLOCK, size))
+                    if not block:
+                        break
+                    size -= len(block)
+                    lines = (tail + block).split(b'\n')
+                    tail = lines.pop()
+                    hashes.append(_hash_timestamps([line.decode() for line in lines]))
+        except FileNotFoundError:
+            pass
+        if not hashes:
+            return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int32)
+        unique, counts = np.unique(np.concatenate(hashes), return_counts=True)
+        return unique, counts.astype(np.int32)
+
+    # ---------- запись ----------
+
+    def ingest_csv(self, source, chunk_size=CHUNK_SIZE):
+        """
+        Дописывает новые ответы из CSV-экспорта Google Forms
+
+        Строки, загруженные из прежних экспортов, пропускаются.
+
+        Args:
+            source: Путь к файлу или файловый объект
+            chunk_size: Размер куска при потоковом чтении
+
+        Returns:
+            Количество добавленных строк
+        """
+        lock_key = f"survey_responses_lock_{self.survey_id}"
+        if not cache.add(lock_key, 1, INGEST_LOCK_TIMEOUT):
+            raise IngestBusy('Загрузка ответов этого опроса уже выполняется')
+        try:
+            return self._ingest_csv(source, chunk_size)
+        finally:
+            cache.delete(lock_key)
+
+    def _ingest_csv(self, source, chunk_size):
+        import numpy as np
+        import pandas as pd
+
+        self.manifest = self._read_manifest()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._truncate_to_manifest()
+
+        lookups = [
+            {value: code for code, value in enumerate(question['categories'])}
+            for question in self.questions
+        ]
+        stored_size = self.manifest.get('timestamps_size', 0)
+        stored = self._stored_index(stored_size) if stored_size else None
+        skip = self.rows  # для файла без отметок времени
+        added = 0
+        reader = pd.read_csv(source, dtype=str, chunksize=chunk_size, skipinitialspace=True)
+        for chunk in reader:
+            timestamp_column = next((title for title in chunk.columns if title in TIMESTAMP_COLUMNS), None)
+            if timestamp_column is not None:
+                timestamps = chunk[timestamp_column].fillna('').str.strip().tolist()
+                new = self._new_rows(np, stored, timestamps) if stored is not None else [True] * len(chunk)
+                chunk = chunk[new]
+                timestamps = [timestamp for timestamp, is_new in zip(timestamps, new) if is_new]
+            else:
+                skipped = min(skip, len(chunk))
+                skip -= skipped
+                chunk = chunk.iloc[skipped:]
+                timestamps = None
+            if chunk.empty:
+                continue
+
+            columns = {title: index for index, title in enumerate(chunk.columns)}
+            known = {question['title'] for question in self.questions}
+            for title in chunk.columns:
+                if title not in known and title not in TIMESTAMP_COLUMNS:
+                    self._add_question(title)
+                    lookups.append({})
+
+            for index, question in enumerate(self.questions):
+                if question['title'] in columns:
+                    values = chunk.iloc[:, columns[question['title']]]
+                    codes = self._encode(np, pd, values, question, lookups[index])
+                else:
+                    codes = np.full(len(chunk), -1, dtype=CODE_DTYPE)
+                with open(self._codes_path(index), 'ab') as f:
+                    f.write(codes.astype(CODE_DTYPE).tobytes())
+
+            if timestamps is not None:
+                with open(self._timestamps_path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(f'{timestamp}\n' for timestamp in timestamps))
+                    self.manifest['timestamps_size'] = f.tell()
+
+            added += len(chunk)
+            self.manifest['rows'] += len(chunk)
+
+        if added:
+            self.manifest['version'] += 1
+            self._write_manifest()
+        return added
+
+    @staticmethod
+    def _new_rows(np, stored, timestamps):
+        """
+        Новые строки куска: строка новая, если строк с той же отметкой
+        загружено меньше (совпавшие вычитаются из индекса)
+        """
+        hashes, remaining = stored
+        if not len(hashes):
+            return [True] * len(timestamps)
+        keys = _hash_timestamps(timestamps)
+        positions = np.minimum(np.searchsorted(hashes, keys), len(hashes) - 1)
+        found = hashes[positions] == keys
+        new = []
+        for position, is_found in zip(positions.tolist(), found.tolist()):
+            if is_found and remaining[position] > 0:
+                remaining[position] -= 1
+                new.append(False)
+            else:
+                new.append(True)
+        return new
+
+    def _add_question(self, title):
+        """Новый вопрос: для уже загруженных строк ответа нет"""
+        index = len(self.questions)
+        self.questions.append({'title': title, 'categories': [], 'is_text': False})
+        with open(self._codes_path(index), 'wb') as f:
+            f.write(b'\xff' * 4 * self.rows)  # -1 в int32
+
+    @staticmethod
+    def _encode(np, pd, values, question, lookup):
+        """Векторное кодирование ответов куска в глобальные коды вопроса"""
+        local_codes, uniques = pd.factorize(values.str.strip())
+        if question['is_text']:
+            return np.where(local_codes >= 0, 0, -1)
+
+        remap = np.empty(len(uniques), dtype=CODE_DTYPE)
+        for local, value in enumerate(uniques):
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(question['categories'])
+                question['categories'].append(value)
+            remap[local] = code
+
+        if len(question['categories']) > MAX_CATEGORIES:
+            # Слишком много вариантов: храним только факт ответа
+            question['is_text'] = True
+            question['categories'] = [TEXT_ANSWER]
+            lookup.clear()
+            return np.where(local_codes >= 0, 0, -1)
+
+        return np.where(local_codes >= 0, remap[np.maximum(local_codes, 0)], -1)
+
+    def _truncate_to_manifest(self):
+        """Отбрасывает хвосты файлов после прерванной загрузки"""
+        sizes = {self._codes_path(index): self.rows * 4 for index in range(len(self.questions))}
+        sizes[self._timestamps_path] = self.manifest.get('timestamps_size', 0)
+        for path, size in sizes.items():
+            if path.exists() and path.stat().st_size > size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+
+    # ---------- чтение ----------
+
+    def codes(self, index, start=0, stop=None):
+        """Коды ответов на вопрос (np.memmap, без копирования)"""
+        import numpy as np
+
+        stop = self.rows if stop is None else stop
+        if stop <= start:
+            return np.empty(0, dtype=CODE_DTYPE)
+        data = np.memmap(self._codes_path(index), dtype=CODE_DTYPE, mode='r', shape=(self.rows,))
+        return data[start:stop]
+
+    def question_codes(self, index, start=0, stop=None):
+        """Коды вопроса; для свободных ответов только факт ответа (0 / -1)"""
+        import numpy as np
+
+        codes = self.codes(index, start, stop)
+        if self.questions[index]['is_text']:
+            return np.where(codes >= 0, 0, -1)
+        return codes
+
+    def distribution(self, index):
+        """
+        Распределение ответов на вопрос
+
+        Returns:
+            Dict: counts — количество по вариантам, missing — без ответа
+        """
+        import numpy as np
+
+        codes = self.question_codes(index)
+        question = self.questions[index]
+        answered = codes[codes >= 0]
+        counts = np.bincount(answered, minlength=len(question['categories']))
+        return {
+            'title': question['title'],
+            'is_text': question['is_text'],
+            'counts': dict(zip(question['categories'], counts.tolist())),
+            'answered': int(answered.size),
+            'missing': int(codes.size - answered.size),
+        }
+
+    def crosstab(self, row_index, column_index):
+        """
+        Таблица сопряженности двух вопросов (строки с ответами на оба)
+
+        Returns:
+            Dict: rows/columns — варианты, table — матрица количеств
+        """
+        import numpy as np
+
+        row_codes = self.question_codes(row_index)
+        column_codes = self.question_codes(column_index)
+        rows = self.questions[row_index]['categories']
+        columns = self.questions[column_index]['categories']
+
+        mask = (row_codes >= 0) & (column_codes >= 0)
+        flat = row_codes[mask].astype(np.int64) * len(columns) + column_codes[mask]
+        table = np.bincount(flat, minlength=len(rows) * len(columns))
+        return {
+            'rows': rows,
+            'columns': columns,
+            'table': table.reshape(len(rows), len(columns)).tolist(),
+        }
+
+    def completion(self):
+        """
+        Доля заполнения анкет
+
+        Returns:
+            Dict: complete_rate — доля строк с ответами на все вопросы,
+            mean_answered — средняя доля отвеченных вопросов,
+            question_rates — доля ответивших по каждому вопросу
+        """
+        import numpy as np
+
+        if not self.rows or not self.questions:
+            return {'complete_rate': 0.0, 'mean_answered': 0.0, 'question_rates': []}
+
+        answered = np.zeros(self.rows, dtype=np.int32)
+        question_rates = []
+        for index in range(len(self.questions)):
+            mask = self.codes(index) >= 0
+            answered += mask
+            question_rates.append(float(mask.mean()))
+
+        total = len(self.questions)
+        return {
+            'complete_rate': float((answered == total).mean()),
+            'mean_answered': float(answered.mean() / total),
+            'question_rates': question_rates,
+        }
@@ -1,9 +1,20 @@
-import requests
 import json
+import random
+import time
 from django.conf import settings
-from django.core.cache import cache
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
 from typing import Optional, Dict, Any
 
+from apps.common.tasks import enqueue
+
+from .tasks import record_auth_telemetry
+
+# Отдельный кэш (и пулы соединений) для результатов входа
+auth_cache = ConnectionProxy(caches, 'auth')
+_password_hasher = PBKDF2PasswordHasher()
+
 
 class NIIEDUAuthService:
     """Сервис для аутентификации через NII EDU API"""
@@ -24,6 +35,27 @@ class NIIEDUAuthService:
         Returns:
             Dict с результатом аутентификации
         """
+        started = time.perf_counter()
+        result = None
+        if settings.NIIEDU_LOCAL_VERIFY:
+            result = cls._verify_locally(login, password)
+        if result is None:
+            result = cls._login(login, password)
+        
+        # Телеметрия обрабатывается в фоне
+        enqueue(
+            record_auth_telemetry,
+            result.pop('outcome'),
+            (time.perf_counter() - started) * 1000,
+        )
+        return result
+    
+    @classmethod
+    def _login(cls, login: str, password: str) -> Dict[str, Any]:
+        """Запрос к NII EDU API; outcome используется для телеметрии"""
+        # requests импортируется при первом входе, а не при запуске воркера
+        import requests
+        
         try:
             headers = {
                 'accept': 'application/json',
@@ -46,36 +78,110 @@ class NIIEDUAuthService:
                 result = response.json()
                 # Кэшируем успешную аутентификацию
                 cache_key = f"niiedu_auth_{login}"
-                cache.set(cache_key, result, cls.CACHE_TIMEOUT)
+                timeout = cls.auth_timeout()
+                auth_cache.set(cache_key, result, timeout)
+                if settings.NIIEDU_LOCAL_VERIFY:
+                    cls._store_verifier(login, password, result, timeout)
                 
                 return {
                     'success': True,
                     'data': result,
-                    'message': 'Аутентификация успешна'
+                    'message': 'Аутентификация успешна',
+                    'outcome': 'success'
                 }
             else:
                 return {
                     'success': False,
                     'error': f'Ошибка аутентификации: {response.status_code}',
-                    'details': response.text
+                    'details': response.text,
+                    'outcome': 'failure'
                 }
                 
         except requests.exceptions.RequestException as e:
             return {
                 'success': False,
-                'error': f'Ошибка сети: {str(e)}'
+                'error': f'Ошибка сети: {str(e)}',
+                'outcome': 'network_error'
             }
         except json.JSONDecodeError as e:
             return {
                 'success': False,
-                'error': f'Ошибка парсинга ответа: {str(e)}'
+                'error': f'Ошибка парсинга ответа: {str(e)}',
+                'outcome': 'error'
             }
         except Exception as e:
             return {
                 'success': False,
-                'error': f'Неожиданная ошибка: {str(e)}'
+                'error': f'Неожиданная ошибка: {str(e)}',
+                'outcome': 'error'
             }
     
+    @classmethod
+    def _store_verifier(cls, login: str, password: str, data: Dict[str, Any], timeout: int) -> None:
+        """Сохраняет медленный соленый хэш пароля рядом с результатом входа"""
+        encoded = _password_hasher.encode(
+            password, _password_hasher.salt(), settings.NIIEDU_LOCAL_VERIFY_ITERATIONS
+        )
+        auth_cache.set(f"niiedu_auth_verifier_{login}", {
+            'hash': encoded,
+            'data': data,
+            'expires_at': time.time() + timeout,
+        }, timeout)
+    
+    @classmethod
+    def _verify_locally(cls, login: str, password: str) -> Optional[Dict[str, Any]]:
+        """
+        Повторный вход без запроса к NII EDU API
+        
+        Пароль сверяется с хэшем, сохраненным при последнем успешном входе
+        через API. Окно не продлевается: результат входа хранится до того же
+        момента, что и после входа через API.
+        
+        Returns:
+            Результат аутентификации или None, если нужен запрос к API
+        """
+        verifier = auth_cache.get(f"niiedu_auth_verifier_{login}")
+        if verifier is None:
+            return None
+        remaining = verifier['expires_at'] - time.time()
+        if remaining < 1 or not _password_hasher.verify(password, verifier['hash']):
+            return None
+        
+        auth_cache.set(f"niiedu_auth_{login}", verifier['data'], int(remaining))
+        return {
+            'success': True,
+            'data': verifier['data'],
+            'message': 'Аутентификация успешна',
+            'outcome': 'local'
+        }
+    
+    @classmethod
+    def auth_timeout(cls) -> int:
+        """
+        Время жизни результата входа со случайным разбросом
+        
+        Студенты группы входят в одни и те же минуты; без разброса их записи
+        истекают одновременно, и все снова идут в NII EDU API.
+        """
+        jitter = settings.NIIEDU_AUTH_TTL_JITTER
+        return cls.CACHE_TIMEOUT + random.randint(-jitter, jitter)
+    
+    @classmethod
+    def renew_cached_auth(cls, login: str) -> bool:
+        """
+        Продлевает результат входа активного студента
+        
+        Не чаще раза в NIIEDU_AUTH_RENEW_INTERVAL секунд на логин: отметка
+        добавляется через cache.add, продлевает только тот, кто ее создал.
+        
+        Returns:
+            True если запись продлена
+        """
+        marker = f"niiedu_auth_renewed_{login}"
+        if not auth_cache.add(marker, 1, settings.NIIEDU_AUTH_RENEW_INTERVAL):
+            return False
+        return auth_cache.touch(f"niiedu_auth_{login}", cls.auth_timeout())
+    
     @classmethod
     def check_cached_auth(cls, login: str) -> Optional[Dict[str, Any]]:
         """
@@ -88,7 +194,7 @@ class NIIEDUAuthService:
             Кэшированные данные аутентификации или None
         """
         cache_key = f"niiedu_auth_{login}"
-        return cache.get(cache_key)
+        return auth_cache.get(cache_key)
     
     @classmethod
     def logout(cls, login: str) -> bool:
@@ -102,5 +208,5 @@ class NIIEDUAuthService:
             True если кэш успешно очищен
         """
         cache_key = f"niiedu_auth_{login}"
-        cache.delete(cache_key)
+        auth_cache.delete(cache_key)
         return True 
\ No newline at end of file
@@ -0,0 +1,36 @@
+"""
+Сигналы модели Survey: сброс и прогрев кэша и снимка каталога после изменений
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.common.tasks import enqueue
+
+from .cache import invalidate_surveys
+from .edge import queue_purge
+from .models import Survey
+from .tasks import rebuild_survey_catalog, warm_survey_cache
+
+
+@receiver(pre_save, sender=Survey)
+def remember_previous_slug(sender, instance, **kwargs):
+    """Запоминает прежний slug, чтобы сбросить его кэш"""
+    if instance.pk:
+        instance._previous_slug = (
+            Survey.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Survey)
+def survey_saved(sender, instance, **kwargs):
+    invalidate_surveys([instance.slug, getattr(instance, '_previous_slug', None)])
+    enqueue(warm_survey_cache, [instance.pk])
+    enqueue(rebuild_survey_catalog)
+    queue_purge([instance.pk])
+
+
+@receiver(post_delete, sender=Survey)
+def survey_deleted(sender, instance, **kwargs):
+    invalidate_surveys([instance.slug])
+    enqueue(rebuild_survey_catalog)
+    queue_purge([instance.pk])
@@ -0,0 +1,222 @@
+"""
+Фоновые задачи Celery для опросов
+"""
+import logging
+import os
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .catalog import rebuild_catalog
+from .counters import flush_counters
+from .models import Survey
+
+logger = logging.getLogger(__name__)
+
+AUTH_TELEMETRY_TIMEOUT = 60 * 60 * 24 * 7  # неделя
+INGEST_MAX_RETRIES = 10
+INGEST_RETRY_COUNTDOWN = 60  # секунды
+
+
+@shared_task(ignore_result=True)
+def warm_survey_cache(survey_ids, lists=True):
+    """
+    Прогревает кэш опросов, их страниц и первых страниц списка после изменений
+
+    Args:
+        survey_ids: ID опросов
+        lists: Прогреть и первые страницы списка
+    """
+    from .warmup import warm_detail_pages, warm_list_pages
+
+    for survey in Survey.objects.filter(pk__in=survey_ids):
+        warm_detail_pages(survey)
+    if lists:
+        warm_list_pages(settings.SURVEY_WARM_LIST_PAGES)
+
+
+@shared_task(ignore_result=True)
+def rebuild_survey_catalog():
+    """Пересобирает снимок каталога активных опросов"""
+    count = rebuild_catalog()
+    if count is not None:
+        logger.info('Снимок каталога пересобран: %s опросов', count)
+
+
+@shared_task(
+    ignore_result=True,
+    autoretry_for=(OSError,),
+    retry_backoff=True,
+    max_retries=5,
+)
+def purge_edge_cache(keys):
+    """
+    Очищает кэш reverse proxy по surrogate-ключам
+
+    Ключи отправляются пачками по SURVEY_PURGE_BATCH_SIZE: POST на
+    SURVEY_PURGE_URL с ключами в заголовке SURVEY_SURROGATE_KEY_HEADER
+    (Varnish xkey, Fastly) и в теле {"surrogate_keys": [...]}.
+    """
+    import requests
+
+    headers = {}
+    if settings.SURVEY_PURGE_TOKEN:
+        headers['Authorization'] = f'Bearer {settings.SURVEY_PURGE_TOKEN}'
+
+    batch_size = settings.SURVEY_PURGE_BATCH_SIZE
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        response = requests.post(
+            settings.SURVEY_PURGE_URL,
+            json={'surrogate_keys': batch},
+            headers={**headers, settings.SURVEY_SURROGATE_KEY_HEADER: ' '.join(batch)},
+            timeout=10,
+        )
+        response.raise_for_status()
+    logger.info('Очищен кэш прокси для %s ключей', len(keys))
+
+
+@shared_task(ignore_result=True)
+def record_auth_telemetry(outcome, elapsed_ms):
+    """
+    Учитывает результат и длительность запроса к NII EDU API
+
+    Args:
+        outcome: success / failure / network_error / error, local — вход
+            проверен локально, без запроса к API
+        elapsed_ms: Длительность запроса в миллисекундах
+    """
+    prefix = f"niiedu_auth_telemetry_{timezone.localdate().isoformat()}"
+    latency = 'local_latency_ms' if outcome == 'local' else 'latency_ms'
+    for key, delta in [
+        (f"{prefix}_{outcome}", 1),
+        (f"{prefix}_{latency}", int(elapsed_ms)),
+    ]:
+        cache.add(key, 0, AUTH_TELEMETRY_TIMEOUT)
+        cache.incr(key, delta)
+
+    logger.info('NII EDU auth: %s за %.0f мс', outcome, elapsed_ms)
+
+
+@shared_task(ignore_result=True)
+def check_survey_forms():
+    """Проверяет ссылки Google Forms активных опросов"""
+    from .form_checks import check_forms
+
+    results = check_forms()
+    broken = sum(1 for result in results.values() if result['status'] != 'ok')
+    logger.info('Проверено форм: %s, с проблемами: %s', len(results), broken)
+
+
+@shared_task(ignore_result=True)
+def flush_survey_counters():
+    """Переносит счетчики просмотров из Redis в SurveyDailyStat (Celery beat)"""
+    rows = flush_counters()
+    if rows:
+        logger.info('Записано %s строк статистики просмотров', rows)
+
+
+@shared_task(bind=True, ignore_result=True, max_retries=INGEST_MAX_RETRIES)
+def ingest_survey_responses(self, survey_id, path, delete_after=True):
+    """
+    Загружает CSV-экспорт ответов Google Forms в колоночное хранилище
+
+    Если опрос уже загружается, задача повторяется через
+    INGEST_RETRY_COUNTDOWN секунд. Файл удаляется после загрузки, ошибки
+    или последней попытки.
+
+    Args:
+        survey_id: ID опроса
+        path: Путь к CSV-файлу
+        delete_after: Удалить файл после загрузки
+    """
+    from .responses import IngestBusy, ResponseStore
+
+    retrying = False
+    try:
+        rows = ResponseStore(survey_id).ingest_csv(path)
+    except IngestBusy as error:
+        if self.request.retries >= self.max_retries:
+            logger.error('Ответы опроса %s не загружены: %s (%s)', survey_id, error, path)
+            return
+        retrying = True
+        raise self.retry(exc=error, countdown=INGEST_RETRY_COUNTDOWN)
+    finally:
+        if delete_after and not retrying:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    logger.info('Загружено %s ответов опроса %s', rows, survey_id)
+    aggregate_survey_responses(survey_id)
+
+
+@shared_task(ignore_result=True)
+def aggregate_survey_responses(survey_id=None):
+    """
+    Добавляет новые ответы к накопленной статистике (Celery beat)
+
+    Args:
+        survey_id: ID опроса; None — все опросы с загруженными ответами
+    """
+    from .aggregation import ResponseAggregator
+
+    if survey_id is None:
+        root = settings.SURVEY_RESPONSES_ROOT
+        survey_ids = [p.name for p in root.iterdir() if p.is_dir()] if root.exists() else []
+    else:
+        survey_ids = [survey_id]
+
+    for pk in survey_ids:
+        rows = ResponseAggregator(pk).update()
+        if rows:
+            logger.info('Агрегировано %s новых ответов опроса %s', rows, pk)
+
+
+@shared_task(ignore_result=True)
+def export_surveys_file(kind, fmt, filename, user_id, query=None, survey_ids=None):
+    """
+    Записывает большую выгрузку из админки в файл
+
+    Args:
+        kind: 'surveys' или 'history'
+        fmt: 'csv' или 'xlsx'
+        filename: Имя файла в SURVEY_EXPORT_ROOT
+        user_id: Пользователь, запустивший выгрузку
+        query: Строка запроса отфильтрованного списка в админке
+            (фильтры, поиск, сортировка)
+        survey_ids: ID опросов, отмеченных вручную (если query не задан)
+    """
+    from django.contrib import admin
+    from django.contrib.auth import get_user_model
+
+    from .export import prune_exports, with_totals, write_export
+
+    prune_exports()
+    if query is not None:
+        user = get_user_model().objects.get(pk=user_id)
+        # AdminSite.get_model_admin есть только с Django 5.0
+        queryset = admin.site._registry[Survey].changelist_queryset(user, query)
+    else:
+        queryset = with_totals(Survey.objects.filter(pk__in=survey_ids))
+    source = queryset if kind == 'surveys' else queryset.values('pk')
+    path = write_export(kind, fmt, source, filename)
+    logger.info('Выгрузка %s записана: %s байт', filename, path.stat().st_size)
+
+
+def get_auth_telemetry(day=None):
+    """
+    Счетчики запросов к NII EDU API за день
+
+    Returns:
+        Dict {outcome: количество, 'latency_ms': суммарная длительность
+        запросов к API, 'local': входов без запроса к API,
+        'local_latency_ms': их суммарная длительность}
+    """
+    day = day or timezone.localdate()
+    prefix = f"niiedu_auth_telemetry_{day.isoformat()}"
+    names = ['success', 'failure', 'network_error', 'error', 'latency_ms', 'local', 'local_latency_ms']
+    values = cache.get_many([f"{prefix}_{name}" for name in names])
+    return {name: values.get(f"{prefix}_{name}", 0) for name in names}
@@ -1,11 +1,83 @@
-from django.test import TestCase, Client
+import csv
+import io
+import json
+import random
+import threading
+import time
+import os
+import tempfile
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib.util import find_spec
+from datetime import timedelta
+from pathlib import Path
+from collections import Counter
+from unittest import mock, skipUnless
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.db import connection, connections
+from django.core.cache import cache, caches
+from django.core.management import call_command
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.http import Http404, StreamingHttpResponse
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+from django.utils import timezone
+
+from celery.exceptions import Retry
+
+from apps.common.tasks import enqueue
+from config.celery import app as celery_app
+
+from .models import Survey, SurveyDailyStat
+from .counters import count_respondents, flush_counters, get_counter_backend, record_respondent
+from .bulk import bulk_update_surveys
+from .cache import get_active_survey, survey_cache_key
+from .catalog import get_snapshot, write_snapshot
+from .form_checks import check_forms, get_form_status
+from .pages import detail_page_key, list_page_key
+from .warmup import warm_caches
+from .aggregation import ResponseAggregator
+from .allow_list import _local as allow_list_local, clear_allow_list, import_allow_list, is_student_allowed
+from .responses import ResponseStore
+from .services import NIIEDUAuthService, auth_cache
+from .tasks import get_auth_telemetry, ingest_survey_responses
+from .views import SurveyListView
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    },
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth',
+    },
+}
+
+# Снимок каталога тестов не должен пересекаться с рабочим файлом
+TEST_CATALOG_PATH = Path(tempfile.gettempdir()) / f'survey_catalog_test_{os.getpid()}.bin'
+
 
-from .models import Survey
+class EagerCeleryMixin:
+    """Выполнение задач Celery в процессе теста"""
+    
+    def setUp(self):
+        super().setUp()
+        celery_app.conf['CELERY_TASK_ALWAYS_EAGER'] = True
+        self.addCleanup(celery_app.conf.__setitem__, 'CELERY_TASK_ALWAYS_EAGER', False)
+        self.addCleanup(TEST_CATALOG_PATH.unlink, missing_ok=True)
+        cache.clear()
 
 
+@override_settings(CACHES=LOCMEM_CACHES, SURVEY_CATALOG_PATH=TEST_CATALOG_PATH)
 class SurveyModelTests(TestCase):
     """Тесты модели Survey"""
     
@@ -54,6 +126,7 @@ class SurveyModelTests(TestCase):
         self.assertTrue(len(short_desc) <= 53)  # 50 + '...'
 
 
+@override_settings(CACHES=LOCMEM_CACHES, SURVEY_CATALOG_PATH=TEST_CATALOG_PATH, SURVEY_COUNTER_BACKEND='memory')
 class SurveyViewTests(TestCase):
     """Тесты представлений"""
     
@@ -139,4 +212,1102 @@ class SurveyViewTests(TestCase):
         self.assertContains(response, 'Tizimga Kirish')
 
 
- 
\ No newline at end of file
+@override_settings(CACHES=LOCMEM_CACHES, SURVEY_CATALOG_PATH=TEST_CATALOG_PATH, SURVEY_COUNTER_BACKEND='memory')
+class NIIEDULoginViewTests(TestCase):
+    """Тесты входа через NII EDU"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.survey = Survey.objects.create(
+            title='Опрос с авторизацией',
+            slug='opros-s-avtorizaciej',
+            google_form_url='https://docs.google.com/forms/d/test3/viewform',
+            is_login_req=True
+        )
+        self.login_url = reverse('surveys:niiedu_login', kwargs={'slug': self.survey.slug})
+        self.credentials = {'login': '462221101004', 'password': 'secret123'}
+    
+    @mock.patch('apps.surveys.views.NIIEDUAuthService.login')
+    def test_repeat_login_skips_session_write(self, mock_login):
+        """Тест, что повторный вход с тем же логином не пишет сессию"""
+        mock_login.return_value = {'success': True, 'data': {}}
+        
+        response = self.client.post(self.login_url, self.credentials)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.session['niiedu_login'], '462221101004')
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.login_url, self.credentials)
+        
+        session_writes = [
+            q['sql'] for q in queries.captured_queries
+            if 'django_session' in q['sql'] and not q['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(session_writes, [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SURVEY_CATALOG_PATH=TEST_CATALOG_PATH)
+class BackgroundTaskTests(EagerCeleryMixin, TestCase):
+    """Тесты фоновых задач Celery (eager режим)"""
+    
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpass123'
+        )
+        self.client.force_login(self.admin)
+        self.surveys = [
+            Survey.objects.create(
+                title=f'Опрос {i}',
+                slug=f'opros-{i}',
+                google_form_url='https://docs.google.com/forms/d/test/viewform',
+                is_active=False
+            )
+            for i in range(3)
+        ]
+    
+    def test_bulk_action_writes_history(self):
+        """Тест записи истории после массовой активации"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin:surveys_survey_changelist'), {
+                'action': 'make_active',
+                '_selected_action': [s.pk for s in self.surveys],
+            })
+        
+        self.assertEqual(response.status_code, 302)
+        for survey in self.surveys:
+            latest = survey.history.latest()
+            self.assertEqual(latest.history_type, '~')
+            self.assertTrue(latest.is_active)
+            self.assertEqual(latest.history_user, self.admin)
+            self.assertEqual(latest.history_change_reason, 'Активация опроса')
+    
+    @override_settings(SURVEY_BULK_CHUNK_SIZE=2)
+    def test_bulk_update_in_chunks(self):
+        """Тест изменения частями: одна вставка истории и сброс кэша на часть"""
+        for survey in self.surveys:
+            cache.set(survey_cache_key(survey.slug), survey)
+        calls = []
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            updated = bulk_update_surveys(
+                Survey.objects.all(),
+                user=self.admin,
+                change_reason='Активация опроса',
+                progress=lambda done, total: calls.append((done, total)),
+                is_active=True,
+            )
+        
+        self.assertEqual(updated, 3)
+        self.assertEqual(calls, [(2, 3), (3, 3)])
+        self.assertFalse(Survey.objects.filter(is_active=False).exists())
+        self.assertEqual(Survey.objects.filter(updated_by=self.admin).count(), 3)
+        self.assertEqual(
+            Survey.history.filter(history_change_reason='Активация опроса', is_active=True).count(), 3
+        )
+        for survey in self.surveys:
+            self.assertTrue(cache.get(survey_cache_key(survey.slug)).is_active)
+        
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:surveys_survey_bulk_progress'))
+        self.assertEqual(response.json()['progress'], {
+            'change_reason': 'Активация опроса', 'done': 3, 'total': 3, 'finished': True,
+        })
+    
+    @override_settings(SURVEY_BULK_CHUNK_SIZE=2)
+    def test_bulk_update_invalidates_cache_after_commit(self):
+        """Тест: кэш части сбрасывается только после коммита ее транзакции"""
+        survey = self.surveys[0]
+        cache.set(survey_cache_key(survey.slug), survey)
+        
+        with self.captureOnCommitCallbacks() as callbacks:
+            bulk_update_surveys(Survey.objects.all(), user=self.admin, is_active=True)
+        self.assertIsNotNone(cache.get(survey_cache_key(survey.slug)))
+        
+        with mock.patch('apps.surveys.tasks.warm_survey_cache.delay') as warm, \
+                self.captureOnCommitCallbacks(execute=True):
+            for callback in callbacks:
+                callback()
+        self.assertIsNone(cache.get(survey_cache_key(survey.slug)))
+        # Прогрев частями и один прогрев страниц списка
+        self.assertCountEqual(
+            [call.args for call in warm.call_args_list],
+            [([s.pk for s in self.surveys[:2]],), ([self.surveys[2].pk],), ([],)],
+        )
+    
+    def test_survey_change_invalidates_and_warms_cache(self):
+        """Тест сброса и прогрева кэша после изменения опроса"""
+        survey = self.surveys[0]
+        survey.is_active = True
+        with self.captureOnCommitCallbacks(execute=True):
+            survey.save()
+        
+        self.assertEqual(cache.get(survey_cache_key(survey.slug)).pk, survey.pk)
+        
+        old_slug = survey.slug
+        survey.slug = 'novyj-slug'
+        with self.captureOnCommitCallbacks(execute=True):
+            survey.save()
+        
+        self.assertIsNone(cache.get(survey_cache_key(old_slug)))
+        self.assertEqual(get_active_survey('novyj-slug').pk, survey.pk)
+    
+    @mock.patch('requests.post')
+    def test_auth_telemetry(self, mock_post):
+        """Тест телеметрии запросов к NII EDU API"""
+        mock_post.return_value = mock.Mock(status_code=401, text='Unauthorized')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            result = NIIEDUAuthService.login('462221101004', 'wrongpass')
+        
+        self.assertFalse(result['success'])
+        self.assertNotIn('outcome', result)
+        self.assertEqual(get_auth_telemetry()['failure'], 1)
+    
+    @override_settings(NIIEDU_LOCAL_VERIFY=True, NIIEDU_LOCAL_VERIFY_ITERATIONS=1000)
+    @mock.patch('requests.post')
+    def test_repeat_login_verified_locally(self, mock_post):
+        """Тест повторного входа без запроса к API в пределах времени кэша"""
+        mock_post.return_value = mock.Mock(status_code=200, json=lambda: {'name': 'Student'})
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(NIIEDUAuthService.login('462221101004', 'secret')['success'])
+            NIIEDUAuthService.logout('462221101004')
+            result = NIIEDUAuthService.login('462221101004', 'secret')
+        
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(result['data'], {'name': 'Student'})
+        self.assertEqual(NIIEDUAuthService.check_cached_auth('462221101004'), {'name': 'Student'})
+        self.assertNotIn('secret', str(auth_cache.get('niiedu_auth_verifier_462221101004')))
+        telemetry = get_auth_telemetry()
+        self.assertEqual((telemetry['success'], telemetry['local']), (1, 1))
+        
+        # Другой пароль проверяет только API
+        mock_post.return_value = mock.Mock(status_code=401, text='Unauthorized')
+        self.assertFalse(NIIEDUAuthService.login('462221101004', 'other')['success'])
+        self.assertEqual(mock_post.call_count, 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SURVEY_CATALOG_PATH=TEST_CATALOG_PATH)
+class CatalogSnapshotTests(EagerCeleryMixin, TestCase):
+    """Тесты снимка каталога активных опросов"""
+    
+    def setUp(self):
+        super().setUp()
+        self.survey = Survey.objects.create(
+            title='Опрос в снимке',
+            slug='opros-v-snimke',
+            google_form_url='https://docs.google.com/forms/d/test/viewform',
+        )
+        Survey.objects.create(
+            title='Неактивный',
+            slug='neaktivnyj',
+            google_form_url='https://docs.google.com/forms/d/test/viewform',
+            is_active=False,
+        )
+        write_snapshot(Survey.objects.filter(is_active=True))
+    
+    def test_lookup_without_database(self):
+        """Тест поиска по slug без запросов к БД"""
+        with self.assertNumQueries(0):
+            survey = get_active_survey('opros-v-snimke')
+            with self.assertRaises(Http404):
+                get_active_survey('neaktivnyj')
+        
+        self.assertEqual(survey.pk, self.survey.pk)
+        self.assertEqual(survey.title, 'Опрос в снимке')
+        self.assertEqual(survey.created_at, self.survey.created_at)
+        self.assertEqual(len(get_snapshot()), 1)
+    
+    def test_change_falls_back_to_orm_and_rebuilds(self):
+        """Тест сброса снимков всех серверов после коммита и пересборки"""
+        other_host = Path(TEST_CATALOG_PATH).with_name('catalog-other-host.bin')
+        other_host.write_bytes(Path(TEST_CATALOG_PATH).read_bytes())
+        self.addCleanup(other_host.unlink)
+        
+        self.survey.title = 'Новое название'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.survey.save()
+        # До коммита изменение не видно, снимок еще действует
+        self.assertIsNotNone(get_snapshot())
+        
+        for callback in callbacks:
+            callback()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_active_survey('opros-v-snimke').title, 'Новое название')
+        
+        # Снимок другого сервера собран с прежней версией каталога
+        with override_settings(SURVEY_CATALOG_PATH=other_host):
+            self.assertIsNone(get_snapshot())
+            self.assertEqual(get_active_survey('opros-v-snimke').title, 'Новое название')
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    SURVEY_CATALOG_PATH=TEST_CATALOG_PATH,
+    SURVEY_COUNTER_BACKEND='memory',
+)
+class PageCacheTests(EagerCeleryMixin, TestCase):
+    """Тесты кэша страниц и прогрева"""
+    
+    def setUp(self):
+        super().setUp()
+        self.public = Survey.objects.create(
+            title='Открытый опрос',
+            slug='otkrytyj',
+            google_form_url='https://docs.google.com/forms/d/test/viewform',
+        )
+        self.private = Survey.objects.create(
+            title='Опрос со входом',
+            slug='so-vhodom',
+            google_form_url='https://docs.google.com/forms/d/test/viewform',
+            is_login_req=True,
+        )
+        get_counter_backend().drain()  # просмотры из других тестов
+    
+    def test_warm_caches_by_language(self):
+        """Тест прогрева страниц на всех языках без страниц со входом"""
+        closed_in = []
+        close_all = connections.close_all
+        
+        def record_close():
+            closed_in.append(threading.current_thread())
+            close_all()
+        
+        with mock.patch.object(connections, 'close_all', side_effect=record_close):
+            result = warm_caches(concurrency=2)
+        
+        # Потоки пула закрывают свои соединения независимо от CONN_MAX_AGE
+        self.assertEqual(len(closed_in), 2)
+        self.assertNotIn(threading.main_thread(), closed_in)
+        self.assertEqual(result['surveys'], 2)
+        self.assertEqual(result['skipped'], 0)
+        for code, _ in settings.LANGUAGES:
+            self.assertIsNotNone(cache.get(detail_page_key('otkrytyj', code)))
+            self.assertIsNone(cache.get(detail_page_key('so-vhodom', code)))
+            self.assertIsNotNone(cache.get(list_page_key('1', code)))
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('surveys:survey_list'))
+        self.assertContains(response, 'Открытый опрос')
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('surveys:survey_detail', args=['otkrytyj']))
+        self.assertContains(response, 'Открытый опрос')
+        flush_counters()
+        self.assertEqual(SurveyDailyStat.objects.get(survey=self.public).views, 1)
+    
+    def test_change_invalidates_pages(self):
+        """Тест сброса страниц после изменения опроса"""
+        self.client.get(reverse('surveys:survey_list'))
+        self.client.get(reverse('surveys:survey_detail', args=['otkrytyj']))
+        
+        self.public.title = 'Новое название'
+        self.public.save()
+        
+        self.assertContains(self.client.get(reverse('surveys:survey_list')), 'Новое название')
+        self.assertContains(
+            self.client.get(reverse('surveys:survey_detail', args=['otkrytyj'])), 'Новое название'
+        )
+    
+    def test_templates_compiled_once_without_fragment_cache(self):
+        """Тест кэша шаблонов: шаблон компилируется один раз, фрагменты не кэшируются"""
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertIsInstance(loader, CachedLoader)
+        
+        url = reverse('surveys:survey_detail', args=['so-vhodom'])
+        self.client.get(url)
+        compiled = loader.get_template('surveys/survey_detail.html')
+        
+        # Страница со входом не кэшируется целиком и не обращается к кэшу за фрагментами
+        with mock.patch.object(cache, 'get', wraps=cache.get) as cache_get:
+            response = self.client.get(url)
+        self.assertContains(response, 'Navoi Innovation University')
+        self.assertFalse([c for c in cache_get.call_args_list if 'template.cache' in str(c.args[0])])
+        self.assertIs(loader.get_template('surveys/survey_detail.html'), compiled)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    SURVEY_CATALOG_PATH=TEST_CATALOG_PATH,
+    SURVEY_COUNTER_BACKEND='memory',
+)
+class ScheduleTests(EagerCeleryMixin, TestCase):
+    """Тесты окна публикации опросов и кэша до ближайшего перехода"""
+    
+    def setUp(self):
+        super().setUp()
+        self.opens_at = (timezone.now() + timedelta(hours=1)).replace(second=0, microsecond=0)
+        self.survey = Survey.objects.create(
+            title='Экзаменационный опрос',
+            slug='ekzamen',
+            google_form_url='https://docs.google.com/forms/d/test/viewform',
+            opens_at=self.opens_at,
+            closes_at=self.opens_at + timedelta(hours=2),
+        )
+    
+    def test_window(self):
+        """Тест доступности опроса до, во время и после окна"""
+        detail_url = reverse('surveys:survey_detail', args=['ekzamen'])
+        self.assertEqual(self.client.get(detail_url).status_code, 404)
+        self.assertEqual(Survey.objects.next_transition(), self.opens_at)
+        
+        with mock.patch('django.utils.timezone.now', return_value=self.opens_at + timedelta(hours=1)):
+            response = self.client.get(detail_url)
+            self.assertContains(response, 'Экзаменационный опрос')
+            self.assertIn('s-maxage=300', response['Cache-Control'])
+            self.assertEqual(Survey.objects.published().get(), self.survey)
+        
+        with mock.patch('django.utils.timezone.now', return_value=self.survey.closes_at - timedelta(seconds=30)):
+            response = self.client.get(detail_url)  # из кэша страниц
+            self.assertIn('s-maxage=30', response['Cache-Control'])
+        
+        with mock.patch('django.utils.timezone.now', return_value=self.survey.closes_at):
+            self.assertEqual(self.client.get(detail_url).status_code, 404)
+            self.assertFalse(Survey.objects.published().exists())
+    
+    def test_thousands_open_at_same_minute(self):
+        """Тест открытия тысяч опросов в одну минуту: страница истекает ровно к
+        открытию и рендерится одним запросом"""
+        Survey.objects.bulk_create([
+            Survey(
+                title=f'Опрос {number}',
+                slug=f'exam-{number}',
+                google_form_url='https://docs.google.com/forms/d/test/viewform',
+                opens_at=self.opens_at,
+            )
+            for number in range(3000)
+        ])
+        list_url = reverse('surveys:survey_list')
+        
+        response = self.client.get(list_url)
+        self.assertNotContains(response, 'Опрос 0')
+        key = list_page_key('1')
+        self.assertEqual(cache.get(key)['expires_at'], self.opens_at.timestamp())
+        
+        renders = []
+        original = SurveyListView.get_context_data
+        
+        def counting_render(view, **kwargs):
+            renders.append(1)
+            return original(view, **kwargs)
+        
+        with mock.patch('django.utils.timezone.now', return_value=self.opens_at), \
+                mock.patch.object(SurveyListView, 'get_context_data', counting_render):
+            # Блокировка занята: запросы ждут страницу, которую отрендерит первый
+            cache.add(f'{key}_lock', 1)
+            results = []
+            clients = [
+                threading.Thread(target=lambda: results.append(Client().get(list_url)))
+                for _ in range(30)
+            ]
+            for client in clients:
+                client.start()
+            time.sleep(0.2)  # все запросы дошли до ожидания
+            cache.delete(f'{key}_lock')
+            response = self.client.get(list_url)
+            for client in clients:
+                client.join()
+        
+        self.assertEqual(len(renders), 1)
+        self.assertEqual(len(results), 30)
+        for result in [response, *results]:
+            self.assertEqual(result.status_code, 200)
+            self.assertContains(result, 'Опрос 2999')
+        self.assertEqual(cache.get(key)['expires_at'], (self.opens_at + timedelta(hours=2)).timestamp())
+
+
+class PurgeReceiver(BaseHTTPRequestHandler):
+    """Заглушка reverse proxy: запоминает запросы очистки"""
+    
+    received = []
+    
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.received.append((dict(self.headers), json.loads(body)))
+        self.send_response(200)
+        self.end_headers()
+    
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    SURVEY_CATALOG_PATH=TEST_CATALOG_PATH,
+    SURVEY_COUNTER_BACKEND='memory',
+)
+class EdgeCacheTests(EagerCeleryMixin, TestCase):
+    """Тесты заголовков кэша прокси и очистки по surrogate-ключам"""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), PurgeReceiver)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.enterClassContext(override_settings(
+            SURVEY_PURGE_URL=f'http://127.0.0.1:{cls.server.server_port}/purge',
+            SURVEY_PURGE_BATCH_SIZE=2,
+        ))
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+    
+    def setUp(self):
+        super().setUp()
+        self.surveys = [
+            Survey.objects.create(
+                title=f'Опрос {i}',
+                slug=f'edge-{i}',
+                google_form_url='https://docs.google.com/forms/d/test/viewform',
+                is_login_req=(i == 2),
+            )
+            for i in range(3)
+        ]
+        PurgeReceiver.received.clear()
+    
+    def test_cache_headers(self):
+        """Тест Cache-Control и Surrogate-Key на embed и странице опроса"""
+        survey = self.surveys[0]
+        for url in [
+            reverse('surveys:survey_embed', args=[survey.slug]),
+            reverse('surveys:survey_detail', args=[survey.slug]),
+            reverse('surveys:survey_detail', args=[survey.slug]),  # из кэша страниц
+        ]:
+            response = self.client.get(url)
+            self.assertIn('public', response['Cache-Control'])
+            self.assertIn('s-maxage=300', response['Cache-Control'])
+            self.assertEqual(response['Surrogate-Key'], f'survey-{survey.pk} surveys')
+        
+        response = self.client.get(reverse('surveys:survey_detail', args=['edge-2']))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('Surrogate-Key'))
+    
+    def test_bulk_action_purges_in_batches(self):
+        """Тест очистки после массового действия одной задачей пачками"""
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass123')
+        self.client.force_login(admin)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:surveys_survey_changelist'), {
+                'action': 'make_inactive',
+                '_selected_action': [survey.pk for survey in self.surveys],
+            })
+        
+        batches = [body['surrogate_keys'] for _, body in PurgeReceiver.received]
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertEqual(
+            sorted(key for batch in batches for key in batch),
+            sorted(f'survey-{survey.pk}' for survey in self.surveys),
+        )
+        headers, body = PurgeReceiver.received[0]
+        self.assertEqual(headers['Surrogate-Key'], ' '.join(body['surrogate_keys']))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SURVEY_CATALOG_PATH=TEST_CATALOG_PATH)
+class ExportTests(EagerCeleryMixin, TestCase):
+    """Тесты потоковой выгрузки опросов и истории из админки"""
+    
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass123')
+        self.client.force_login(self.admin)
+        for number in range(3):
+            Survey.objects.create(
+                title=f'Опрос <{number}>',
+                slug=f'export-{number}',
+                google_form_url='https://docs.google.com/forms/d/test/viewform',
+                is_active=number != 2,
+            )
+        self.changelist = reverse('admin:surveys_survey_changelist')
+    
+    def export(self, action, query='is_active__exact=1'):
+        """Действие над всеми опросами отфильтрованного списка"""
+        return self.client.post(f'{self.changelist}?{query}', {
+            'action': action,
+            'select_across': '1',
+            '_selected_action': [Survey.objects.first().pk],
+        })
+    
+    def test_csv_respects_changelist_filters(self):
+        """Тест CSV: поток и только опросы из отфильтрованного списка"""
+        response = self.export('export_csv')
+        
+        self.assertIsInstance(response, StreamingHttpResponse)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0][:3], ['ID', 'Название', 'Slug'])
+        self.assertEqual([row[2] for row in rows[1:]], ['export-0', 'export-1'])
+    
+    def test_xlsx_history(self):
+        """Тест XLSX: корректный zip и строки истории"""
+        response = self.export('export_history_xlsx', query='')
+        
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        namespace = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+        rows = [
+            [cell.findtext(f'.//{namespace}t') or cell.findtext(f'{namespace}v') for cell in row]
+            for row in sheet.iter(f'{namespace}row')
+        ]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][2], 'Опрос <0>')
+        self.assertEqual(rows[1][6], 'Создан')
+    
+    def test_large_export_written_in_background(self):
+        """Тест большой выгрузки: файл в фоне и ссылка на скачивание"""
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            SURVEY_EXPORT_ROOT=Path(root), SURVEY_EXPORT_BACKGROUND_ROWS=1
+        ):
+            with mock.patch('apps.surveys.admin.enqueue', wraps=enqueue) as queued, \
+                    self.captureOnCommitCallbacks(execute=True):
+                response = self.export('export_csv')
+                self.export('export_csv')
+            self.assertEqual(response.status_code, 302)
+            # В задачу уходят параметры фильтра, а не список ID
+            self.assertEqual(queued.call_args.kwargs, {'query': 'is_active__exact=1'})
+            
+            # Две выгрузки одной секунды не перезаписывают друг друга
+            filenames = sorted(path.name for path in Path(root).iterdir())
+            self.assertEqual(len(filenames), 2)
+            url = reverse('admin:surveys_survey_export_download', args=[filenames[0]])
+            response = self.client.get(url)
+            content = b''.join(response.streaming_content).decode('utf-8-sig')
+            response.close()
+            self.assertEqual(len(content.splitlines()), 3)
+            
+            response = self.client.get(reverse('admin:surveys_survey_export_download', args=['.export-x']))
+            self.assertEqual(response.status_code, 404)
+            
+            # Чужую выгрузку другой сотрудник скачать не может
+            self.client.force_login(User.objects.create_superuser('other', 'other@example.com', 'otherpass123'))
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, NIIEDU_AUTH_RENEW_INTERVAL=300)
+class AuthExpiryTests(TestCase):
+    """Тесты разброса и продления времени жизни входа NII EDU"""
+    
+    STUDENTS = 120  # входят по одному в секунду, за 2 минуты
+    MINUTES = 150
+    
+    def simulate(self, jitter, renew):
+        """
+        Каждый студент после входа раз в минуту открывает опрос со входом
+        
+        Returns:
+            Входы через API по минутам после первой волны и число продлений
+        """
+        clock = [0.0]
+        logins = Counter()
+        auth = caches['auth']
+        auth.clear()
+        with mock.patch('time.time', lambda: clock[0]), \
+                mock.patch('apps.surveys.services.random', random.Random(0)), \
+                mock.patch.object(auth, 'touch', wraps=auth.touch) as touch, \
+                mock.patch('requests.post') as mock_post, \
+                override_settings(NIIEDU_AUTH_TTL_JITTER=jitter):
+            mock_post.return_value = mock.Mock(status_code=200, json=lambda: {'name': 'Student'})
+            for minute in range(self.MINUTES):
+                for student in range(self.STUDENTS):
+                    clock[0] = minute * 60 + student % 60
+                    if clock[0] < student:
+                        continue  # еще не вошел в первой волне
+                    login = f'46222110{student:04d}'
+                    if NIIEDUAuthService.check_cached_auth(login) is None:
+                        NIIEDUAuthService.login(login, 'secret')
+                        if clock[0] >= self.STUDENTS:
+                            logins[minute] += 1
+                    elif renew:
+                        NIIEDUAuthService.renew_cached_auth(login)
+            return logins, touch.call_count
+    
+    def test_login_wave_flattened(self):
+        """Тест: разброс сглаживает повторные входы, продление убирает их"""
+        baseline, _ = self.simulate(jitter=0, renew=False)
+        jittered, _ = self.simulate(jitter=600, renew=False)
+        renewed, renewals = self.simulate(jitter=600, renew=True)
+        
+        # Без разброса вся группа снова входит в те же 2 минуты через час
+        self.assertEqual(max(baseline.values()), 60)
+        self.assertEqual(sorted(baseline), [60, 61, 120, 121])
+        self.assertLess(max(jittered.values()), max(baseline.values()) / 2)
+        self.assertGreater(len(jittered), 10)
+        
+        # Активные студенты не выходят, а продление — не чаще раза в 5 минут
+        self.assertEqual(sum(renewed.values()), 0)
+        self.assertLessEqual(renewals, self.STUDENTS * (self.MINUTES // 5 + 1))
+        self.assertGreater(renewals, 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SURVEY_CATALOG_PATH=TEST_CATALOG_PATH, SURVEY_COUNTER_BACKEND='memory')
+class SurveyCounterTests(TestCase):
+    """Тесты счетчиков просмотров"""
+    
+    def setUp(self):
+        cache.clear()
+        self.survey = Survey.objects.create(
+            title='Тестовый опрос',
+            slug='testovyj-opros',
+            google_form_url='https://docs.google.com/forms/d/test/viewform',
+        )
+        self.detail_url = reverse('surveys:survey_detail', kwargs={'slug': self.survey.slug})
+        self.embed_url = reverse('surveys:survey_embed', kwargs={'slug': self.survey.slug})
+    
+    def test_page_view_makes_no_db_writes(self):
+        """Тест, что просмотр страницы не пишет в базу данных"""
+        self.client.get(self.detail_url)  # прогрев кэша опроса
+        
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(5):
+                self.client.get(self.detail_url)
+                self.client.get(self.embed_url)
+        
+        writes = [
+            q['sql'] for q in queries.captured_queries
+            if q['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')
+        ]
+        self.assertEqual(writes, [])
+        self.assertFalse(SurveyDailyStat.objects.exists())
+    
+    def test_flush_writes_daily_rollup(self):
+        """Тест пакетного сброса счетчиков в дневную статистику"""
+        for _ in range(3):
+            self.client.get(self.detail_url)
+        self.client.get(self.embed_url)
+        self.assertEqual(flush_counters(), 1)
+        
+        self.client.get(self.detail_url)
+        self.assertEqual(flush_counters(), 1)
+        self.assertEqual(flush_counters(), 0)
+        
+        stat = SurveyDailyStat.objects.get(survey=self.survey)
+        self.assertEqual((stat.views, stat.opens), (4, 1))
+    
+    def test_admin_totals_only_in_result_list(self):
+        """Тест: просмотры за все время считаются только для строк списка, не в COUNT"""
+        SurveyDailyStat.objects.create(survey=self.survey, date=timezone.localdate(), views=4, opens=1)
+        SurveyDailyStat.objects.create(
+            survey=self.survey, date=timezone.localdate() - timedelta(days=1), views=2, opens=0,
+        )
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'adminpass123'))
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:surveys_survey_changelist'), {'o': '-7'})
+        self.assertContains(response, '6 / 1')
+        table = SurveyDailyStat._meta.db_table
+        counts = [q['sql'] for q in queries.captured_queries if 'COUNT(' in q['sql'] and 'surveys_survey' in q['sql']]
+        self.assertTrue(counts)
+        self.assertFalse([sql for sql in counts if table in sql])
+        self.assertFalse([q['sql'] for q in queries.captured_queries if 'GROUP BY' in q['sql']])
+    
+    def test_unique_respondents(self):
+        """Тест подсчета уникальных студентов за день и за все время"""
+        auth_survey = Survey.objects.create(
+            title='Опрос с авторизацией',
+            slug='opros-s-avtorizaciej',
+            google_form_url='https://docs.google.com/forms/d/test3/viewform',
+            is_login_req=True
+        )
+        auth_cache.set('niiedu_auth_462221101004', {'name': 'Student'})
+        session = self.client.session
+        session['niiedu_login'] = '462221101004'
+        session.save()
+        
+        url = reverse('surveys:survey_detail', kwargs={'slug': auth_survey.slug})
+        self.client.get(url)
+        self.client.get(url)
+        record_respondent(auth_survey.pk, '462221101005')
+        
+        self.assertEqual(count_respondents([auth_survey.pk], period='today'), {auth_survey.pk: 2})
+        flush_counters()
+        record_respondent(auth_survey.pk, '462221101006')
+        
+        self.assertEqual(count_respondents([auth_survey.pk]), {auth_survey.pk: 3})
+        stat = SurveyDailyStat.objects.get(survey=auth_survey)
+        self.assertEqual(stat.unique_respondents, 2)
+        
+        # Список в админке считает студентов для всей страницы сразу
+        for number in range(3):
+            Survey.objects.create(
+                title=f'Еще опрос {number}', slug=f'eshche-opros-{number}', is_login_req=True,
+                google_form_url='https://docs.google.com/forms/d/test3/viewform',
+            )
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'adminpass123'))
+        with mock.patch('apps.surveys.admin.count_respondents', wraps=count_respondents) as counted:
+            response = self.client.get(reverse('admin:surveys_survey_changelist'))
+        self.assertContains(response, '3 / 3')
+        self.assertEqual(counted.call_count, 2)
+
+
+@skipUnless(find_spec('pandas') and find_spec('numpy'), 'нужны numpy и pandas')
+@override_settings(CACHES=LOCMEM_CACHES, SURVEY_CATALOG_PATH=TEST_CATALOG_PATH)
+class ResponseStoreTests(EagerCeleryMixin, TestCase):
+    """Тесты загрузки и статистики ответов Google Forms"""
+    
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.enterContext(override_settings(SURVEY_RESPONSES_ROOT=tmp.name))
+        self.survey = Survey.objects.create(
+            title='Тестовый опрос',
+            slug='testovyj-opros',
+            google_form_url='https://docs.google.com/forms/d/test/viewform',
+        )
+    
+    def test_ingest_and_statistics(self):
+        """Тест потоковой загрузки, распределений и сопряженности"""
+        store = ResponseStore(self.survey.pk)
+        added = store.ingest_csv(io.StringIO(
+            'Timestamp,Курс,Оценка\n'
+            '2025/01/01 10:00:00,1,Хорошо\n'
+            '2025/01/01 10:01:00,2,Отлично\n'
+            '2025/01/01 10:02:00,1,\n'
+            '2025/01/01 10:03:00,1,Отлично\n'
+        ), chunk_size=2)
+        store.ingest_csv(io.StringIO(
+            'Timestamp,Оценка,Комментарий\n'
+            '2025/01/02 10:00:00,Хорошо,Спасибо\n'
+        ))
+        
+        store = ResponseStore(self.survey.pk)
+        self.assertEqual(added, 4)
+        self.assertEqual(store.rows, 5)
+        self.assertEqual([q['title'] for q in store.questions], ['Курс', 'Оценка', 'Комментарий'])
+        
+        grades = store.distribution(1)
+        self.assertEqual(grades['counts'], {'Хорошо': 2, 'Отлично': 2})
+        self.assertEqual(grades['missing'], 1)
+        
+        crosstab = store.crosstab(0, 1)
+        self.assertEqual(crosstab['rows'], ['1', '2'])
+        self.assertEqual(crosstab['table'], [[1, 1], [0, 1]])
+        
+        completion = store.completion()
+        self.assertEqual(completion['complete_rate'], 0.0)
+        self.assertEqual(completion['question_rates'], [0.8, 0.8, 0.2])
+    
+    def test_cumulative_exports_deduplicated(self):
+        """Тест, что повторный и более новый экспорт добавляют только новые ответы"""
+        first = (
+            'Timestamp,Курс\n'
+            '2025/01/01 10:00:00,1\n'
+            '2025/01/01 10:00:00,2\n'
+            '2025/01/01 10:05:00,1\n'
+        )
+        newer = first + '2025/01/01 10:05:00,3\n2025/01/02 09:00:00,2\n'
+        store = ResponseStore(self.survey.pk)
+        
+        self.assertEqual(store.ingest_csv(io.StringIO(first)), 3)
+        self.assertEqual(store.ingest_csv(io.StringIO(first)), 0)
+        self.assertEqual(store.ingest_csv(io.StringIO(newer), chunk_size=2), 2)
+        self.assertEqual(store.ingest_csv(io.StringIO(newer)), 0)
+        
+        store = ResponseStore(self.survey.pk)
+        self.assertEqual(store.rows, 5)
+        self.assertEqual(store.distribution(0)['counts'], {'1': 2, '2': 2, '3': 1})
+        
+        # Строки одной секунды на границе кусков
+        other = ResponseStore(self.survey.pk + 1)
+        self.assertEqual(other.ingest_csv(io.StringIO(first)), 3)
+        self.assertEqual(other.ingest_csv(io.StringIO(newer), chunk_size=3), 2)
+        self.assertEqual(other.ingest_csv(io.StringIO(newer), chunk_size=1), 0)
+    
+    def test_busy_ingest_retries_and_removes_file(self):
+        """Тест повтора задачи при занятой загрузке и удаления файла после последней попытки"""
+        path = Path(settings.SURVEY_RESPONSES_ROOT) / 'upload.csv'
+        path.write_text('Timestamp,Курс\n2025/01/02,3\n', encoding='utf-8')
+        lock_key = f'survey_responses_lock_{self.survey.pk}'
+        cache.set(lock_key, 1)
+        
+        with mock.patch.object(ingest_survey_responses, 'retry', side_effect=Retry()) as retry:
+            with self.assertRaises(Retry):
+                ingest_survey_responses.apply(args=[self.survey.pk, str(path)], throw=True)
+        retry.assert_called_once()
+        self.assertTrue(path.exists())
+        
+        ingest_survey_responses.apply(
+            args=[self.survey.pk, str(path)], retries=ingest_survey_responses.max_retries,
+        )
+        self.assertFalse(path.exists())
+        self.assertEqual(ResponseStore(self.survey.pk).rows, 0)
+        
+        cache.delete(lock_key)
+        path.write_text('Timestamp,Курс\n2025/01/02,3\n', encoding='utf-8')
+        ingest_survey_responses.delay(self.survey.pk, str(path))
+        self.assertFalse(path.exists())
+        self.assertEqual(ResponseStore(self.survey.pk).rows, 1)
+    
+    def test_incremental_aggregation(self):
+        """Тест, что агрегатор читает только новые строки и совпадает с пересчетом"""
+        store = ResponseStore(self.survey.pk)
+        store.ingest_csv(io.StringIO('Курс,Оценка\n1,Хорошо\n2,\n'))
+        aggregator = ResponseAggregator(self.survey.pk)
+        self.assertEqual(aggregator.update(), 2)
+        self.assertEqual(aggregator.update(), 0)
+        
+        # Без колонки отметки времени файл считается полным экспортом
+        store.ingest_csv(io.StringIO('Курс,Оценка,Комментарий\n1,Хорошо,\n2,,\n1,Отлично,Да\n3,Хорошо,\n'))
+        aggregator = ResponseAggregator(self.survey.pk)
+        self.assertEqual(aggregator.update(), 2)
+        self.assertEqual(aggregator.offset, 4)
+        
+        store = ResponseStore(self.survey.pk)
+        summary = aggregator.summary()
+        for index, item in enumerate(summary['distributions']):
+            self.assertEqual(item['counts'], store.distribution(index)['counts'])
+            self.assertEqual(item['missing'], store.distribution(index)['missing'])
+        completion = store.completion()
+        self.assertAlmostEqual(summary['completion']['complete_rate'], completion['complete_rate'])
+        self.assertAlmostEqual(summary['completion']['mean_answered'], completion['mean_answered'])
+        self.assertEqual(summary['completion']['question_rates'], completion['question_rates'])
+    
+    def test_admin_upload_and_tab(self):
+        """Тест загрузки CSV из админки и вкладки со статистикой"""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpass123'
+        )
+        self.client.force_login(admin)
+        upload = io.BytesIO('Timestamp,Курс\n2025/01/01,1\n2025/01/01,2\n'.encode())
+        upload.name = 'export.csv'
+        
+        with tempfile.TemporaryDirectory() as inbox, override_settings(
+            SURVEY_RESPONSES_INBOX=Path(inbox)
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse('admin:surveys_survey_responses_upload', args=[self.survey.pk]),
+                    {'file': upload},
+                )
+        
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ResponseStore(self.survey.pk).rows, 2)
+        response = self.client.get(reverse('admin:surveys_survey_change', args=[self.survey.pk]))
+        self.assertContains(response, 'Ответов: <strong>2</strong>')
+        
+        # Открытие формы не агрегирует новые строки и не пишет checkpoint
+        ResponseStore(self.survey.pk).ingest_csv(io.StringIO('Timestamp,Курс\n2025/01/02,3\n'))
+        response = self.client.get(reverse('admin:surveys_survey_change', args=[self.survey.pk]))
+        self.assertContains(response, 'Ответов: <strong>2</strong>')
+        self.assertContains(response, 'в обработке: <strong>1</strong>')
+        self.assertEqual(ResponseAggregator(self.survey.pk).offset, 2)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    SURVEY_CATALOG_PATH=TEST_CATALOG_PATH,
+    SURVEY_COUNTER_BACKEND='memory',
+)
+class AllowListTests(EagerCeleryMixin, TestCase):
+    """Тесты списков допуска студентов"""
+    
+    def setUp(self):
+        super().setUp()
+        allow_list_local.clear()
+        self.client = Client()
+        self.survey = Survey.objects.create(
+            title='Опрос для группы',
+            slug='opros-dlya-gruppy',
+            google_form_url='https://docs.google.com/forms/d/test/viewform',
+            is_login_req=True,
+        )
+        self.detail_url = reverse('surveys:survey_detail', kwargs={'slug': self.survey.slug})
+        self.login_url = reverse('surveys:niiedu_login', kwargs={'slug': self.survey.slug})
+    
+    def test_admin_upload_and_check_without_database(self):
+        """Тест загрузки списка из админки и проверки без запросов к БД"""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpass123'
+        )
+        self.client.force_login(admin)
+        upload = io.BytesIO(
+            'Логин,ФИО\n462221101004,Студент 1\n462221101005,Студент 2\n462221101004,Повтор\n'.encode()
+        )
+        upload.name = 'students.csv'
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('admin:surveys_survey_allow_list_upload', args=[self.survey.pk]),
+                {'file': upload, 'replace': 'on'},
+            )
+        self.assertEqual(response.status_code, 302)
+        self.survey.refresh_from_db()
+        self.assertEqual(self.survey.allow_list_size, 2)
+        self.assertEqual(
+            self.survey.history.first().history_change_reason, 'Загрузка списка допуска'
+        )
+        
+        with self.assertNumQueries(0):
+            survey = get_active_survey(self.survey.slug)
+            self.assertTrue(is_student_allowed(survey, '462221101004'))
+            self.assertFalse(is_student_allowed(survey, '462221101006'))
+        
+        # Дополнение списка меняет версию: старый битовый массив не используется
+        with self.captureOnCommitCallbacks(execute=True):
+            import_allow_list(self.survey, ['462221101006'], replace=False)
+        self.assertEqual(self.survey.allow_list_size, 3)
+        self.assertTrue(is_student_allowed(survey, '462221101006'))
+    
+    def test_stale_survey_copy_uses_shared_version(self):
+        """Тест, что копия опроса из старого снимка не открывает доступ всем"""
+        stale = Survey.objects.get(pk=self.survey.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            import_allow_list(self.survey, ['462221101004'])
+        
+        self.assertEqual(stale.allow_list_size, 0)
+        with self.assertNumQueries(0):
+            self.assertFalse(is_student_allowed(stale, '462221101005'))
+            self.assertTrue(is_student_allowed(stale, '462221101004'))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            clear_allow_list(self.survey)
+        self.assertTrue(is_student_allowed(stale, '462221101005'))
+    
+    @mock.patch('apps.surveys.views.NIIEDUAuthService.login')
+    def test_login_rejected_before_upstream(self, mock_login):
+        """Тест, что студент не из списка не доходит до NII EDU API"""
+        mock_login.return_value = {'success': True, 'data': {}}
+        import_allow_list(self.survey, ['462221101004'])
+        
+        response = self.client.post(self.login_url, {'login': '462221101005', 'password': 'secret123'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'допущенных к этому опросу')
+        mock_login.assert_not_called()
+        
+        response = self.client.post(self.login_url, {'login': '462221101004', 'password': 'secret123'})
+        self.assertEqual(response.status_code, 302)
+        mock_login.assert_called_once()
+    
+    def test_detail_hides_form_from_students_not_in_list(self):
+        """Тест, что вошедший студент не из списка не видит форму"""
+        import_allow_list(self.survey, ['462221101004'])
+        session = self.client.session
+        session['niiedu_login'] = '462221101005'
+        session.save()
+        auth_cache.set('niiedu_auth_462221101005', {'name': 'Student'})
+        
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'допущенных к этому опросу')
+        self.assertNotContains(response, 'Siz tizimga kirdingiz')
+        
+        session['niiedu_login'] = '462221101004'
+        session.save()
+        auth_cache.set('niiedu_auth_462221101004', {'name': 'Student'})
+        self.assertContains(self.client.get(self.detail_url), 'Siz tizimga kirdingiz')
+
+
+class FormStub(BaseHTTPRequestHandler):
+    """Заглушка Google Forms: открытая, закрытая и удаленная формы"""
+    
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+    requests = []
+    
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            cls.requests.append((self.path, self.headers.get('If-None-Match')))
+        time.sleep(0.02)
+        with cls.lock:
+            cls.in_flight -= 1
+        
+        if self.path.startswith('/closed/'):
+            self.send_response(302)
+            self.send_header('Location', '/forms/closedform')
+        elif self.path.startswith('/gone/'):
+            self.send_response(404)
+        elif self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+        else:
+            self.send_response(200)
+            self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+    
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    SURVEY_CATALOG_PATH=TEST_CATALOG_PATH,
+    SURVEY_COUNTER_BACKEND='memory',
+)
+class FormCheckTests(EagerCeleryMixin, TestCase):
+    """Тесты проверки ссылок Google Forms"""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FormStub)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+    
+    def setUp(self):
+        super().setUp()
+        FormStub.requests.clear()
+        FormStub.max_in_flight = 0
+    
+    def _surveys(self, paths):
+        return [
+            Survey.objects.create(
+                title=f'Форма {i}',
+                slug=f'forma-{i}',
+                google_form_url=f'{self.base_url}/{path}/{i}/viewform',
+            )
+            for i, path in enumerate(paths)
+        ]
+    
+    def test_statuses_conditional_requests_and_badge(self):
+        """Тест статусов, повторной проверки с If-None-Match и значка в админке"""
+        open_form, closed_form, gone_form = self._surveys(['open', 'closed', 'gone'])
+        
+        results = check_forms(host_rate=0)
+        self.assertEqual(results[open_form.pk]['status'], 'ok')
+        self.assertEqual(results[closed_form.pk]['status'], 'closed')
+        self.assertEqual(results[gone_form.pk]['status'], 'missing')
+        self.assertEqual(get_form_status(open_form.pk)['etag'], '"v1"')
+        
+        call_command('check_forms', host_rate=0, stdout=io.StringIO())
+        self.assertIn(('/open/0/viewform', '"v1"'), FormStub.requests)
+        status = get_form_status(open_form.pk)
+        self.assertEqual((status['status'], status['http_status']), ('ok', 304))
+        
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpass123'
+        )
+        self.client.force_login(admin)
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            response = self.client.get(reverse('admin:surveys_survey_changelist'))
+        # Статусы всей страницы читаются одним get_many
+        status_reads = [call for call in get_many.call_args_list if 'survey_form_status' in str(call)]
+        self.assertEqual(len(status_reads), 1)
+        self.assertContains(response, 'badge-success" title="HTTP 304')
+        self.assertContains(response, 'Не найдена')
+    
+    def test_concurrency_and_host_rate(self):
+        """Тест ограничения одновременных запросов и частоты запросов к хосту"""
+        self._surveys(['open'] * 12)
+        
+        check_forms(concurrency=4, host_rate=0)
+        self.assertLessEqual(FormStub.max_in_flight, 4)
+        self.assertGreater(FormStub.max_in_flight, 1)
+        
+        started = time.perf_counter()
+        check_forms(concurrency=4, host_rate=40)
+        # 12 запросов к одному хосту не чаще 40 в секунду: не меньше 11 интервалов
+        self.assertGreaterEqual(time.perf_counter() - started, 11 / 40)
@@ -1,17 +1,28 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import render, redirect
 from django.views.generic import ListView, DetailView
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 
+from apps.common.db_routers import read_from_replica
+
 from .models import Survey
+from .allow_list import is_student_allowed
 from .forms import NIIEDULoginForm
 from .services import NIIEDUAuthService
+from .cache import get_active_survey
+from .counters import record_open, record_respondent, record_view
+from .edge import add_edge_headers, add_private_headers
+from .pages import detail_page_key, get_page, list_page_key, single_flight, store_page
+
+
+NOT_ALLOWED_MESSAGE = 'Вы не входите в список студентов, допущенных к этому опросу.'
 
 
 # ========== WEB VIEWS ==========
 
+@method_decorator(read_from_replica, name='dispatch')
 class SurveyListView(ListView):
     """Список всех активных опросов"""
     model = Survey
@@ -20,7 +31,21 @@ class SurveyListView(ListView):
     paginate_by = 12
     
     def get_queryset(self):
-        return Survey.objects.filter(is_active=True).select_related('created_by')
+        return Survey.objects.published().select_related('created_by')
+    
+    def get(self, request, *args, **kwargs):
+        page = request.GET.get('page', '1')
+        if set(request.GET) - {'page'} or not page.isdigit():
+            return super().get(request, *args, **kwargs)
+        
+        key = list_page_key(page)
+        response, _ = get_page(key)
+        if response is None:
+            with single_flight(key) as (response, _):
+                if response is None:
+                    response = super().get(request, *args, **kwargs)
+                    store_page(key, response, expires_at=Survey.objects.next_transition())
+        return response
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -28,6 +53,7 @@ class SurveyListView(ListView):
         return context
 
 
+@method_decorator(read_from_replica, name='dispatch')
 class SurveyDetailView(DetailView):
     """Детальная страница опроса с встроенной Google Form"""
     model = Survey
@@ -37,7 +63,30 @@ class SurveyDetailView(DetailView):
     slug_url_kwarg = 'slug'
     
     def get_queryset(self):
-        return Survey.objects.filter(is_active=True)
+        return Survey.objects.published()
+    
+    def get_object(self, queryset=None):
+        return get_active_survey(self.kwargs[self.slug_url_kwarg])
+    
+    def get(self, request, *args, **kwargs):
+        key = detail_page_key(kwargs[self.slug_url_kwarg])
+        response, extra = get_page(key)
+        if response is not None:
+            record_view(extra['survey_id'])
+            return add_edge_headers(response, extra['survey_id'], extra['expires_at'])
+        
+        if self.get_object().is_login_req:
+            response = super().get(request, *args, **kwargs)
+            record_view(self.object.pk)
+            return add_private_headers(response)
+        
+        with single_flight(key) as (response, extra):
+            if response is None:
+                response = super().get(request, *args, **kwargs)
+                extra = {'survey_id': self.object.pk, 'expires_at': self.object.next_transition()}
+                store_page(key, response, **extra)
+        record_view(extra['survey_id'])
+        return add_edge_headers(response, extra['survey_id'], extra['expires_at'])
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -53,9 +102,14 @@ class SurveyDetailView(DetailView):
             session_login = self.request.session.get('niiedu_login')
             if session_login:
                 cached_auth = NIIEDUAuthService.check_cached_auth(session_login)
-                if cached_auth:
+                if cached_auth and not is_student_allowed(self.object, session_login):
+                    # Студента нет в списке допуска этого опроса
+                    messages.error(self.request, NOT_ALLOWED_MESSAGE)
+                elif cached_auth:
                     context['is_authenticated'] = True
                     context['user_data'] = cached_auth
+                    record_respondent(self.object.pk, session_login)
+                    NIIEDUAuthService.renew_cached_auth(session_login)
                 else:
                     # Очищаем сессию если кэш истек
                     self.request.session.pop('niiedu_login', None)
@@ -65,16 +119,19 @@ class SurveyDetailView(DetailView):
 
 # ========== ДОПОЛНИТЕЛЬНЫЕ VIEWS ==========
 
+@read_from_replica
 def survey_embed_view(request, slug):
     """
     Страница только с встроенной Google Form (для iframe)
     """
-    survey = get_object_or_404(Survey, slug=slug, is_active=True)
+    survey = get_active_survey(slug)
+    record_open(survey.pk)
     
-    return render(request, 'surveys/survey_embed.html', {
+    response = render(request, 'surveys/survey_embed.html', {
         'survey': survey,
         'embed_url': survey.get_google_form_embed_url(),
     })
+    return add_edge_headers(response, survey.pk, survey.next_transition())
 
 
 @csrf_exempt
@@ -82,7 +139,7 @@ def niiedu_login_view(request, slug):
     """
     Обработка аутентификации через NII EDU API
     """
-    survey = get_object_or_404(Survey, slug=slug, is_active=True)
+    survey = get_active_survey(slug)
     
     if not survey.is_login_req:
         return redirect('surveys:survey_detail', slug=slug)
@@ -94,12 +151,16 @@ def niiedu_login_view(request, slug):
             login = form.cleaned_data['login']
             password = form.cleaned_data['password']
             
-            # Выполняем аутентификацию
-            auth_result = NIIEDUAuthService.login(login, password)
+            # Студенты не из списка допуска не доходят до NII EDU API
+            if not is_student_allowed(survey, login):
+                auth_result = {'success': False, 'error': NOT_ALLOWED_MESSAGE}
+            else:
+                auth_result = NIIEDUAuthService.login(login, password)
             
             if auth_result['success']:
-                # Сохраняем логин в сессии
-                request.session['niiedu_login'] = login
+                # Сохраняем логин в сессии (без записи, если он не изменился)
+                if request.session.get('niiedu_login') != login:
+                    request.session['niiedu_login'] = login
                 messages.success(request, 'Аутентификация успешна!')
                 return redirect('surveys:survey_detail', slug=slug)
             else:
@@ -124,7 +185,7 @@ def niiedu_logout_view(request, slug):
     """
     Выход из системы NII EDU
     """
-    survey = get_object_or_404(Survey, slug=slug, is_active=True)
+    survey = get_active_survey(slug)
     
     # Очищаем кэш аутентификации
     session_login = request.session.get('niiedu_login')
@@ -0,0 +1,181 @@
+"""
+Прогрев кэша опросов: slug, страницы опросов и страницы списка
+
+Страницы рендерятся теми же представлениями, что и при обычном запросе, но
+без учета просмотров. Опросы прогреваются по убыванию просмотров за неделю,
+параллельно в ограниченном пуле потоков.
+"""
+import logging
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.db.models import F, Q, Sum
+from django.http import HttpRequest, QueryDict
+from django.urls import reverse
+from django.utils import timezone, translation
+
+from .cache import warm_survey
+from .catalog import rebuild_catalog
+from .models import Survey
+from .pages import detail_page_key, list_page_key, store_page
+
+logger = logging.getLogger(__name__)
+
+TRAFFIC_DAYS = 7
+
+
+def _request(path, page=None):
+    """GET-запрос анонимного пользователя для рендеринга страницы"""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.META = {
+        'SERVER_NAME': next((host for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost'),
+        'SERVER_PORT': '80',
+    }
+    request.GET = QueryDict(mutable=True)
+    if page is not None:
+        request.GET['page'] = str(page)
+    request.user = AnonymousUser()
+    return request
+
+
+def languages():
+    return [code for code, _ in settings.LANGUAGES]
+
+
+def warm_detail_pages(survey, language_codes=None):
+    """
+    Slug в кэше и страница опроса на всех языках
+
+    Returns:
+        Количество сохраненных страниц
+    """
+    from .views import SurveyDetailView
+
+    warm_survey(survey)
+    if not survey.is_open() or survey.is_login_req:
+        return 0
+
+    stored = 0
+    for language in language_codes or languages():
+        with translation.override(language):
+            request = _request(reverse('surveys:survey_detail', args=[survey.slug]))
+            view = SurveyDetailView()
+            view.setup(request, slug=survey.slug)
+            view.object = survey
+            response = view.render_to_response(view.get_context_data(object=survey))
+            stored += store_page(
+                detail_page_key(survey.slug, language),
+                response,
+                expires_at=survey.next_transition(),
+                survey_id=survey.pk,
+            )
+    return stored
+
+
+def warm_list_pages(pages=None, language_codes=None):
+    """
+    Страницы списка опросов на всех языках
+
+    Args:
+        pages: Сколько первых страниц прогреть (по умолчанию все)
+
+    Returns:
+        Количество сохраненных страниц
+    """
+    from .views import SurveyListView
+
+    total = math.ceil(Survey.objects.published().count() / SurveyListView.paginate_by)
+    expires_at = Survey.objects.next_transition()
+    count = max(total, 1)  # пустой список — тоже страница
+    if pages:
+        count = min(count, pages)
+    stored = 0
+    for language in language_codes or languages():
+        with translation.override(language):
+            path = reverse('surveys:survey_list')
+            for number in range(1, count + 1):
+                request = _request(path, number)
+                view = SurveyListView()
+                view.setup(request)
+                view.object_list = view.get_queryset()
+                response = view.render_to_response(view.get_context_data())
+                stored += store_page(list_page_key(str(number), language), response, expires_at=expires_at)
+    return stored
+
+
+def surveys_by_traffic():
+    """Открытые опросы по убыванию просмотров за последние TRAFFIC_DAYS дней"""
+    since = timezone.localdate() - timedelta(days=TRAFFIC_DAYS)
+    return Survey.objects.published().annotate(
+        recent_views=Sum('daily_stats__views', filter=Q(daily_stats__date__gt=since)),
+    ).order_by(F('recent_views').desc(nulls_last=True), '-created_at')
+
+
+def warm_caches(surveys=None, concurrency=8, deadline=None, list_pages=None,
+                language_codes=None, progress=None):
+    """
+    Прогревает снимок каталога, кэш опросов и страниц списка
+
+    Args:
+        surveys: Опросы в порядке приоритета (по умолчанию surveys_by_traffic())
+        concurrency: Количество параллельных потоков
+        deadline: Ограничение времени в секундах; опросы, не успевшие
+            начаться, пропускаются
+        list_pages: Сколько первых страниц списка прогреть (None — все)
+        language_codes: Языки (по умолчанию все из LANGUAGES)
+        progress: Функция progress(done, total, elapsed) для отчета
+
+    Returns:
+        Dict: surveys, pages, skipped, failed, elapsed
+    """
+    surveys = list(surveys_by_traffic() if surveys is None else surveys)
+    started = time.monotonic()
+    result = {'surveys': 0, 'pages': 0, 'skipped': 0, 'failed': 0}
+
+    def warm_one(survey):
+        try:
+            return warm_detail_pages(survey, language_codes)
+        finally:
+            # close_old_connections() не закрывает соединение при CONN_MAX_AGE > 0,
+            # и каждый поток пула оставлял бы открытое соединение
+            connections.close_all()
+
+    rebuild_catalog()
+    result['pages'] += warm_list_pages(list_pages, language_codes)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = set()
+        queue = iter(surveys)
+        while True:
+            # Не больше 2 * concurrency задач в очереди: дедлайн соблюдается точно
+            while len(pending) < concurrency * 2:
+                if deadline is not None and time.monotonic() - started > deadline:
+                    break
+                survey = next(queue, None)
+                if survey is None:
+                    break
+                pending.add(executor.submit(warm_one, survey))
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result['pages'] += future.result()
+                    result['surveys'] += 1
+                except Exception:
+                    logger.exception('Ошибка прогрева кэша опроса')
+                    result['failed'] += 1
+            if progress:
+                progress(result['surveys'] + result['failed'], len(surveys), time.monotonic() - started)
+
+    result['skipped'] = len(surveys) - result['surveys'] - result['failed']
+    result['elapsed'] = time.monotonic() - started
+    return result
@@ -1 +1,4 @@
-# Configuration package 
\ No newline at end of file
+# Configuration package
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
@@ -1,4 +1,5 @@
 import os
+from importlib.util import find_spec
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -22,9 +23,17 @@ DJANGO_APPS = [
     "unfold.contrib.filters",  # optional, if special filters are needed
     "unfold.contrib.forms",  # optional, if special form elements are needed
     "unfold.contrib.inlines",  # optional, if special inlines are needed
-    "unfold.contrib.import_export",  # optional, if django-import-export package is used
-    "unfold.contrib.guardian",  # optional, if django-guardian package is used
-    "unfold.contrib.simple_history",  # optional, if django-simple-history package is used
+]
+
+# Интеграции Unfold подключаются, только если установлен их пакет
+OPTIONAL_UNFOLD_APPS = {
+    "unfold.contrib.import_export": "import_export",  # django-import-export
+    "unfold.contrib.guardian": "guardian",  # django-guardian
+    "unfold.contrib.simple_history": "simple_history",  # django-simple-history
+}
+DJANGO_APPS += [app for app, package in OPTIONAL_UNFOLD_APPS.items() if find_spec(package)]
+
+DJANGO_APPS += [
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -46,23 +55,73 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.common.staticfiles.PrecompressedStaticMiddleware',
+    'apps.common.concurrency.ConcurrencyLimitMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'apps.common.route_profiles.RouteProfileMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.common.db_routers.ReplicaStickinessMiddleware',
+]
+
+# Middleware с состоянием подключается по профилю маршрута (apps/common/route_profiles.py)
+STATEFUL_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'simple_history.middleware.HistoryRequestMiddleware',
 ]
+ROUTE_MIDDLEWARE_PROFILES = {
+    'full': STATEFUL_MIDDLEWARE,
+    'lean': [],
+}
+# Публичные страницы без входа: без сессий, CSRF, пользователя и сообщений
+ROUTE_PROFILES = {
+    'surveys:survey_list': 'lean',
+    'surveys:survey_embed': 'lean',
+}
+# Админка требует эти middleware в MIDDLEWARE, а здесь они подключены через
+# профиль 'full', который получают все маршруты админки; наличие их в профиле
+# проверяет apps.common.route_profiles.check_route_profiles
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
 
 ROOT_URLCONF = 'config.urls'
 
+# Адаптивные лимиты одновременных запросов на воркер (apps/common/concurrency.py).
+# Лимит живет в памяти процесса: включать только для многопоточных или
+# асинхронных воркеров (gunicorn --threads N / gthread, ASGI)
+CONCURRENCY_LIMITS_ENABLED = os.getenv('CONCURRENCY_LIMITS_ENABLED', 'False').lower() == 'true'
+CONCURRENCY_ROUTE_CLASSES = {
+    'surveys:survey_list': 'public',
+    'surveys:survey_detail': 'public',
+    'surveys:survey_embed': 'public',
+    'surveys:niiedu_login': 'upstream',  # ждет NII EDU API
+}
+CONCURRENCY_LIMITS = {
+    'public': {
+        'initial': 64, 'minimum': 16, 'maximum': 256,
+        'target_ms': int(os.getenv('CONCURRENCY_PUBLIC_TARGET_MS', '250')),
+    },
+    'upstream': {
+        'initial': 4, 'minimum': 1, 'maximum': 32,
+        'target_ms': int(os.getenv('CONCURRENCY_UPSTREAM_TARGET_MS', '2000')),
+    },
+}
+
+# Шаблоны компилируются один раз на процесс (cached.Loader) и в разработке,
+# и в продакшене; при DEBUG автоперезагрузка сбрасывает кэш при правке шаблона
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'debug': DEBUG,
+            'loaders': [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -92,6 +151,34 @@ else:
         }
     }
 
+# Реплики для чтения публичных страниц (через запятую, опционально)
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, os.getenv('DATABASE_REPLICA_URLS', '').split(','))):
+    import dj_database_url
+    alias = 'replica' if index == 0 else f'replica_{index + 1}'
+    DATABASES[alias] = dj_database_url.parse(url.strip())
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+# Управление соединениями: request (по умолчанию, как раньше) / persistent /
+# pool (см. apps/common/db.py)
+from apps.common.db import configure_connection  # noqa: E402
+
+DATABASE_CONN_MODE = os.getenv('DATABASE_CONN_MODE', 'request')
+for alias in DATABASES:
+    DATABASES[alias] = configure_connection(
+        DATABASES[alias],
+        DATABASE_CONN_MODE,
+        max_age=int(os.getenv('DATABASE_CONN_MAX_AGE', '60')),
+        pool_size=int(os.getenv('DATABASE_POOL_SIZE', '5')),
+        max_overflow=int(os.getenv('DATABASE_POOL_MAX_OVERFLOW', '5')),
+        pool_timeout=float(os.getenv('DATABASE_POOL_TIMEOUT', '10')),
+    )
+
+DATABASE_ROUTERS = ['apps.common.db_routers.PrimaryReplicaRouter']
+# Сколько секунд после изменения читать с основной БД (read-your-writes)
+DATABASE_REPLICA_STICKY_SECONDS = int(os.getenv('DATABASE_REPLICA_STICKY_SECONDS', '10'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -131,27 +218,157 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# В продакшене: имена с хэшем содержимого, .gz / .br при collectstatic и
+# раздача сжатых копий с immutable-кэшированием (apps.common.staticfiles)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'apps.common.staticfiles.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+SERVE_STATIC = os.getenv('SERVE_STATIC', 'True').lower() == 'true'  # False — статику раздает nginx
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Ответы Google Forms (колоночное хранилище и каталог для автозагрузки CSV)
+SURVEY_RESPONSES_ROOT = Path(os.getenv('SURVEY_RESPONSES_ROOT', MEDIA_ROOT / 'responses'))
+SURVEY_RESPONSES_INBOX = Path(os.getenv('SURVEY_RESPONSES_INBOX', MEDIA_ROOT / 'responses_inbox'))
+
+# Сколько первых страниц списка прогревать после изменения опросов
+SURVEY_WARM_LIST_PAGES = int(os.getenv('SURVEY_WARM_LIST_PAGES', '3'))
+
+# Размер части для массовых действий в админке (UPDATE + история + сброс кэша)
+SURVEY_BULK_CHUNK_SIZE = int(os.getenv('SURVEY_BULK_CHUNK_SIZE', '1000'))
+
+# Выгрузки из админки: больше SURVEY_EXPORT_BACKGROUND_ROWS строк — файлом в фоне
+SURVEY_EXPORT_ROOT = Path(os.getenv('SURVEY_EXPORT_ROOT', BASE_DIR / 'var' / 'exports'))
+SURVEY_EXPORT_BACKGROUND_ROWS = int(os.getenv('SURVEY_EXPORT_BACKGROUND_ROWS', '50000'))
+SURVEY_EXPORT_KEEP_SECONDS = int(os.getenv('SURVEY_EXPORT_KEEP_SECONDS', str(60 * 60 * 24 * 7)))
+
+# Результат входа NII EDU: разброс времени жизни (± секунды) и продление
+# при активности студента не чаще раза в интервал
+NIIEDU_AUTH_TTL_JITTER = int(os.getenv('NIIEDU_AUTH_TTL_JITTER', '600'))
+NIIEDU_AUTH_RENEW_INTERVAL = int(os.getenv('NIIEDU_AUTH_RENEW_INTERVAL', '300'))
+
+# Повторный вход NII EDU, пока действует результат успешного входа, проверяется
+# локально по PBKDF2-хэшу пароля, без запроса к API (выключено по умолчанию)
+NIIEDU_LOCAL_VERIFY = os.getenv('NIIEDU_LOCAL_VERIFY', 'False').lower() == 'true'
+NIIEDU_LOCAL_VERIFY_ITERATIONS = int(os.getenv('NIIEDU_LOCAL_VERIFY_ITERATIONS', '260000'))
+
+# Кэш страниц embed и опросов на reverse proxy / CDN и его очистка
+SURVEY_EDGE_CACHE_SECONDS = int(os.getenv('SURVEY_EDGE_CACHE_SECONDS', '300'))
+SURVEY_SURROGATE_KEY_HEADER = os.getenv('SURVEY_SURROGATE_KEY_HEADER', 'Surrogate-Key')
+SURVEY_PURGE_URL = os.getenv('SURVEY_PURGE_URL', '')  # пусто — очистка отключена
+SURVEY_PURGE_TOKEN = os.getenv('SURVEY_PURGE_TOKEN', '')
+SURVEY_PURGE_BATCH_SIZE = int(os.getenv('SURVEY_PURGE_BATCH_SIZE', '100'))
+
+# История микробенчмарков (manage.py microbench / bench_compare)
+BENCHMARK_HISTORY_PATH = Path(os.getenv('BENCHMARK_HISTORY_PATH', BASE_DIR / 'var' / 'benchmarks.jsonl'))
+
+# Снимок каталога активных опросов (общий для всех воркеров через mmap)
+SURVEY_CATALOG_PATH = Path(os.getenv('SURVEY_CATALOG_PATH', BASE_DIR / 'var' / 'survey_catalog.bin'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Redis settings
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 
+# Узлы Redis для кэшей (через запятую): ключи распределяются по ним
+# согласованным хэшированием, сбойный узел временно исключается
+REDIS_NODES = [url.strip() for url in os.getenv('REDIS_NODES', REDIS_URL).split(',') if url.strip()]
+SESSION_REDIS_NODES = [
+    url.strip() for url in os.getenv('SESSION_REDIS_URL', ','.join(REDIS_NODES)).split(',') if url.strip()
+]
+CACHE_SHARD_OPTIONS = {
+    'NODE_BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    # Короткие таймауты: недоступный узел быстро набирает ошибки и исключается
+    'NODE_OPTIONS': {'socket_connect_timeout': 0.5, 'socket_timeout': 0.5},
+    'FAILURE_THRESHOLD': int(os.getenv('CACHE_NODE_FAILURE_THRESHOLD', '3')),
+    'RETRY_AFTER': int(os.getenv('CACHE_NODE_RETRY_AFTER', '30')),
+}
+
 # Cache configuration
+# У каждого кэша свои клиенты и пулы соединений к узлам и свой ключ эпохи
+# узла (EPOCH_KEY): сбой, замеченный одним кэшем, не сбрасывает ключи другого
 CACHES = {
+    # Страницы, опросы, версии и прочие данные приложения
     "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": REDIS_URL,
-    }
+        "BACKEND": "apps.common.sharded_cache.ShardedCache",
+        "LOCATION": REDIS_NODES,
+        "OPTIONS": {**CACHE_SHARD_OPTIONS, 'EPOCH_KEY': '_shard_epoch:default'},
+    },
+    # Результаты входа через NII EDU (niiedu_auth_*)
+    # Сессии и вход не переезжают к соседу при сбое узла: выход или изменение,
+    # записанные туда, потерялись бы после возвращения узла; вместо этого промах
+    "auth": {
+        "BACKEND": "apps.common.sharded_cache.ShardedCache",
+        "LOCATION": REDIS_NODES,
+        "KEY_PREFIX": "auth",
+        "OPTIONS": {**CACHE_SHARD_OPTIONS, 'REMAP_ON_FAILURE': False, 'EPOCH_KEY': '_shard_epoch:auth'},
+    },
+    "sessions": {
+        "BACKEND": "apps.common.sharded_cache.ShardedCache",
+        "LOCATION": SESSION_REDIS_NODES,
+        "OPTIONS": {**CACHE_SHARD_OPTIONS, 'REMAP_ON_FAILURE': False, 'EPOCH_KEY': '_shard_epoch:sessions'},
+    },
 }
 
+# Sessions
+# db — таблица django_session (по умолчанию)
+# redis — только Redis, без обращений к БД
+# redis_migrate — Redis, старые сессии из БД переносятся при первом чтении
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'redis': 'django.contrib.sessions.backends.cache',
+    'redis_migrate': 'apps.common.sessions',
+}
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Счетчики просмотров опросов: redis | memory
+SURVEY_COUNTER_BACKEND = os.getenv('SURVEY_COUNTER_BACKEND', 'redis')
+SURVEY_COUNTER_REDIS_URL = os.getenv('SURVEY_COUNTER_REDIS_URL', REDIS_URL)
+SURVEY_COUNTER_FLUSH_INTERVAL = int(os.getenv('SURVEY_COUNTER_FLUSH_INTERVAL', '60'))  # секунды
+
+# Проверка ссылок Google Forms (manage.py check_forms и задача Celery beat)
+FORM_CHECK_INTERVAL = int(os.getenv('FORM_CHECK_INTERVAL', '3600'))  # секунды
+FORM_CHECK_CONCURRENCY = int(os.getenv('FORM_CHECK_CONCURRENCY', '20'))
+FORM_CHECK_HOST_RATE = float(os.getenv('FORM_CHECK_HOST_RATE', '5'))  # запросов в секунду к хосту, 0 — без ограничения
+FORM_CHECK_TIMEOUT = float(os.getenv('FORM_CHECK_TIMEOUT', '10'))  # секунды
+
 # Celery Configuration
-CELERY_BROKER_URL = REDIS_URL
-CELERY_RESULT_BACKEND = REDIS_URL
+# Для локальной разработки без Redis: memory:// и cache+memory://
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', REDIS_URL)
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', REDIS_URL)
+# Выполнять задачи сразу в процессе (тесты, разработка без воркера)
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'False').lower() == 'true'
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_BEAT_SCHEDULE = {
+    'flush-survey-counters': {
+        'task': 'apps.surveys.tasks.flush_survey_counters',
+        'schedule': SURVEY_COUNTER_FLUSH_INTERVAL,
+    },
+    'aggregate-survey-responses': {
+        'task': 'apps.surveys.tasks.aggregate_survey_responses',
+        'schedule': 60,
+    },
+    # Восстанавливает снимок, если пересборка после изменения не выполнилась
+    'rebuild-survey-catalog': {
+        'task': 'apps.surveys.tasks.rebuild_survey_catalog',
+        'schedule': 300,
+    },
+    'check-survey-forms': {
+        'task': 'apps.surveys.tasks.check_survey_forms',
+        'schedule': FORM_CHECK_INTERVAL,
+    },
+}
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
@@ -163,6 +380,9 @@ SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'DENY'
 
 # Logging
+# Каталог логов не хранится в git и создается при запуске
+(BASE_DIR / 'logs').mkdir(exist_ok=True)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
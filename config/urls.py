@@ -7,7 +7,10 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.conf.urls.i18n import i18n_patterns
 
+from apps.common.views import db_pool_stats_view
+
 urlpatterns = [
+    path('admin/db-pool/', db_pool_stats_view, name='db_pool_stats'),
     path('admin/', admin.site.urls),
 ]
 